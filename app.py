@@ -1,34 +1,53 @@
-import os
+import logging
 from datetime import timedelta
+from typing import List
 
+import numpy as np
 import pandas as pd
+import requests
 import streamlit as st
-from config import index_params
-from icalendar import Calendar, Event
-from milvus_db_utils.search import search
-from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections
+from config import (
+    SEARCH_LIMIT,
+    SEARCH_SERVICE_URL,
+    SELECTION_PAGE_SIZE,
+    SERVICE_METRICS_TTL,
+    index_params,
+)
+from milvus_db_utils.connection import MilvusConnectionManager
+from milvus_db_utils.filters import SearchFilters
+from milvus_db_utils.result_cache import ResultCache
+from milvus_db_utils.sync import get_movies
+from milvus_db_utils.vector_store import VectorStore, get_vector_store
 from streamlit_calendar import calendar
 
+from data_gathering.catalogue import format_iso, list_catalogue, load_catalogue
+from data_gathering.thumbnails import ThumbnailCache
+from organizer.calendar_export import make_calendar
+from organizer.conflicts import ConflictIndex
+from organizer.hybrid_search import HybridSearch
+from organizer.schedule import optimise_schedule
+from organizer.search_client import SearchClient
+from organizer.text_index import TextIndex
+
 
 def main(data_file: str) -> None:
-    data = load_data(os.path.join("data", data_file))
-    print(len(data))
+    data = load_data(data_file)
     if "selected_movies" not in st.session_state:
         st.session_state["selected_movies"] = []
 
     ################
     # Search block #
     ################
-    col_search_a, col_search_b = st.columns([1, 1])
-    with col_search_a:
-        title_search_term = st.text_input(
-            "Search for a movie using terms in title", value="", key="title_search_term"
-        )
-    with col_search_b:
-        description_search = st.text_input(
-            "Search for a movie using natural description",
-            value="",
-            key="description_search",
+    search_query = st.text_input(
+        "Search for a movie using terms in title, director or description, or a "
+        "natural description",
+        value="",
+        key="search_query",
+    )
+    with st.expander("Filters"):
+        filters = get_filters(data)
+        limit = st.number_input(
+            "Movies found", min_value=1, max_value=500, value=SEARCH_LIMIT, step=10
         )
     show_selected = st.checkbox("Show Selected Only")
 
@@ -44,112 +63,272 @@ def main(data_file: str) -> None:
         )
         st.success("Movies saved successfully in selected_movies.txt and program.ics")
 
+    #####################
+    # Programme block   #
+    #####################
+    wishlist_titles = st.multiselect(
+        "Films I want to see", sorted(data["Title"].unique()), key="wishlist"
+    )
+    if st.button("Build my programme") and wishlist_titles:
+        wishlist = get_wishlist(data, wishlist_titles)
+        programme = optimise_schedule(data, wishlist)
+        select_screenings(programme["positions"])
+        create_ics_file("program.ics", data.iloc[programme["positions"], :])
+        st.success(
+            f"{len(programme['positions'])} of {len(wishlist)} films planned "
+            "without overlaps, saved in program.ics"
+        )
+
     #####################################
     # Display movies and program block  #
     #################@###################
     col_a, col_b = st.columns([4, 7])
     with col_a:
         filtered_data = filter_data(
-            data, title_search_term, description_search, show_selected
+            data, data_file, search_query, filters, limit, show_selected
         )
-        print(len(filtered_data))
-        selected_data = data.iloc[st.session_state.selected_movies, :]
-        selected_data.to_csv("test.csv")
-        show_selection(filtered_data)
+        show_cache_stats()
+        # Screenings overlapping the selection cannot be selected
+        conflict_index = load_conflict_index(data_file)
+        fits = conflict_index.fits(st.session_state.selected_movies)
+        page_sizes = sorted({10, SELECTION_PAGE_SIZE, 50})
+        page_size = st.selectbox(
+            "Films per page", page_sizes, index=page_sizes.index(SELECTION_PAGE_SIZE)
+        )
+        show_selection(filtered_data, fits, page_size)
     with col_b:
         show_calendar(
-            data.iloc[st.session_state.selected_movies, :], data["Start"].min()
+            data.iloc[st.session_state.selected_movies, :],
+            # Only the first start is formatted
+            data["StartDatetime"].min().isoformat(),
+            conflict_index.conflicts(st.session_state.selected_movies),
         )
 
 
-@st.cache_data
+@st.cache_resource
 def load_data(filename: str) -> pd.DataFrame:
-    data = pd.read_csv(filename)
-    data["StartDatetime"] = pd.to_datetime(data["StartDatetime"])
-    data["EndDatetime"] = pd.to_datetime(data["EndDatetime"])
-    return data
+    # Typed catalogue, memory-mapped when it is an .arrow file. Shared by the
+    # sessions without being copied at every rerun, it must not be modified.
+    return load_catalogue(filename)
+
+
+def get_wishlist(data: pd.DataFrame, titles: list) -> dict:
+    # Every film of the wishlist weighs the same
+    movies = get_movies(data)
+    return {movie_id: 1.0 for movie_id in movies[movies["Title"].isin(titles)]["id"]}
+
+
+def select_screenings(positions: List[int]) -> None:
+    # The boxes of the screenings keep their own state once rendered, they are
+    # ticked and unticked along with the selection
+    previous = st.session_state.selected_movies
+    st.session_state.selected_movies = list(positions)
+    for index in set(previous) | set(positions):
+        st.session_state[index] = index in positions
+
+
+@st.cache_resource
+def load_conflict_index(filename: str) -> ConflictIndex:
+    # Built once per dataset, then queried at every rerun
+    return ConflictIndex.from_data(load_data(filename))
+
+
+def search_catalogue(
+    data_file: str, query: str, filters: SearchFilters, limit: int
+) -> List[int]:
+    # Through the search service when SEARCH_SERVICE_URL is set, in process
+    # otherwise
+    if SEARCH_SERVICE_URL:
+        try:
+            results = get_search_client().search(data_file, query, filters, limit)
+        except requests.RequestException as e:
+            logging.warning(f"Search service failed: {e}")
+            st.error("The search service does not answer, no movie found")
+            return []
+    else:
+        results = load_hybrid_search(data_file).search(query, filters, limit=limit)
+    return results["positions"]
+
+
+@st.cache_resource
+def get_search_client() -> SearchClient:
+    return SearchClient(SEARCH_SERVICE_URL)
+
+
+@st.cache_resource
+def load_hybrid_search(filename: str) -> HybridSearch:
+    # Keyword index built once per dataset, vector store shared by the sessions
+    data = load_data(filename)
+    index_param = index_params[0]
+    try:
+        store = load_vector_store(index_param)
+    except Exception as e:
+        logging.warning(f"No vector store, the search uses keywords only: {e}")
+        store = None
+    return HybridSearch(
+        data, TextIndex(data), store, index_param, cache=get_result_cache()
+    )
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    # Shared by every session, emptied when create_index publishes new vectors
+    return ResultCache()
+
+
+def show_cache_stats() -> None:
+    # Only when asked for, the service may be slow or down
+    if not st.sidebar.checkbox("Show the search cache"):
+        return
+    if SEARCH_SERVICE_URL:
+        try:
+            stats = get_service_metrics()["result_cache"]
+        except requests.RequestException as e:
+            st.sidebar.caption(
+                f"Search cache unknown, the service does not answer: {e}"
+            )
+            return
+    else:
+        stats = get_result_cache().stats()
+    st.sidebar.caption(
+        f"Search cache: {stats['hit_ratio']:.0%} hits over "
+        f"{stats['hits'] + stats['misses']} searches, "
+        f"{stats['seconds_saved']:.1f} s saved"
+    )
+
+
+@st.cache_data(ttl=SERVICE_METRICS_TTL)
+def get_service_metrics() -> dict:
+    # Failed calls are not cached, they are tried again at the next rerun
+    return get_search_client().metrics()
+
+
+def get_filters(data: pd.DataFrame) -> SearchFilters:
+    first_day = data["StartDatetime"].min().date()
+    last_day = data["StartDatetime"].max().date()
+    days = st.date_input(
+        "Days", value=(first_day, last_day), min_value=first_day, max_value=last_day
+    )
+    locations = st.multiselect(
+        "Salles", sorted(data["Location"].dropna().astype(str).unique())
+    )
+    shortest, longest = int(data["Duration"].min()), int(data["Duration"].max())
+    min_duration, max_duration = st.slider(
+        "Duration (min)", shortest, max(longest, shortest + 1), (shortest, longest)
+    )
+    # Criteria left to their widest value are not filters
+    start = end = None
+    if len(days) == 2 and (days[0] > first_day or days[1] < last_day):
+        start = pd.Timestamp(days[0])
+        end = pd.Timestamp(days[1]) + timedelta(days=1)
+    return SearchFilters(
+        start,
+        end,
+        locations,
+        min_duration if min_duration > shortest else None,
+        max_duration if max_duration < longest else None,
+    )
 
 
 def filter_data(
     data: pd.DataFrame,
-    title_search_term: str,
-    description_search_term: str,
+    data_file: str,
+    query: str,
+    filters: SearchFilters,
+    limit: int,
     show_selected: bool,
 ) -> pd.DataFrame:
     if show_selected:
         return data.iloc[st.session_state.selected_movies, :]
-    elif title_search_term != "":
-        return data[
-            data["Title"].str.contains(title_search_term, case=False)
-            | data["Description"].str.contains(title_search_term, case=False)
-        ]
-    elif description_search_term != "":
-        index_param = index_params[0]
-        collection_name = (
-            f'embedded_field_{index_param["index_type"]}_'
-            f'{index_param["metric_type"]}'
-        )
-        collection = Collection(name=collection_name)
-        collection.load()
-        results = search(description_search_term, index_param, collection)
-        return data.iloc[[result[0] for result in results], :]
+    elif query.strip() != "":
+        # Keyword and semantic results fused, best first, with all the
+        # screenings of each movie matching the filters
+        return data.iloc[search_catalogue(data_file, query, filters, limit), :]
+    elif not filters.is_empty():
+        return data[filters.mask(data)]
     else:
         return data
 
 
-def show_selection(data: pd.DataFrame) -> None:
-    for index, row in data.iterrows():
+@st.cache_resource
+def get_connection_manager() -> MilvusConnectionManager:
+    # Shared by every session and rerun, Milvus is only reached by the searches
+    return MilvusConnectionManager()
+
+
+@st.cache_resource
+def load_vector_store(index_param: dict) -> VectorStore:
+    # Milvus or in-process NumPy search, depending on VECTOR_BACKEND
+    return get_vector_store(index_param, connection_manager=get_connection_manager())
+
+
+def show_selection(
+    data: pd.DataFrame, fits: np.ndarray, page_size: int = SELECTION_PAGE_SIZE
+) -> None:
+    # Only a page of screenings is rendered, with thumbnails served from disk,
+    # so that a rerun costs the same whatever the size of the catalogue
+    n_pages = max(1, -(-len(data) // page_size))
+    page = st.number_input(
+        f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1
+    )
+    page_data = data.iloc[(page - 1) * page_size : page * page_size]
+    thumbnails = get_thumbnail_cache().get_many(page_data["ImageURL"].tolist())
+    for (index, row), thumbnail in zip(page_data.iterrows(), thumbnails):
         is_selected = (
             st.session_state.selected_movies is not None
             and index in st.session_state.selected_movies
         )
         col1, col2 = st.columns([1, 2])
-        col1.image(row["ImageURL"], use_column_width=True)
+        col1.image(thumbnail or row["ImageURL"], use_column_width=True)
         col2.write(f'**{row["Title"]}**')
         col2.write(row["Description"])
 
-        box = col1.checkbox("Select", key=index, value=is_selected)
+        # The selection is updated before the rerun, so that the screenings
+        # greyed out match the boxes ticked
+        col1.checkbox(
+            "Select",
+            key=index,
+            value=is_selected,
+            disabled=not is_selected and not fits[index],
+            on_change=update_selection,
+            args=(index,),
+        )
 
-        if box:
-            if index not in st.session_state.selected_movies:
-                st.session_state.selected_movies.append(index)
-        else:
-            if index in st.session_state.selected_movies:
-                st.session_state.selected_movies.remove(index)
 
+@st.cache_resource
+def get_thumbnail_cache() -> ThumbnailCache:
+    return ThumbnailCache()
 
-def test_delay(x: pd.Timedelta) -> str:
-    if x is None:
-        return "green"
-    else:
-        if x < pd.Timedelta(0):
-            return "red"
-        else:
-            return "green"
+
+def update_selection(index: int) -> None:
+    # Follows the new state of the box rather than flipping the selection
+    selected = st.session_state.selected_movies
+    if st.session_state[index] and index not in selected:
+        selected.append(index)
+    elif not st.session_state[index] and index in selected:
+        selected.remove(index)
 
 
-def show_calendar(filtered_data: pd.DataFrame, initial_date: str) -> pd.DataFrame:
+def show_calendar(
+    filtered_data: pd.DataFrame, initial_date: str, conflicts: np.ndarray
+) -> pd.DataFrame:
     data = filtered_data.copy()
     data = data.sort_values(by=["StartDatetime"])
-    data.to_csv("test.csv", index=False)
-    data["Delay"] = data["StartDatetime"] - data["EndDatetime"].shift(1)
-    data["Color"] = data["Delay"].apply(test_delay)
+    # Red for the screenings overlapping any other selected screening
+    data["Color"] = np.where(data.index.isin(conflicts), "red", "green")
+    data["Start"] = format_iso(data["StartDatetime"])
+    data["End"] = format_iso(data["EndDatetime"])
     calendar_options = {
         "initialDate": initial_date,
         "slotMinTime": "06:00:00",
         "slotMaxTime": "24:00:00",
         "width": "100%",
     }
-    calendar_events = []
-    for index, row in data.iterrows():
-        calendar_events.append(
-            {
-                "title": row["Title"],
-                "color": row["Color"],
-                "start": row["Start"],
-                "end": row["End"],
-            }
-        )
+    calendar_events = (
+        data[["Title", "Color", "Start", "End"]]
+        .rename(columns=str.lower)
+        .to_dict("records")
+    )
     calendar_displayed = calendar(events=calendar_events, options=calendar_options)
     st.write(calendar_displayed)
 
@@ -157,28 +336,8 @@ def show_calendar(filtered_data: pd.DataFrame, initial_date: str) -> pd.DataFram
 
 
 def create_ics_file(file_name: str, selected_data: pd.DataFrame) -> None:
-    events = []
-    cal = Calendar()
-    for _, row in selected_data.iterrows():
-        events.append(
-            {
-                "title": row["Title"],
-                "start": row["StartDatetime"],
-                "duration": row["Duration"],
-                "location": row["Location"],
-            }
-        )
-
-    for event in events:
-        ev = Event()
-        ev.add("summary", event["title"])
-        ev.add("dtstart", event["start"])
-        ev.add("dtend", event["start"] + timedelta(minutes=event["duration"]))
-        ev.add("location", event["location"])
-        cal.add_component(ev)
-
     with open(file_name, "wb") as f:
-        f.write(cal.to_ical())
+        f.write(make_calendar(selected_data))
 
 
 if __name__ == "__main__":
@@ -206,9 +365,17 @@ if __name__ == "__main__":
     if "data_downloaded" not in st.session_state:
         st.session_state["data_downloaded"] = False
 
-    data_source = st.selectbox("Choose your data source:", os.listdir("data"))
+    # One data source per festival and year of the catalogue, then the older
+    # catalogues saved as csv files in data/
+    data_source = st.selectbox(
+        "Choose your data source:",
+        list_catalogue(),
+        format_func=lambda partition: partition["name"],
+    )
 
-    if st.button("Confirm selection"):
+    if data_source is None:
+        st.warning("The catalogue is empty, run data_gathering.scrape_festivals")
+    elif st.button("Confirm selection"):
         st.session_state["data_downloaded"] = True
-    if st.session_state["data_downloaded"]:
-        main(data_source)
+    if data_source is not None and st.session_state["data_downloaded"]:
+        main(data_source["path"])
@@ -0,0 +1,62 @@
+import argparse
+import logging
+import time
+
+import openai
+from milvus_db_utils.embedding_cache import EmbeddingCache
+from milvus_db_utils.embedding_pipeline import embed_texts
+from milvus_db_utils.embedding_providers import OpenAIProvider, set_embedding_provider
+
+from benchmarks.fake_embedding_server import start_fake_embedding_server
+
+
+def main(n_texts: int, latency: float, configurations: list) -> None:
+    server, api_base = start_fake_embedding_server(latency=latency)
+    openai.api_base = api_base
+    set_embedding_provider(OpenAIProvider("fake-embedding", 1536, api_key="fake-key"))
+    texts = [f"Description du film numéro {i}" for i in range(n_texts)]
+
+    print(
+        f"{'batch_size':>10} {'workers':>8} {'requests':>9} {'seconds':>8} {'texts/s':>9}"
+    )
+    for batch_size, max_workers in configurations:
+        server.requests_count = 0
+        t = time.time()
+        # A fresh in-memory cache so that every configuration calls the server
+        embeddings = embed_texts(
+            texts,
+            batch_size=batch_size,
+            max_workers=max_workers,
+            cache=EmbeddingCache(":memory:"),
+        )
+        t = time.time() - t
+        assert len(embeddings) == n_texts
+        print(
+            f"{batch_size:>10} {max_workers:>8} {server.requests_count:>9} "
+            f"{t:>8.2f} {n_texts / t:>9.1f}"
+        )
+    server.shutdown()
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Embedding throughput against a local fake embedding server"
+    )
+    parser.add_argument(
+        "-n", "--n_texts", type=int, default=500, help="Number of texts to embed"
+    )
+    parser.add_argument(
+        "-l",
+        "--latency",
+        type=float,
+        default=0.05,
+        help="Latency of the fake server for each request, in seconds",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    args = get_args()
+    # (batch_size, max_workers), the first one is the former one call per row
+    main(args.n_texts, args.latency, [(1, 1), (1, 8), (50, 1), (100, 4), (200, 8)])
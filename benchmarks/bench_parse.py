@@ -0,0 +1,91 @@
+import argparse
+import glob
+import logging
+import os
+import time
+
+from data_gathering.scrap_etrange_festival import (
+    HTML_PARSER,
+    SCHEDULE_DIV_CLASS,
+    parse_session_page,
+    parse_urls_from_div,
+)
+
+FIXTURES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests",
+    "fixtures",
+    "etrange_festival",
+)
+PAGE_URL = "https://www.etrangefestival.com/2023/fr/session/0"
+
+
+def parse_page(content: bytes, parser: str, selective: bool) -> None:
+    if SCHEDULE_DIV_CLASS.encode() in content:
+        parse_urls_from_div(content, PAGE_URL, SCHEDULE_DIV_CLASS, parser, selective)
+    else:
+        parse_session_page(content, PAGE_URL, parser, selective)
+
+
+def time_page(content: bytes, parser: str, selective: bool, repeats: int) -> float:
+    t = time.perf_counter()
+    for _ in range(repeats):
+        parse_page(content, parser, selective)
+    return (time.perf_counter() - t) / repeats
+
+
+def main(pages_path: str, repeats: int) -> None:
+    # The first configuration is the former full parse with "html.parser"
+    configurations = [("html.parser", False), ("html.parser", True)]
+    if HTML_PARSER != "html.parser":
+        configurations += [(HTML_PARSER, False), (HTML_PARSER, True)]
+
+    filenames = sorted(glob.glob(os.path.join(pages_path, "*.html")))
+    if not filenames:
+        raise FileNotFoundError(f"No .html page in {pages_path}")
+
+    print(
+        f"{'page':>30} "
+        + " ".join(f"{p + ('+only' if s else ''):>18}" for p, s in configurations)
+    )
+    totals = [0.0] * len(configurations)
+    for filename in filenames:
+        with open(filename, "rb") as f:
+            content = f.read()
+        timings = [time_page(content, p, s, repeats) for p, s in configurations]
+        totals = [total + timing for total, timing in zip(totals, timings)]
+        print(
+            f"{os.path.basename(filename)[-30:]:>30} "
+            + " ".join(f"{1000 * timing:>16.3f}ms" for timing in timings)
+        )
+    print(
+        f"{'mean per page':>30} "
+        + " ".join(f"{1000 * total / len(filenames):>16.3f}ms" for total in totals)
+    )
+    print(
+        f"{'speed-up':>30} "
+        + " ".join(f"{totals[0] / total:>17.1f}x" for total in totals)
+    )
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Per page parse time of the festival pages, before and after"
+    )
+    parser.add_argument(
+        "-p",
+        "--pages_path",
+        type=str,
+        default=FIXTURES_PATH,
+        help="Folder of saved .html pages, e.g. data/http_cache/pages after a scrape",
+    )
+    parser.add_argument(
+        "-r", "--repeats", type=int, default=200, help="Parses of each page"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    args = get_args()
+    main(args.pages_path, args.repeats)
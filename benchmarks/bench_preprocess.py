@@ -0,0 +1,103 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_gathering.catalogue import format_iso
+from data_gathering.scrap_etrange_festival import preprocess_data
+
+
+def make_screenings(n_screenings: int, seed: int = 0) -> pd.DataFrame:
+    # Screenings of a long festival: 12 days, 10 rooms, 500 movies
+    rng = np.random.default_rng(seed)
+    days = [f"{day:02d}/09" for day in range(6, 18)]
+    times = [f"{hour:02d}h{minute:02d}" for hour in range(10, 24) for minute in (0, 30)]
+    movies = rng.integers(0, 500, n_screenings)
+    return pd.DataFrame(
+        {
+            "Title": [f"Film {movie}" for movie in movies],
+            "Duration": rng.integers(60, 180, n_screenings),
+            "Date": rng.choice(days, n_screenings),
+            "Time": rng.choice(times, n_screenings),
+            "Location": rng.choice([f"Salle {n}" for n in range(10)], n_screenings),
+            "Description_movie": [f"Synopsis du film {movie}" for movie in movies],
+            "Description_extra": [f"Avec l'acteur {movie}" for movie in movies],
+        }
+    )
+
+
+def former_preprocess_data(data: pd.DataFrame, year: int) -> pd.DataFrame:
+    # The string round trip replaced by preprocess_data, with the year fixed
+    data["Description"] = (
+        data["Date"]
+        + " - "
+        + data["Time"]
+        + " - "
+        + data["Location"]
+        + " - "
+        + data["Duration"].astype(str)
+        + " min"
+    )
+    data["Description_movie_full"] = (
+        data["Description_movie"] + " - " + data["Description_extra"]
+    )
+    data["StartDatetime"] = pd.to_datetime(
+        data["Date"] + "/" + str(year) + " " + data["Time"].str.replace("h", ":"),
+        dayfirst=True,
+    )
+    data["EndDatetime"] = data["StartDatetime"] + pd.to_timedelta(
+        data["Duration"], unit="m"
+    )
+    data["Start"] = data["StartDatetime"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    data["End"] = data["EndDatetime"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return data
+
+
+def main(n_screenings: int, year: int) -> None:
+    screenings = make_screenings(n_screenings)
+
+    t = time.perf_counter()
+    former = former_preprocess_data(screenings.copy(), year)
+    former_seconds = time.perf_counter() - t
+
+    t = time.perf_counter()
+    data = preprocess_data(screenings.copy(), year)
+    seconds = time.perf_counter() - t
+
+    # The calendar only formats the few screenings it shows
+    t = time.perf_counter()
+    format_iso(data["StartDatetime"].iloc[:20])
+    format_seconds = time.perf_counter() - t
+
+    pd.testing.assert_series_equal(former["StartDatetime"], data["StartDatetime"])
+    pd.testing.assert_series_equal(former["EndDatetime"], data["EndDatetime"])
+    print(f"{n_screenings} screenings")
+    print(f"{'former preprocess_data':>30} {former_seconds:>8.2f}s")
+    print(f"{'preprocess_data':>30} {seconds:>8.2f}s")
+    print(f"{'format 20 Start strings':>30} {format_seconds:>8.4f}s")
+    print(f"{'speed-up':>30} {former_seconds / seconds:>8.1f}x")
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Preprocessing time of a synthetic table of screenings"
+    )
+    parser.add_argument(
+        "-n",
+        "--n_screenings",
+        type=int,
+        default=1_000_000,
+        help="Number of screenings of the synthetic table",
+    )
+    parser.add_argument(
+        "-y", "--year", type=int, default=2023, help="Year of the festival"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    args = get_args()
+    main(args.n_screenings, args.year)
@@ -0,0 +1,68 @@
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+from milvus_db_utils.sync import get_movie_ids
+
+from organizer.schedule import optimise_schedule
+
+
+def make_screenings(n_films: int, n_screenings: int, seed: int = 0) -> pd.DataFrame:
+    # A 11 days festival in 6 salles, films of 70 to 150 minutes
+    rng = np.random.default_rng(seed)
+    films = np.repeat(np.arange(n_films), n_screenings)
+    starts = pd.Timestamp("2023-09-06 10:00") + pd.to_timedelta(
+        rng.integers(0, 11 * 24 * 4, len(films)) * 15, unit="m"
+    )
+    durations = np.repeat(rng.integers(70, 150, n_films), n_screenings)
+    return pd.DataFrame(
+        {
+            "URL": [f"https://festival/session/{film}" for film in films],
+            "StartDatetime": starts,
+            "EndDatetime": starts + pd.to_timedelta(durations, unit="m"),
+            "Location": rng.choice([f"Salle {n}" for n in range(6)], len(films)),
+        }
+    )
+
+
+def main(n_films_list: list, n_screenings: int) -> None:
+    print(
+        f"{'films':>6} {'screenings':>11} {'weight':>7} {'bound':>7} "
+        f"{'optimal':>8} {'ms':>7}"
+    )
+    for n_films in n_films_list:
+        data = make_screenings(n_films, n_screenings)
+        rng = np.random.default_rng(n_films)
+        movie_ids = pd.unique(get_movie_ids(data)).tolist()
+        wishlist = dict(zip(movie_ids, rng.integers(1, 4, n_films).tolist()))
+        result = optimise_schedule(data, wishlist, daily_window=("10:00", "01:00"))
+        print(
+            f"{n_films:>6} {len(data):>11} {result['weight']:>7.0f} "
+            f"{result['upper_bound']:>7.0f} {str(result['optimal']):>8} "
+            f"{1000 * result['seconds']:>7.1f}"
+        )
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Time of the schedule optimiser on synthetic festivals"
+    )
+    parser.add_argument(
+        "-n",
+        "--n_films",
+        type=int,
+        nargs="+",
+        default=[50, 100, 200, 400, 800],
+        help="Number of films of the wishlist",
+    )
+    parser.add_argument(
+        "-s", "--n_screenings", type=int, default=3, help="Screenings per film"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    args = get_args()
+    main(args.n_films, args.n_screenings)
@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import logging
+import time
+
+import aiohttp
+import numpy as np
+import openai
+import pandas as pd
+from aiohttp import web
+from config import SERVICE_BATCH_SIZE
+from milvus_db_utils import utils
+from milvus_db_utils.embedding_providers import OpenAIProvider, set_embedding_provider
+from milvus_db_utils.filters import SCALAR_FIELDS, get_movie_scalar_fields
+from milvus_db_utils.result_cache import ResultCache
+from milvus_db_utils.sync import get_movie_ids
+from milvus_db_utils.vector_store import EmbeddedVectorStore
+
+from benchmarks.fake_embedding_server import fake_embedding, start_fake_embedding_server
+from organizer.hybrid_search import HybridSearch
+from organizer.search_service import EmbeddingBatcher, SearchService
+from organizer.text_index import TextIndex
+
+INDEX_PARAM = {"index_type": "FLAT", "metric_type": "IP", "params": {}}
+DIMENSION = 1536
+
+
+def make_catalogue(n_movies: int) -> pd.DataFrame:
+    # Two screenings of every movie, in 4 rooms over 10 days
+    rng = np.random.default_rng(0)
+    n_screenings = 2 * n_movies
+    return pd.DataFrame(
+        {
+            "Title": [f"Film {i % n_movies} nuit" for i in range(n_screenings)],
+            "URL": [
+                f"https://festival/film/{i % n_movies}" for i in range(n_screenings)
+            ],
+            "Duration": rng.integers(70, 130, n_screenings),
+            "Location": rng.choice(
+                ["Salle 100", "Salle 300", "Salle 500", "Forum"], n_screenings
+            ),
+            "StartDatetime": pd.Timestamp("2023-09-06 10:00")
+            + pd.to_timedelta(rng.integers(0, 240, n_screenings), unit="h"),
+        }
+    )
+
+
+def make_search(data: pd.DataFrame, batcher: EmbeddingBatcher) -> HybridSearch:
+    movies = data.drop_duplicates("URL")
+    fields = get_movie_scalar_fields(data).loc[get_movie_ids(movies)]
+    store = EmbeddedVectorStore(
+        ids=get_movie_ids(movies).to_numpy(),
+        vectors=np.array(
+            [fake_embedding(title, DIMENSION) for title in movies["Title"]]
+        ),
+        texts=movies["Title"].tolist(),
+        fields={field: fields[field].tolist() for field in SCALAR_FIELDS},
+    )
+    # No result cache, every query is embedded
+    return HybridSearch(
+        data,
+        TextIndex(data),
+        store,
+        INDEX_PARAM,
+        cache=ResultCache(max_entries=0),
+        embed_function=batcher.embed,
+        max_workers=64,
+    )
+
+
+async def load(url: str, n_requests: int, concurrency: int) -> list:
+    latencies = []
+    queries = iter(range(n_requests))
+
+    async def user(session: aiohttp.ClientSession) -> None:
+        for i in queries:
+            t = time.perf_counter()
+            body = {"catalogue": "bench", "query": f"film {i} de nuit", "limit": 20}
+            async with session.post(f"{url}/search", json=body) as response:
+                response.raise_for_status()
+                await response.json()
+            latencies.append(time.perf_counter() - t)
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(user(session) for _ in range(concurrency)))
+    return latencies
+
+
+async def run(data: pd.DataFrame, batch_size: int, n_requests: int, concurrency: int):
+    batcher = EmbeddingBatcher(utils.request_embeddings, batch_size=batch_size)
+    service = SearchService(
+        {"bench": make_search(data, batcher)}, batcher, max_workers=64
+    )
+    runner = web.AppRunner(service.make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    t = time.perf_counter()
+    latencies = await load(f"http://127.0.0.1:{port}", n_requests, concurrency)
+    seconds = time.perf_counter() - t
+    await runner.cleanup()
+    return seconds, np.array(latencies) * 1000, batcher
+
+
+def main(n_movies: int, n_requests: int, latency: float, configurations: list) -> None:
+    server, api_base = start_fake_embedding_server(DIMENSION, latency=latency)
+    openai.api_base = api_base
+    set_embedding_provider(
+        OpenAIProvider("fake-embedding", DIMENSION, api_key="fake-key")
+    )
+    data = make_catalogue(n_movies)
+
+    print(
+        f"{'batch_size':>10} {'users':>6} {'req/s':>7} {'p50 ms':>7} "
+        f"{'p95 ms':>7} {'API calls':>9} {'mean batch':>10}"
+    )
+    for batch_size, concurrency in configurations:
+        server.requests_count = 0
+        seconds, latencies, batcher = asyncio.run(
+            run(data, batch_size, n_requests, concurrency)
+        )
+        print(
+            f"{batch_size:>10} {concurrency:>6} {n_requests / seconds:>7.1f} "
+            f"{np.percentile(latencies, 50):>7.1f} {np.percentile(latencies, 95):>7.1f} "
+            f"{server.requests_count:>9} {batcher.texts / batcher.batches:>10.1f}"
+        )
+    server.shutdown()
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load test of the search service, embeddings from a fake server"
+    )
+    parser.add_argument(
+        "-m", "--n_movies", type=int, default=2000, help="Movies of the catalogue"
+    )
+    parser.add_argument(
+        "-n", "--n_requests", type=int, default=400, help="Searches sent"
+    )
+    parser.add_argument(
+        "-l",
+        "--latency",
+        type=float,
+        default=0.05,
+        help="Latency of the fake server for each request, in seconds",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    args = get_args()
+    # Without batching first, then with it, for 1 user and for 50
+    configurations = [
+        (1, 1),
+        (1, 50),
+        (SERVICE_BATCH_SIZE, 1),
+        (SERVICE_BATCH_SIZE, 50),
+    ]
+    main(args.n_movies, args.n_requests, args.latency, configurations)
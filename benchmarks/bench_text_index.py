@@ -0,0 +1,67 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from organizer.text_index import TextIndex
+
+QUERIES = ["mot1", "mot12 mot5", "elephant", "creme brulee", "m"]
+
+
+def make_catalogue(n_screenings: int, n_screenings_per_film: int = 3) -> pd.DataFrame:
+    # Titles of 3 words and descriptions of 80 words, a few of them accented
+    rng = np.random.default_rng(0)
+    words = np.array(
+        [f"mot{i}" for i in range(20000)] + ["éléphant", "crème", "brûlée"]
+    )
+    n_films = n_screenings // n_screenings_per_film
+    titles = [" ".join(rng.choice(words, 3)) for _ in range(n_films)]
+    descriptions = [" ".join(rng.choice(words, 80)) for _ in range(n_films)]
+    return pd.DataFrame(
+        {
+            "Title": titles * n_screenings_per_film,
+            "Description_movie": descriptions * n_screenings_per_film,
+        }
+    )
+
+
+def main(n_screenings: int, repeats: int) -> None:
+    data = make_catalogue(n_screenings)
+    t = time.perf_counter()
+    index = TextIndex(data)
+    print(f"Index of {len(data)} screenings built in {time.perf_counter() - t:.2f} s")
+
+    print(f"{'query':>14} {'matches':>8} {'ms':>7} {'contains ms':>12}")
+    for query in QUERIES:
+        t = time.perf_counter()
+        for _ in range(repeats):
+            positions = index.search(query)
+        index_ms = 1000 * (time.perf_counter() - t) / repeats
+        # The former keyword search, for comparison
+        t = time.perf_counter()
+        data["Title"].str.contains(query, case=False) | data[
+            "Description_movie"
+        ].str.contains(query, case=False)
+        contains_ms = 1000 * (time.perf_counter() - t)
+        print(f"{query:>14} {len(positions):>8} {index_ms:>7.2f} {contains_ms:>12.1f}")
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Time of the keyword search on a synthetic catalogue"
+    )
+    parser.add_argument(
+        "-n", "--n_screenings", type=int, default=100000, help="Catalogue size"
+    )
+    parser.add_argument(
+        "-r", "--repeats", type=int, default=20, help="Searches timed per query"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    args = get_args()
+    main(args.n_screenings, args.repeats)
@@ -0,0 +1,73 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+import numpy as np
+
+
+# Deterministic pseudo embedding so that the same text always gets the same vector
+def fake_embedding(text: str, dimension: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def make_handler(dimension: int, latency: float, latency_per_text: float):
+    class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+        # Mimics the OpenAI embeddings endpoint, with a configurable latency
+        def do_POST(self) -> None:
+            if not self.path.endswith("/embeddings"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            texts = (
+                body["input"] if isinstance(body["input"], list) else [body["input"]]
+            )
+            self.server.requests_count += 1
+            time.sleep(latency + latency_per_text * len(texts))
+
+            data = []
+            for i, text in enumerate(texts):
+                vector = fake_embedding(text, dimension)
+                if body.get("encoding_format") == "base64":
+                    embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+                else:
+                    embedding = vector.tolist()
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            payload = json.dumps(
+                {
+                    "object": "list",
+                    "data": data,
+                    "model": "fake-embedding",
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                }
+            ).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return FakeEmbeddingHandler
+
+
+def start_fake_embedding_server(
+    dimension: int = 1536,
+    latency: float = 0.05,
+    latency_per_text: float = 0.0005,
+    port: int = 0,
+) -> Tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port), make_handler(dimension, latency, latency_per_text)
+    )
+    server.requests_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
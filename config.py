@@ -9,6 +9,8 @@ ROOT_PATH = os.getenv("ROOT_PATH")
 DATA_PATH = os.path.join(ROOT_PATH, "data")
 
 # MILVUS VARS
+# An optional "search_params" entry, e.g. {"nprobe": 16} or {"ef": 64}, is used at
+# query time. See milvus_db_utils.benchmark to choose them.
 index_params = [
     {"index_type": "IVF_FLAT", "metric_type": "L2", "params": {"nlist": 1024}},
     {
@@ -20,3 +22,125 @@ index_params = [
 
 collection_name = "festival_movies_db"  # Collection name
 embedded_field = "Description_movie_full"  # Field name of the embedding vectors
+MILVUS_HEALTH_CHECK_INTERVAL = 30  # Seconds between two checks of the connection
+MAX_MOVIE_LOCATIONS = 16  # Salles of a movie kept in its Locations array field
+
+# EMBEDDING VARS
+EMBEDDING_BATCH_SIZE = 100  # Texts sent in a single embedding request
+EMBEDDING_MAX_WORKERS = 4  # Embedding requests running at the same time
+EMBEDDING_MAX_RETRIES = 5  # Retries of a failed batch before giving up
+EMBEDDING_CACHE_PATH = os.path.join(DATA_PATH, "embedding_cache.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = 100_000  # Embeddings kept on disk
+EMBEDDING_CACHE_MEMORY_ENTRIES = 1_000  # Most recently used embeddings kept in memory
+EMBEDDING_CACHE_TOUCH_BATCH = 100  # Memory hits written back to disk together
+# "openai" calls the OpenAI API, "local" runs a sentence-transformers model on
+# the CPU (to be installed separately). Collections are rebuilt after a change.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+LOCAL_EMBEDDING_MODEL = os.getenv(
+    "LOCAL_EMBEDDING_MODEL",
+    "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+)
+LOCAL_EMBEDDING_BATCH_SIZE = 32  # Texts encoded together by the local model
+LOCAL_EMBEDDING_MAX_WORKERS = 2  # Batches encoded at the same time
+
+# MILVUS INSERT VARS
+INSERT_CHUNK_SIZE = 1_000  # Rows sent to Milvus in a single insert
+COLLECTION_VERSIONS_KEPT = 2  # Collection versions kept behind each alias
+WARM_UP_QUERIES = 5  # Queries run on a new collection version before publishing it
+
+# INDEX BENCHMARK VARS
+# Build parameters x search parameters swept by milvus_db_utils.benchmark
+index_sweep = [
+    {"index_type": "FLAT", "build_params": [{}], "search_params": [{}]},
+    {
+        "index_type": "IVF_FLAT",
+        "build_params": [{"nlist": nlist} for nlist in [16, 64, 256, 1024]],
+        "search_params": [{"nprobe": nprobe} for nprobe in [1, 4, 16, 64]],
+    },
+    {
+        "index_type": "IVF_SQ8",
+        "build_params": [{"nlist": nlist} for nlist in [64, 256]],
+        "search_params": [{"nprobe": nprobe} for nprobe in [4, 16, 64]],
+    },
+    {
+        "index_type": "HNSW",
+        "build_params": [
+            {"M": m, "efConstruction": ef_construction}
+            for m in [4, 8, 16]
+            for ef_construction in [16, 64, 200]
+        ],
+        "search_params": [{"ef": ef} for ef in [16, 64, 128]],
+    },
+]
+benchmark_queries = ["film d'horreur", "film érotique", "film de science-fiction"]
+
+# VECTOR STORE VARS
+# "milvus" searches the Milvus server, "embedded" searches NumPy matrices saved
+# by create_index in VECTOR_STORE_PATH, without any server
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "milvus")
+VECTOR_STORE_PATH = os.path.join(DATA_PATH, "vector_store")
+# Approximate search of the embedded store with hnswlib, for large catalogues
+EMBEDDED_ANN = os.getenv("EMBEDDED_ANN", "false").lower() == "true"
+
+# RESULT CACHE VARS
+RESULT_CACHE_MAX_ENTRIES = 1_000  # Search results kept in memory
+RESULT_CACHE_TTL = 600  # Seconds before a cached search is run again
+# Rewritten by create_index after each publication, search caches are emptied
+INDEX_MARKER_PATH = os.path.join(DATA_PATH, "index_published")
+
+# SCRAPER VARS
+SCRAPER_MAX_WORKERS = 8  # Pages downloaded at the same time
+SCRAPER_PER_HOST_LIMIT = 4  # Requests sent to a single host at the same time
+SCRAPER_TIMEOUT = 10  # Seconds before a request is abandoned
+SCRAPER_MAX_RETRIES = 3  # Retries of a failed request
+SCRAPER_BACKOFF_FACTOR = 0.5  # Retries wait 0.5s, 1s, 2s...
+HTTP_CACHE_PATH = os.path.join(DATA_PATH, "http_cache")
+HTTP_CACHE_MAX_AGE = 0  # Seconds during which a cached page is used without asking
+SCRAPER_MAX_JOBS = 4  # Festivals and years scraped at the same time
+# One partition per festival and year
+CATALOGUE_PATH = os.path.join(DATA_PATH, "catalogue")
+
+# SCHEDULE VARS
+TRAVEL_BUFFER = 15  # Minutes to walk from a salle to another between two films
+# Earliest start and latest end of a film each day, e.g. ("10:00", "01:00") for a
+# day ending after midnight. None keeps every screening.
+DAILY_WINDOW = None
+SCHEDULE_TIME_LIMIT = 0.08  # Seconds given to the exact search of a programme
+
+# TEXT SEARCH VARS
+# Columns of the keyword search and their weight in the BM25 ranking
+TEXT_INDEX_FIELDS = {
+    "Title": 3.0,
+    "Director": 2.0,
+    "Description_movie": 1.0,
+    "Description_extra": 1.0,
+    "Description": 0.5,
+}
+TEXT_INDEX_K1 = 1.2  # Saturation of the term frequencies
+TEXT_INDEX_B = 0.75  # Normalisation by the length of the texts
+SEARCH_LIMIT = 20  # Movies of a page of search results
+# Movies ranked by each search before the fusion, pages stay consistent up to it
+SEARCH_CANDIDATES = 100
+SEARCH_MAX_WORKERS = 4  # Vector searches running at once in a process
+RRF_K = 60  # Reciprocal rank fusion constant, higher favours movies found by both
+
+# SEARCH SERVICE VARS
+# URL of organizer.search_service, e.g. http://127.0.0.1:8502. Unset, the app
+# searches in process.
+SEARCH_SERVICE_URL = os.getenv("SEARCH_SERVICE_URL")
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8502
+SERVICE_MAX_WORKERS = 8  # Searches running at the same time
+SERVICE_BATCH_SIZE = 32  # Query embeddings sent in a single call
+SERVICE_BATCH_WAIT = 0.005  # Seconds a query waits for others to be embedded with
+SERVICE_TIMEOUT = 30  # Seconds before the app gives up on the service
+SERVICE_METRICS_TTL = 10  # Seconds the app shows the same service metrics
+SERVICE_MAX_LIMIT = 500  # Movies of a search sent by the service
+# Movies ranked by a search, offset included, within the top k allowed by Milvus
+SERVICE_MAX_DEPTH = 16_384
+
+# APP VARS
+SELECTION_PAGE_SIZE = 20  # Screenings shown on a page of the selection list
+THUMBNAIL_CACHE_PATH = os.path.join(DATA_PATH, "thumbnails")
+THUMBNAIL_WIDTH = 320  # Pixels, images are downscaled once and served locally
+THUMBNAIL_FAILURE_TTL = 24 * 3600  # Seconds before a failed image is tried again
@@ -0,0 +1,125 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from config import CATALOGUE_PATH
+
+from data_gathering.catalogue import get_partition_path, write_catalogue
+from data_gathering.fetch import Fetcher
+from data_gathering.http_cache import HttpCache
+
+SESSION_COLUMNS = [
+    "Title",
+    "Duration",
+    "Date",
+    "Time",
+    "Location",
+    "ImageURL",
+    "Description_movie",
+    "Description_extra",
+    "Director",
+    "URL",
+]
+
+
+class FestivalAdapter(ABC):
+    # Interface of a festival website for scrape_festival: where the schedule
+    # pages of a year are, which session pages they link to, and what a session
+    # page holds. parse_session_page returns (title, duration, {date: {"time",
+    # "location"}}, image url, description, description extra, director).
+    name = ""
+
+    @abstractmethod
+    def get_schedule_urls(self, year: int) -> List[str]:
+        pass
+
+    @abstractmethod
+    def parse_schedule_page(self, content: bytes, url: str) -> List[str]:
+        pass
+
+    @abstractmethod
+    def parse_session_page(
+        self, content: bytes, url: str
+    ) -> Tuple[str, int, dict, str, str, str, str]:
+        pass
+
+    def preprocess(self, data: pd.DataFrame, year: int) -> pd.DataFrame:
+        return data
+
+
+def scrape_festival(
+    adapter: FestivalAdapter, year: int, fetcher: Fetcher
+) -> pd.DataFrame:
+    # Schedule pages are downloaded together, then all the session pages
+    schedule_urls = adapter.get_schedule_urls(year)
+    session_urls = []
+    for url, content in zip(schedule_urls, fetcher.get_many(schedule_urls)):
+        session_urls.extend(adapter.parse_schedule_page(content, url))
+
+    # A session page is linked from every day its film is screened, and lists all
+    # the screenings: it is downloaded and parsed once
+    unique_session_urls = list(dict.fromkeys(session_urls))
+    logging.info(
+        f"{adapter.name} {year}: getting info from {len(unique_session_urls)} "
+        f"session pages, {len(session_urls) - len(unique_session_urls)} fetches saved"
+    )
+    rows = []
+    for url, content in zip(unique_session_urls, fetcher.get_many(unique_session_urls)):
+        (
+            title,
+            duration,
+            session_practical_info,
+            img_url,
+            description,
+            description_extra,
+            director,
+        ) = parse_session_page_once(adapter, content, url, fetcher.cache)
+        for date, info in session_practical_info.items():
+            rows.append(
+                (
+                    title,
+                    duration,
+                    date,
+                    info["time"],
+                    info["location"],
+                    img_url,
+                    description,
+                    description_extra,
+                    director,
+                    url,
+                )
+            )
+
+    df = pd.DataFrame(rows, columns=SESSION_COLUMNS)
+    return df.drop_duplicates().reset_index(drop=True)
+
+
+def parse_session_page_once(
+    adapter: FestivalAdapter,
+    content: bytes,
+    url: str,
+    cache: Optional[HttpCache] = None,
+) -> Tuple[str, int, dict, str, str, str, str]:
+    # Pages already parsed with the same content are read from the cache
+    if cache is not None:
+        parsed = cache.load_parsed(url, content)
+        if parsed is not None:
+            return tuple(parsed)
+    parsed = adapter.parse_session_page(content, url)
+    if cache is not None:
+        cache.store_parsed(url, content, list(parsed))
+    return parsed
+
+
+def scrape_partition(
+    adapter: FestivalAdapter, year: int, fetcher: Fetcher, path: str = CATALOGUE_PATH
+) -> str:
+    # Scrapes a festival year into its partition of the catalogue
+    data = adapter.preprocess(scrape_festival(adapter, year, fetcher), year)
+    partition_path = get_partition_path(adapter.name, year, path)
+    os.makedirs(os.path.dirname(partition_path), exist_ok=True)
+    write_catalogue(data, partition_path)
+    logging.info(f"{adapter.name} {year}: {len(data)} screenings in {partition_path}")
+    return partition_path
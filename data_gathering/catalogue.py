@@ -0,0 +1,185 @@
+import os
+import re
+from typing import Iterator, List, Optional
+
+import pandas as pd
+from config import CATALOGUE_PATH, DATA_PATH
+
+from file_utils import atomic_path
+
+# Arrow IPC files are read through a memory map instead of being parsed like a
+# csv. Without pyarrow the catalogue falls back to csv with the same schema.
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+CATALOGUE_EXTENSION = ".arrow"
+CSV_EXTENSION = ".csv"
+
+# Partitions are laid out as festival=<name>/year=<year>/screenings.arrow
+PARTITION_FILE = "screenings"
+PARTITION_REGEX = re.compile(r"festival=([^/\\]+)[/\\]year=(\d+)$")
+
+# Types of the catalogue columns, every other column is kept as text
+CATALOGUE_SCHEMA = {
+    "Duration": "int64",
+    "Location": "category",
+    "Director": "category",
+    "StartDatetime": "datetime64[ns]",
+    "EndDatetime": "datetime64[ns]",
+    "Festival": "category",
+    "Year": "int64",
+}
+
+
+# Columns read by the app, a csv without them is not a catalogue
+CATALOGUE_COLUMNS = ["Title", "Duration", "Location", "StartDatetime", "EndDatetime"]
+
+
+def get_catalogue_filename(name: str) -> str:
+    extension = CATALOGUE_EXTENSION if pa is not None else CSV_EXTENSION
+    return f"{name}{extension}"
+
+
+def resolve_catalogue_path(path: str) -> str:
+    # A catalogue asked as .arrow may only exist as a csv and the other way round
+    if os.path.exists(path):
+        return path
+    name, extension = os.path.splitext(path)
+    for other in [CATALOGUE_EXTENSION, CSV_EXTENSION]:
+        if other != extension and os.path.exists(name + other):
+            return name + other
+    return path
+
+
+def apply_schema(data: pd.DataFrame) -> pd.DataFrame:
+    data = data.copy()
+    for column in data.columns:
+        dtype = CATALOGUE_SCHEMA.get(column, "str")
+        if dtype == "int64":
+            data[column] = data[column].fillna(0).astype("int64")
+        elif dtype.startswith("datetime64"):
+            data[column] = pd.to_datetime(data[column]).astype(dtype)
+        elif dtype == "category":
+            text = data[column].astype(object).fillna("").astype(str)
+            data[column] = text.astype("category")
+        elif not isinstance(data[column].dtype, pd.CategoricalDtype):
+            data[column] = data[column].fillna("").astype(str)
+    return data
+
+
+def write_catalogue(data: pd.DataFrame, path: str) -> None:
+    data = apply_schema(data)
+    if path.endswith(CATALOGUE_EXTENSION) and pa is None:
+        raise ImportError(f"pyarrow is needed to write {path}")
+    # Readers never see a half written catalogue
+    with atomic_path(path) as tmp_path:
+        if path.endswith(CATALOGUE_EXTENSION):
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            # Uncompressed, so that the columns can be memory-mapped as they are
+            with pa.OSFile(tmp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            data.to_csv(tmp_path, index=False)
+
+
+def read_arrow_table(path: str, memory_map: bool = True):
+    if pa is None:
+        raise ImportError(f"pyarrow is needed to read {path}")
+    source = pa.memory_map(path) if memory_map else pa.OSFile(path)
+    return pa.ipc.open_file(source).read_all()
+
+
+def load_catalogue(path: str, memory_map: bool = True) -> pd.DataFrame:
+    path = resolve_catalogue_path(path)
+    if path.endswith(CATALOGUE_EXTENSION):
+        # Already typed, numeric and datetime columns are not copied
+        return read_arrow_table(path, memory_map).to_pandas()
+    return apply_schema(pd.read_csv(path))
+
+
+def iter_catalogue_chunks(
+    path: str, chunk_size: int, memory_map: bool = True
+) -> Iterator[pd.DataFrame]:
+    path = resolve_catalogue_path(path)
+    if path.endswith(CATALOGUE_EXTENSION):
+        table = read_arrow_table(path, memory_map)
+        for offset in range(0, table.num_rows, chunk_size):
+            yield table.slice(offset, chunk_size).to_pandas()
+    else:
+        for data in pd.read_csv(path, chunksize=chunk_size):
+            yield apply_schema(data)
+
+
+# Start/End strings of the calendar, only formatted for the screenings shown
+def format_iso(timestamps: pd.Series) -> pd.Series:
+    return timestamps.dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def get_partition_path(festival: str, year: int, path: str = CATALOGUE_PATH) -> str:
+    partition = os.path.join(path, f"festival={festival}", f"year={year}")
+    return os.path.join(partition, get_catalogue_filename(PARTITION_FILE))
+
+
+def list_catalogue(
+    path: str = CATALOGUE_PATH, legacy_path: Optional[str] = DATA_PATH
+) -> List[dict]:
+    # Festivals and years of the catalogue, with the path of their screenings
+    # and a name to show, then the catalogues written in legacy_path as csv
+    # files before the partitions, named after their file and without a year
+    partitions = []
+    for root, _, filenames in os.walk(path):
+        match = PARTITION_REGEX.search(root)
+        if match is None:
+            continue
+        for extension in [CATALOGUE_EXTENSION, CSV_EXTENSION]:
+            if PARTITION_FILE + extension in filenames:
+                partitions.append(
+                    {
+                        "festival": match.group(1),
+                        "year": int(match.group(2)),
+                        "name": f"{match.group(1)} {match.group(2)}",
+                        "path": os.path.join(root, PARTITION_FILE + extension),
+                    }
+                )
+                break
+    partitions.sort(key=lambda p: (p["festival"], p["year"]))
+    if legacy_path is not None and os.path.isdir(legacy_path):
+        for filename in sorted(os.listdir(legacy_path)):
+            filepath = os.path.join(legacy_path, filename)
+            if filename.endswith(CSV_EXTENSION) and has_catalogue_columns(filepath):
+                partitions.append(
+                    {
+                        "festival": filename[: -len(CSV_EXTENSION)],
+                        "year": None,
+                        "name": filename,
+                        "path": filepath,
+                    }
+                )
+    return partitions
+
+
+def has_catalogue_columns(path: str) -> bool:
+    # Only the header is read
+    try:
+        columns = pd.read_csv(path, nrows=0).columns
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError):
+        return False
+    return set(CATALOGUE_COLUMNS) <= set(columns)
+
+
+def load_partitions(partitions: List[dict], memory_map: bool = True) -> pd.DataFrame:
+    # Screenings of several festivals and years in one table
+    data = pd.concat(
+        [
+            load_catalogue(partition["path"], memory_map).assign(
+                Festival=partition["festival"], Year=partition["year"]
+            )
+            for partition in partitions
+        ],
+        ignore_index=True,
+    )
+    # Categories differ from one partition to another
+    return apply_schema(data)
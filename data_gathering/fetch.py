@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+import requests
+from config import (
+    HTTP_CACHE_MAX_AGE,
+    SCRAPER_BACKOFF_FACTOR,
+    SCRAPER_MAX_RETRIES,
+    SCRAPER_MAX_WORKERS,
+    SCRAPER_PER_HOST_LIMIT,
+    SCRAPER_TIMEOUT,
+)
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from data_gathering.http_cache import HttpCache
+
+
+class Fetcher:
+    # Downloads pages from a thread pool sharing one keep-alive session. Each
+    # host gets at most per_host_limit requests at a time, failed requests are
+    # retried with an exponential backoff by urllib3.
+    # With a cache, pages are revalidated with conditional requests, or not
+    # requested at all if younger than max_age seconds. Offline, pages are only
+    # read from the cache.
+    def __init__(
+        self,
+        max_workers: int = SCRAPER_MAX_WORKERS,
+        per_host_limit: int = SCRAPER_PER_HOST_LIMIT,
+        timeout: float = SCRAPER_TIMEOUT,
+        max_retries: int = SCRAPER_MAX_RETRIES,
+        backoff_factor: float = SCRAPER_BACKOFF_FACTOR,
+        cache: Optional[HttpCache] = None,
+        offline: bool = False,
+        max_age: float = HTTP_CACHE_MAX_AGE,
+    ) -> None:
+        if offline and cache is None:
+            raise ValueError("The offline mode needs a cache")
+        self.cache = cache
+        self.offline = offline
+        self.max_age = max_age
+        self.stats = Counter()
+        self.timeout = timeout
+        self.per_host_limit = per_host_limit
+        self.session = requests.Session()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+        )
+        adapter = HTTPAdapter(
+            pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._host_semaphores: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> bytes:
+        entry = self.cache.load(url) if self.cache is not None else None
+        if entry is not None and (
+            self.offline or time.time() - entry["fetched_at"] < self.max_age
+        ):
+            self.stats["cached"] += 1
+            return entry["content"]
+        if self.offline:
+            raise FileNotFoundError(f"{url} is not in the HTTP cache")
+
+        headers = {}
+        if entry is not None and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        with self._host_semaphore(url):
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and entry is not None:
+            self.stats["not_modified"] += 1
+            self.cache.touch(url)
+            return entry["content"]
+        response.raise_for_status()  # Check if the request was successful
+        self.stats["downloaded"] += 1
+        if self.cache is not None:
+            self.cache.store(url, response.content, response.headers)
+        return response.content
+
+    def get_many(
+        self, urls: List[str], return_exceptions: bool = False
+    ) -> List[Union[bytes, Exception]]:
+        # Contents are returned in the order of urls. With return_exceptions, a
+        # failed download gives its exception instead of stopping the others.
+        get = self._get_or_exception if return_exceptions else self.get
+        return list(self._executor.map(get, urls))
+
+    def _get_or_exception(self, url: str) -> Union[bytes, Exception]:
+        try:
+            return self.get(url)
+        except Exception as e:
+            return e
+
+    def close(self) -> None:
+        if self.stats:
+            logging.info(f"Pages {dict(self.stats)}")
+        self._executor.shutdown()
+        self.session.close()
+
+    def __enter__(self) -> "Fetcher":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _host_semaphore(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.Semaphore(self.per_host_limit)
+            return self._host_semaphores[host]
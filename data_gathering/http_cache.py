@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+from config import HTTP_CACHE_PATH
+
+from file_utils import write_atomically
+
+
+class HttpCache:
+    # On-disk cache of the downloaded pages with their ETag and Last-Modified
+    # headers, used to send conditional requests. It also keeps the parsing of
+    # the pages, keyed by their content, so that unchanged pages are not parsed
+    # again.
+    def __init__(self, path: str = HTTP_CACHE_PATH) -> None:
+        self.path = path
+        os.makedirs(os.path.join(path, "pages"), exist_ok=True)
+        os.makedirs(os.path.join(path, "parsed"), exist_ok=True)
+
+    def load(self, url: str) -> Optional[dict]:
+        # Returns the metadata of the cached page, with its content, if any
+        base = self._page_path(url)
+        try:
+            with open(f"{base}.json") as f:
+                entry = json.load(f)
+            with open(f"{base}.html", "rb") as f:
+                entry["content"] = f.read()
+        except FileNotFoundError:
+            return None
+        return entry
+
+    def store(self, url: str, content: bytes, headers: dict) -> None:
+        base = self._page_path(url)
+        write_atomically(f"{base}.html", content)
+        entry = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        write_atomically(f"{base}.json", json.dumps(entry).encode("utf-8"))
+
+    def touch(self, url: str) -> None:
+        # The page was revalidated, it is fresh again
+        entry = self.load(url)
+        if entry is not None:
+            entry.pop("content")
+            entry["fetched_at"] = time.time()
+            write_atomically(
+                f"{self._page_path(url)}.json", json.dumps(entry).encode("utf-8")
+            )
+
+    def load_parsed(self, url: str, content: bytes) -> Optional[list]:
+        try:
+            with open(self._parsed_path(url, content)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def store_parsed(self, url: str, content: bytes, parsed: list) -> None:
+        write_atomically(
+            self._parsed_path(url, content), json.dumps(parsed).encode("utf-8")
+        )
+
+    def _page_path(self, url: str) -> str:
+        return os.path.join(self.path, "pages", hash_text(url))
+
+    def _parsed_path(self, url: str, content: bytes) -> str:
+        key = hash_text(url + hashlib.sha256(content).hexdigest())
+        return os.path.join(self.path, "parsed", f"{key}.json")
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -1,81 +1,79 @@
 import argparse
 import logging
-import os
 import re
-from datetime import datetime
-from typing import Tuple
+from typing import Iterable, List, Optional, Tuple
 from urllib.parse import urljoin
 
+import numpy as np
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from config import DATA_PATH
+from bs4 import BeautifulSoup, SoupStrainer
+from config import HTTP_CACHE_MAX_AGE
+
+from data_gathering.adapters import FestivalAdapter, scrape_festival, scrape_partition
+from data_gathering.fetch import Fetcher
+from data_gathering.http_cache import HttpCache
 
 logging.basicConfig(level=logging.INFO)
 
 
-def main(year: int) -> None:
-    titles = []
-    durations = []
-    dates = []
-    times = []
-    locations = []
-    img_urls = []
-    descriptions = []
-    descriptions_extra = []
-    directors = []
-    movie_urls = []
-
-    for n in range(6, 18):
-        target_url = (
-            f"https://www.etrangefestival.com/{year}/fr/schedule/09-{str(n).zfill(2)}"
-        )
-        target_div_class = "schedule_grid item-grid"
-
-        urls_in_target_div = get_urls_from_div(target_url, target_div_class)
-        session_urls = [url for url in urls_in_target_div if url != target_url]
-
-        for url in session_urls:
-            logging.info(f"Getting info from {url}")
-            (
-                title,
-                duration,
-                session_practical_info,
-                img_url,
-                description,
-                description_extra,
-                director,
-            ) = get_info_from_session_url(url)
-            for date, info in session_practical_info.items():
-                titles.append(title)
-                durations.append(duration)
-                dates.append(date)
-                times.append(info["time"])
-                locations.append(info["location"])
-                img_urls.append(img_url)
-                descriptions.append(description)
-                descriptions_extra.append(description_extra)
-                directors.append(director)
-                movie_urls.append(url)
-
-    data_dict = {
-        "Title": titles,
-        "Duration": durations,
-        "Date": dates,
-        "Time": times,
-        "Location": locations,
-        "ImageURL": img_urls,
-        "Description_movie": descriptions,
-        "Description_extra": descriptions_extra,
-        "Director": directors,
-        "URL": movie_urls,
-    }
-
-    # Create a pandas DataFrame from the dictionary
-    df = pd.DataFrame(data_dict)
-    df = df.drop_duplicates().reset_index(drop=True)
-    df = preprocess_data(df)
-    df.to_csv(os.path.join(DATA_PATH, f"etrange_festival_{year}.csv"), index=False)
+BASE_URL = "https://www.etrangefestival.com"
+SCHEDULE_DIV_CLASS = "schedule_grid item-grid"
+SCHEDULE_DAYS = range(6, 18)  # Days of September with a schedule page
+
+# lxml is a C parser, several times faster than the pure-Python "html.parser"
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Tags read by the get_* functions below, everything else of a session page
+# (head, scripts, styles, links, images outside of the kept tags...) is skipped
+SESSION_PAGE_TAGS = ["h2", "h4", "ul", "div", "p"]
+
+# A single scan of the text finds every part, each named group is optional
+DATE_TIME_LOCATION_REGEX = re.compile(
+    r"(?P<date>\d{2}/\d{2})|(?P<time>\d{2}h\d{2})|(?P<location>Salle \d+)"
+)
+DURATION_REGEX = re.compile(r"(?P<hours>\d+)h|(?P<minutes>\d+)m")
+DAY_MONTH_REGEX = re.compile(r"(\d{2})/(\d{2})")
+HOUR_MINUTE_REGEX = re.compile(r"(\d{2})h(\d{2})")
+
+
+def main(year: int, offline: bool = False, max_age: float = HTTP_CACHE_MAX_AGE) -> None:
+    # Pages are cached under DATA_PATH, unchanged pages cost a 304 at most
+    with Fetcher(cache=HttpCache(), offline=offline, max_age=max_age) as fetcher:
+        scrape_partition(EtrangeFestivalAdapter(), year, fetcher)
+
+
+class EtrangeFestivalAdapter(FestivalAdapter):
+    # One schedule page per day of the festival, each one linking to the session
+    # pages of the films screened that day
+    name = "etrange_festival"
+
+    def __init__(self, base_url: str = BASE_URL, days: Iterable[int] = SCHEDULE_DAYS):
+        self.base_url = base_url
+        self.days = days
+
+    def get_schedule_urls(self, year: int) -> List[str]:
+        return [f"{self.base_url}/{year}/fr/schedule/09-{day:02d}" for day in self.days]
+
+    def parse_schedule_page(self, content: bytes, url: str) -> List[str]:
+        urls = parse_urls_from_div(content, url, SCHEDULE_DIV_CLASS)
+        return [session_url for session_url in urls if session_url != url]
+
+    def parse_session_page(
+        self, content: bytes, url: str
+    ) -> Tuple[str, int, dict, str, str, str, str]:
+        return parse_session_page(content, url)
+
+    def preprocess(self, data: pd.DataFrame, year: int) -> pd.DataFrame:
+        return preprocess_data(data, year)
+
+
+def scrape(year: int, fetcher: Fetcher, base_url: str = BASE_URL) -> pd.DataFrame:
+    return scrape_festival(EtrangeFestivalAdapter(base_url), year, fetcher)
 
 
 def get_args() -> argparse.Namespace:
@@ -85,10 +83,21 @@ def get_args() -> argparse.Namespace:
     parser.add_argument(
         "-y",
         "--year",
-        type=str,
-        default="2022",
+        type=int,
+        default=2022,
         help="Year of the festival",
     )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Replay the pages of the HTTP cache without any request",
+    )
+    parser.add_argument(
+        "--max_age",
+        type=float,
+        default=HTTP_CACHE_MAX_AGE,
+        help="Seconds during which a cached page is used without any request",
+    )
     return parser.parse_args()
 
 
@@ -97,10 +106,24 @@ def get_absolute_url(base_url: str, relative_url: str) -> str:
     return urljoin(base_url, relative_url)
 
 
-def get_urls_from_div(url: str, div_class: str) -> list:
-    response = requests.get(url)
-    response.raise_for_status()  # Check if the request was successful
-    soup = BeautifulSoup(response.content, "html.parser")  # Parse the HTML content
+def make_soup(
+    content: bytes,
+    parse_only: Optional[SoupStrainer] = None,
+    parser: str = HTML_PARSER,
+) -> BeautifulSoup:
+    return BeautifulSoup(content, parser, parse_only=parse_only)
+
+
+def parse_urls_from_div(
+    content: bytes,
+    url: str,
+    div_class: str,
+    parser: str = HTML_PARSER,
+    selective: bool = True,
+) -> list:
+    # Only the schedule divs are parsed
+    parse_only = SoupStrainer("div", class_=div_class) if selective else None
+    soup = make_soup(content, parse_only, parser)
     div_elements = soup.find_all("div", class_=div_class)
     urls = []
 
@@ -114,11 +137,11 @@ def get_urls_from_div(url: str, div_class: str) -> list:
     return urls
 
 
-def get_info_from_session_url(url: str) -> Tuple[str, int, dict, str, str, str, str]:
-    response = requests.get(url)
-    response.raise_for_status()
-
-    soup = BeautifulSoup(response.content, "html.parser")
+def parse_session_page(
+    content: bytes, url: str, parser: str = HTML_PARSER, selective: bool = True
+) -> Tuple[str, int, dict, str, str, str, str]:
+    parse_only = SoupStrainer(SESSION_PAGE_TAGS) if selective else None
+    soup = make_soup(content, parse_only, parser)
 
     title = get_title(soup)
     duration = get_duration(soup)
@@ -225,62 +248,30 @@ def get_director(soup: BeautifulSoup) -> str:
 
 
 def convert_duration_to_minutes(duration_text: str) -> int:
-    duration_text = duration_text.lower()
-
-    # Define regular expressions for matching hours and minutes
-    hour_regex = r"(\d+)h"
-    minute_regex = r"(\d+)m"
-
-    # Initialize variables for hours and minutes
-    hours = 0
-    minutes = 0
-
-    # Find hours in the duration text
-    hour_match = re.search(hour_regex, duration_text)
-    if hour_match:
-        hours = int(hour_match.group(1))
-
-    # Find minutes in the duration text
-    minute_match = re.search(minute_regex, duration_text)
-    if minute_match:
-        minutes = int(minute_match.group(1))
-
-    # Calculate the total duration in minutes
-    total_minutes = hours * 60 + minutes
-
-    return total_minutes
+    parts = find_named_groups(DURATION_REGEX, duration_text.lower())
+    hours = int(parts["hours"] or 0)
+    minutes = int(parts["minutes"] or 0)
+    return hours * 60 + minutes
 
 
 def extract_date_time_location(text: str) -> Tuple[str, str, str]:
-    # Define regular expressions for matching date, time, and location
-    date_regex = r"(\d{2}/\d{2})"
-    time_regex = r"(\d{2}h\d{2})"
-    location_regex = r"Salle \d+"
-
-    # Initialize variables for date, time, and location
-    date = None
-    time = None
-    location = None
-
-    # Find date in the text
-    date_match = re.search(date_regex, text)
-    if date_match:
-        date = date_match.group(1)
-
-    # Find time in the text
-    time_match = re.search(time_regex, text)
-    if time_match:
-        time = time_match.group(1)
+    parts = find_named_groups(DATE_TIME_LOCATION_REGEX, text)
+    return parts["date"], parts["time"], parts["location"]
 
-    # Find location in the text
-    location_match = re.search(location_regex, text)
-    if location_match:
-        location = location_match.group()
 
-    return date, time, location
+def find_named_groups(regex: re.Pattern, text: str) -> dict:
+    # First value of each named group of regex in text, None when not found
+    found = dict.fromkeys(regex.groupindex)
+    for match in regex.finditer(text):
+        for name, value in match.groupdict().items():
+            if value is not None and found[name] is None:
+                found[name] = value
+        if None not in found.values():
+            break
+    return found
 
 
-def preprocess_data(data: pd.DataFrame) -> pd.DataFrame:
+def preprocess_data(data: pd.DataFrame, year: int) -> pd.DataFrame:
     data["Description"] = (
         data["Date"]
         + " - "
@@ -294,24 +285,50 @@ def preprocess_data(data: pd.DataFrame) -> pd.DataFrame:
     data["Description_movie_full"] = (
         data["Description_movie"] + " - " + data["Description_extra"]
     )
-    current_year = datetime.now().year
-    data["StartDatetime"] = pd.to_datetime(
-        data["Date"]
-        + "/"
-        + str(current_year)
-        + " "
-        + data["Time"].str.replace("h", ":"),
-        dayfirst=True,
-    )
+    # Timestamps of the scraped year, built from integers instead of parsed from
+    # strings. Start/End strings are formatted when displayed, see
+    # catalogue.format_iso.
+    day, month = parse_number_pairs(data["Date"], DAY_MONTH_REGEX)
+    hour, minute = parse_number_pairs(data["Time"], HOUR_MINUTE_REGEX)
+    data["StartDatetime"] = build_timestamps(year, month, day, hour, minute)
     data["EndDatetime"] = data["StartDatetime"] + pd.to_timedelta(
         data["Duration"], unit="m"
     )
-    data["Start"] = data["StartDatetime"].dt.strftime("%Y-%m-%dT%H:%M:%S")
-    data["End"] = data["EndDatetime"].dt.strftime("%Y-%m-%dT%H:%M:%S")
     return data
 
 
+def parse_number_pairs(
+    values: pd.Series, regex: re.Pattern
+) -> Tuple[np.ndarray, np.ndarray]:
+    # A festival only has a few distinct dates and times, each one is parsed
+    # once. Missing or unparsable values give -1.
+    codes, uniques = pd.factorize(values)
+    pairs = np.full((len(uniques) + 1, 2), -1, dtype="int64")
+    for i, value in enumerate(uniques):
+        match = regex.search(str(value))
+        if match:
+            pairs[i] = [int(match.group(1)), int(match.group(2))]
+    # Missing values have the code -1, that is the last row of pairs
+    pairs = pairs[codes]
+    return pairs[:, 0], pairs[:, 1]
+
+
+def build_timestamps(
+    year: int,
+    month: np.ndarray,
+    day: np.ndarray,
+    hour: np.ndarray,
+    minute: np.ndarray,
+) -> np.ndarray:
+    months = (year - 1970) * 12 + month - 1
+    minutes = (day - 1) * 24 * 60 + hour * 60 + minute
+    timestamps = months.astype("datetime64[M]").astype("datetime64[m]") + minutes
+    missing = (month < 0) | (day < 0) | (hour < 0) | (minute < 0)
+    timestamps[missing] = np.datetime64("NaT")
+    return timestamps.astype("datetime64[ns]")
+
+
 # Example usage
 if __name__ == "__main__":
     args = get_args()
-    main(args.year)
+    main(args.year, args.offline, args.max_age)
@@ -0,0 +1,100 @@
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from config import CATALOGUE_PATH, HTTP_CACHE_MAX_AGE, SCRAPER_MAX_JOBS
+
+from data_gathering.adapters import FestivalAdapter, scrape_partition
+from data_gathering.fetch import Fetcher
+from data_gathering.http_cache import HttpCache
+from data_gathering.scrap_etrange_festival import EtrangeFestivalAdapter
+
+logging.basicConfig(level=logging.INFO)
+
+# Festivals that can be scraped, by the name of their catalogue partition
+ADAPTERS: Dict[str, type] = {
+    EtrangeFestivalAdapter.name: EtrangeFestivalAdapter,
+}
+
+
+def main(
+    festivals: List[str],
+    years: List[int],
+    offline: bool = False,
+    max_age: float = HTTP_CACHE_MAX_AGE,
+    max_jobs: int = SCRAPER_MAX_JOBS,
+) -> None:
+    jobs = [(ADAPTERS[festival](), year) for festival in festivals for year in years]
+    # A single fetcher, so that the per host limits hold across the jobs
+    with Fetcher(cache=HttpCache(), offline=offline, max_age=max_age) as fetcher:
+        run(jobs, fetcher, max_jobs=max_jobs)
+
+
+def run(
+    jobs: List[Tuple[FestivalAdapter, int]],
+    fetcher: Fetcher,
+    path: str = CATALOGUE_PATH,
+    max_jobs: int = SCRAPER_MAX_JOBS,
+) -> List[str]:
+    # Scrapes the (adapter, year) jobs concurrently, each one into its partition.
+    # A failed job is logged and does not stop the others.
+    def scrape_job(job: Tuple[FestivalAdapter, int]) -> str:
+        adapter, year = job
+        try:
+            return scrape_partition(adapter, year, fetcher, path)
+        except Exception as e:
+            logging.error(f"{adapter.name} {year} failed: {e}")
+            return ""
+
+    with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+        paths = list(executor.map(scrape_job, jobs))
+    logging.info(f"{sum(map(bool, paths))} of {len(jobs)} partitions scraped")
+    return paths
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Scrap several festivals and years into the catalogue"
+    )
+    parser.add_argument(
+        "-f",
+        "--festivals",
+        type=str,
+        nargs="+",
+        choices=sorted(ADAPTERS),
+        default=sorted(ADAPTERS),
+        help="Festivals to scrap",
+    )
+    parser.add_argument(
+        "-y",
+        "--years",
+        type=int,
+        nargs="+",
+        required=True,
+        help="Years of the festivals",
+    )
+    parser.add_argument(
+        "-j",
+        "--max_jobs",
+        type=int,
+        default=SCRAPER_MAX_JOBS,
+        help="Festivals and years scraped at the same time",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Replay the pages of the HTTP cache without any request",
+    )
+    parser.add_argument(
+        "--max_age",
+        type=float,
+        default=HTTP_CACHE_MAX_AGE,
+        help="Seconds during which a cached page is used without any request",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    main(args.festivals, args.years, args.offline, args.max_age, args.max_jobs)
@@ -0,0 +1,98 @@
+import hashlib
+import io
+import logging
+import os
+import time
+from typing import List, Optional
+
+from config import THUMBNAIL_CACHE_PATH, THUMBNAIL_FAILURE_TTL, THUMBNAIL_WIDTH
+
+from data_gathering.fetch import Fetcher
+from file_utils import write_atomically
+
+try:
+    from PIL import Image
+except ImportError:  # Without Pillow, images are cached at their original size
+    Image = None
+
+
+class ThumbnailCache:
+    # Local copies of the festival images, downscaled to width pixels, so that
+    # the app serves them from disk instead of downloading them at every rerun.
+    # Missing thumbnails are downloaded together through the fetcher. Images
+    # that could not be downloaded or read are recorded as failed, and not
+    # tried again for failure_ttl seconds.
+    def __init__(
+        self,
+        path: str = THUMBNAIL_CACHE_PATH,
+        width: int = THUMBNAIL_WIDTH,
+        fetcher: Optional[Fetcher] = None,
+        failure_ttl: float = THUMBNAIL_FAILURE_TTL,
+    ) -> None:
+        self.path = path
+        self.width = width
+        self.failure_ttl = failure_ttl
+        self.fetcher = fetcher if fetcher is not None else Fetcher()
+        os.makedirs(path, exist_ok=True)
+
+    def get_many(self, urls: List[str]) -> List[Optional[str]]:
+        # Paths of the thumbnails of urls, None for the images that could not
+        # be downloaded or read
+        paths = [self.get_path(url) if url else None for url in urls]
+        failed = set()
+        missing = []
+        for url, path in dict(zip(urls, paths)).items():
+            if path is None or os.path.exists(path):
+                continue
+            if self.has_failed_recently(url):
+                failed.add(url)
+            else:
+                missing.append(url)
+        contents = self.fetcher.get_many(missing, return_exceptions=True)
+        for url, content in zip(missing, contents):
+            if isinstance(content, Exception):
+                error = str(content)
+            elif not self.store(url, content):
+                error = "not an image"
+            else:
+                continue
+            logging.warning(f"No thumbnail for {url}: {error}")
+            write_atomically(self.get_failure_path(url), error.encode("utf-8"))
+            failed.add(url)
+        return [
+            None if path is None or url in failed else path
+            for url, path in zip(urls, paths)
+        ]
+
+    def get_path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        extension = ".jpg" if Image is not None else os.path.splitext(url)[1]
+        return os.path.join(self.path, key + extension)
+
+    def get_failure_path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, key + ".failed")
+
+    def has_failed_recently(self, url: str) -> bool:
+        # The failure record holds the error, its age is the one of the file
+        try:
+            failed_at = os.path.getmtime(self.get_failure_path(url))
+        except FileNotFoundError:
+            return False
+        return time.time() - failed_at < self.failure_ttl
+
+    def store(self, url: str, content: bytes) -> bool:
+        if Image is not None:
+            try:
+                content = self.downscale(content)
+            except OSError:
+                return False
+        write_atomically(self.get_path(url), content)
+        return True
+
+    def downscale(self, content: bytes) -> bytes:
+        image = Image.open(io.BytesIO(content))
+        image.thumbnail((self.width, self.width * 4))
+        output = io.BytesIO()
+        image.convert("RGB").save(output, "JPEG", quality=85)
+        return output.getvalue()
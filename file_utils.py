@@ -0,0 +1,30 @@
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+def write_atomically(path: str, content: bytes) -> None:
+    # Readers never see a half written file
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+
+
+@contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    # Yields a temporary path, file or directory, moved to path once written.
+    # It is unique to the thread, and removed if the writing fails.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        if os.path.isdir(tmp_path):
+            # A directory is not replaced by os.replace unless it is empty
+            shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
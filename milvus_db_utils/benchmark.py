@@ -0,0 +1,256 @@
+import argparse
+import logging
+import os
+import time
+from typing import Iterator, List
+
+import dotenv
+import numpy as np
+import pandas as pd
+from config import DATA_PATH, benchmark_queries, embedded_field, index_sweep
+from milvus_db_utils.embedding_pipeline import embed_texts
+from milvus_db_utils.sync import get_movies
+from pymilvus import (
+    Collection,
+    CollectionSchema,
+    DataType,
+    FieldSchema,
+    connections,
+    utility,
+)
+
+from data_gathering.catalogue import get_partition_path, load_catalogue
+
+dotenv.load_dotenv()
+
+MILVUS_HOST = os.getenv("MILVUS_HOST")
+MILVUS_PORT = os.getenv("MILVUS_PORT")
+
+logging.basicConfig(level=logging.INFO)
+
+BENCHMARK_COLLECTION = "index_benchmark"
+VECTOR_FIELD = "embedding"
+
+
+def main(
+    filename: str,
+    metric_type: str,
+    k: int,
+    n_queries: int,
+    repeats: int,
+    output: str,
+) -> None:
+    data = load_catalogue(os.path.join(DATA_PATH, filename))
+    movies = get_movies(data)
+    queries = get_queries(movies, n_queries)
+    vectors = np.asarray(embed_texts(movies[embedded_field].tolist()), np.float32)
+    query_vectors = np.asarray(embed_texts(queries), np.float32)
+    if len(movies) < 1024:
+        logging.warning(
+            f"Only {len(movies)} vectors, Milvus may search small segments "
+            "without their index and every configuration will look alike"
+        )
+
+    ground_truth = brute_force_top_k(vectors, query_vectors, k, metric_type)
+
+    connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
+    rows = []
+    for index_type, build_params, search_params_list in iter_sweep(index_sweep):
+        index_param = {
+            "index_type": index_type,
+            "metric_type": metric_type,
+            "params": build_params,
+        }
+        collection, build_seconds = build_collection(
+            movies["id"].tolist(), vectors, index_param
+        )
+        for search_params in search_params_list:
+            found, latencies, wall_time = run_queries(
+                collection, query_vectors, metric_type, search_params, k, repeats
+            )
+            rows.append(
+                {
+                    "index_type": index_type,
+                    "metric_type": metric_type,
+                    **build_params,
+                    **search_params,
+                    "k": k,
+                    f"recall_at_{k}": recall_at_k(
+                        found, movies["id"].to_numpy()[ground_truth]
+                    ),
+                    **latency_summary(latencies),
+                    "qps": len(latencies) / wall_time,
+                    "build_seconds": build_seconds,
+                    "n_vectors": len(vectors),
+                    "n_queries": len(queries),
+                }
+            )
+            logging.info(rows[-1])
+        utility.drop_collection(BENCHMARK_COLLECTION)
+    connections.disconnect("default")
+
+    results = pd.DataFrame(rows)
+    results.to_csv(os.path.join(DATA_PATH, output), index=False)
+    logging.info(f"Saved {len(results)} configurations in {output}")
+
+
+def get_queries(movies: pd.DataFrame, n_queries: int) -> List[str]:
+    # The reference queries, completed with titles to get a meaningful recall
+    titles = movies["Title"].drop_duplicates().tolist()
+    return (benchmark_queries + titles)[: max(n_queries, len(benchmark_queries))]
+
+
+def iter_sweep(sweep: list) -> Iterator[tuple]:
+    for index_config in sweep:
+        for build_params in index_config["build_params"]:
+            yield index_config["index_type"], build_params, index_config[
+                "search_params"
+            ]
+
+
+def brute_force_top_k(
+    vectors: np.ndarray, queries: np.ndarray, k: int, metric_type: str
+) -> np.ndarray:
+    # Exact top k positions of vectors for each query, best first
+    if metric_type == "L2":
+        scores = -(
+            (queries**2).sum(axis=1)[:, None]
+            - 2 * queries @ vectors.T
+            + (vectors**2).sum(axis=1)[None, :]
+        )
+    elif metric_type == "IP":
+        scores = queries @ vectors.T
+    elif metric_type == "COSINE":
+        scores = (queries / np.linalg.norm(queries, axis=1)[:, None]) @ (
+            vectors / np.linalg.norm(vectors, axis=1)[:, None]
+        ).T
+    else:
+        raise ValueError(f"Unknown metric_type {metric_type}")
+    k = min(k, vectors.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(found: List[list], ground_truth: np.ndarray) -> float:
+    # Share of the exact top k found by the index, averaged over the queries
+    recalls = [
+        len(set(ids) & set(truth.tolist())) / len(truth)
+        for ids, truth in zip(found, ground_truth)
+    ]
+    return float(np.mean(recalls))
+
+
+def latency_summary(latencies: List[float]) -> dict:
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "latency_mean_ms": float(latencies_ms.mean()),
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def build_collection(ids: list, vectors: np.ndarray, index_param: dict) -> tuple:
+    if utility.has_collection(BENCHMARK_COLLECTION):
+        utility.drop_collection(BENCHMARK_COLLECTION)
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(
+            name=VECTOR_FIELD, dtype=DataType.FLOAT_VECTOR, dim=vectors.shape[1]
+        ),
+    ]
+    collection = Collection(BENCHMARK_COLLECTION, CollectionSchema(fields=fields))
+    collection.insert([ids, vectors.tolist()])
+    collection.flush()
+
+    t = time.perf_counter()
+    collection.create_index(field_name=VECTOR_FIELD, index_params=index_param)
+    utility.wait_for_index_building_complete(BENCHMARK_COLLECTION)
+    collection.load()
+    return collection, time.perf_counter() - t
+
+
+def run_queries(
+    collection: Collection,
+    query_vectors: np.ndarray,
+    metric_type: str,
+    search_params: dict,
+    k: int,
+    repeats: int,
+) -> tuple:
+    param = {"metric_type": metric_type, "params": search_params}
+    # Warm up, the first queries pay for the loading of the segments
+    collection.search(
+        data=query_vectors[:1].tolist(), anns_field=VECTOR_FIELD, param=param, limit=k
+    )
+
+    found = []
+    latencies = []
+    start = time.perf_counter()
+    for repeat in range(repeats):
+        for query_vector in query_vectors:
+            t = time.perf_counter()
+            results = collection.search(
+                data=[query_vector.tolist()],
+                anns_field=VECTOR_FIELD,
+                param=param,
+                limit=k,
+            )
+            latencies.append(time.perf_counter() - t)
+            if repeat == 0:
+                found.append([hit.id for hit in results[0]])
+    return found, latencies, time.perf_counter() - start
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Sweep Milvus index parameters, measure recall and latency"
+    )
+    parser.add_argument(
+        "-f",
+        "--filename",
+        type=str,
+        default=get_partition_path("etrange_festival", 2023),
+        help="Catalogue file (.arrow or .csv) containing the data, from the data folder",
+    )
+    parser.add_argument(
+        "-m", "--metric_type", type=str, default="L2", help="L2, IP or COSINE"
+    )
+    parser.add_argument(
+        "-k", type=int, default=5, help="Number of results of each query"
+    )
+    parser.add_argument(
+        "-n",
+        "--n_queries",
+        type=int,
+        default=100,
+        help="Number of queries, movie titles complete the reference queries",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeats",
+        type=int,
+        default=3,
+        help="Number of times each query is run to measure latencies",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="index_benchmark.csv",
+        help="Name of the csv file of results, written in the data folder",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    main(
+        args.filename,
+        args.metric_type,
+        args.k,
+        args.n_queries,
+        args.repeats,
+        args.output,
+    )
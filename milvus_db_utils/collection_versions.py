@@ -0,0 +1,61 @@
+import logging
+import re
+import time
+from typing import List, Optional
+
+from config import COLLECTION_VERSIONS_KEPT
+from pymilvus import Collection, utility
+
+# Each rebuild writes a new collection "<alias>_v<timestamp>", the alias used by
+# the app and the search is then switched to it in a single step
+
+
+def new_collection_version(alias: str) -> str:
+    return f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def list_collection_versions(alias: str) -> List[str]:
+    pattern = re.compile(rf"^{re.escape(alias)}_v\d{{14}}$")
+    # The timestamp makes the alphabetical order the chronological one
+    return sorted(name for name in utility.list_collections() if pattern.match(name))
+
+
+def get_aliased_collection(alias: str) -> Optional[str]:
+    for collection_name in list_collection_versions(alias):
+        if alias in utility.list_aliases(collection_name):
+            return collection_name
+    return None
+
+
+def publish_collection_version(collection_name: str, alias: str) -> None:
+    if get_aliased_collection(alias) is not None:
+        utility.alter_alias(collection_name=collection_name, alias=alias)
+    else:
+        if alias in utility.list_collections():
+            # Collections built before the aliases, the name has to be freed once
+            logging.warning(f"Dropping the former collection {alias} for its alias")
+            utility.drop_collection(alias)
+        utility.create_alias(collection_name=collection_name, alias=alias)
+    logging.info(f"Alias {alias} now points to {collection_name}")
+
+
+def drop_old_collection_versions(
+    alias: str, keep: int = COLLECTION_VERSIONS_KEPT
+) -> List[str]:
+    # The newest versions are kept to roll back, the published one is never
+    # dropped. The versions kept are released, only the published one stays in
+    # the memory of Milvus.
+    published = get_aliased_collection(alias)
+    versions = list_collection_versions(alias)
+    dropped = [
+        collection_name
+        for collection_name in versions[: max(len(versions) - keep, 0)]
+        if collection_name != published
+    ]
+    for collection_name in dropped:
+        utility.drop_collection(collection_name)
+        logging.info(f"Dropped old collection version {collection_name}")
+    for collection_name in versions:
+        if collection_name != published and collection_name not in dropped:
+            Collection(collection_name).release()
+    return dropped
@@ -0,0 +1,104 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import dotenv
+from config import MILVUS_HEALTH_CHECK_INTERVAL
+from pymilvus import Collection, MilvusException, connections, utility
+
+dotenv.load_dotenv()
+
+MILVUS_HOST = os.getenv("MILVUS_HOST")
+MILVUS_PORT = os.getenv("MILVUS_PORT")
+
+
+class MilvusConnectionManager:
+    # A single connection shared by all the searches, opened on first use, and
+    # the loaded collection handles. The connection is checked at most every
+    # health_check_interval seconds and reopened when the server went away.
+    def __init__(
+        self,
+        host: Optional[str] = MILVUS_HOST,
+        port: Optional[str] = MILVUS_PORT,
+        alias: str = "festival_organizer",
+        health_check_interval: float = MILVUS_HEALTH_CHECK_INTERVAL,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.alias = alias
+        self.health_check_interval = health_check_interval
+        self._collections: Dict[str, Collection] = {}
+        self._lock = threading.RLock()
+        self._last_check = 0.0
+
+    def get_collection(self, name: str) -> Collection:
+        self._check()
+        collection = self._collections.get(name)
+        if collection is None:
+            with self._lock:
+                collection = self._collections.get(name)
+                if collection is None:
+                    collection = Collection(name=name, using=self.alias)
+                    collection.load()
+                    self._collections[name] = collection
+        return collection
+
+    def run(self, name: str, operation: Callable[[Collection], object]):
+        # Runs operation on the collection, once more after a reconnection if
+        # the connection was lost in between two health checks
+        try:
+            return operation(self.get_collection(name))
+        except MilvusException as error:
+            logging.warning(f"Milvus call failed ({error}), reconnecting")
+            self.reconnect()
+            return operation(self.get_collection(name))
+
+    def is_healthy(self) -> bool:
+        try:
+            utility.get_server_version(using=self.alias, timeout=2)
+            return True
+        except MilvusException:
+            return False
+
+    def connect(self) -> None:
+        with self._lock:
+            if not connections.has_connection(self.alias):
+                connections.connect(alias=self.alias, host=self.host, port=self.port)
+                logging.info(f"Connected to Milvus on {self.host}:{self.port}")
+            self._last_check = time.monotonic()
+
+    def reconnect(self) -> None:
+        with self._lock:
+            self.close()
+            self.connect()
+
+    def close(self) -> None:
+        with self._lock:
+            self._collections.clear()
+            if connections.has_connection(self.alias):
+                connections.disconnect(self.alias)
+
+    def _check(self) -> None:
+        if time.monotonic() - self._last_check < self.health_check_interval:
+            return
+        with self._lock:
+            if not connections.has_connection(self.alias):
+                self.connect()
+            elif not self.is_healthy():
+                logging.warning("Milvus health check failed, reconnecting")
+                self.reconnect()
+            self._last_check = time.monotonic()
+
+
+_connection_manager = None
+_connection_manager_lock = threading.Lock()
+
+
+def get_connection_manager() -> MilvusConnectionManager:
+    global _connection_manager
+    with _connection_manager_lock:
+        if _connection_manager is None:
+            _connection_manager = MilvusConnectionManager()
+    return _connection_manager
@@ -1,13 +1,39 @@
 import argparse
+import json
 import logging
 import os
 import time
+from typing import Iterator, Optional
 
 import dotenv
-import openai
+import numpy as np
 import pandas as pd
-from config import DATA_PATH, index_params
-from milvus_db_utils.utils import embed
+from config import (
+    DATA_PATH,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_WORKERS,
+    INSERT_CHUNK_SIZE,
+    MAX_MOVIE_LOCATIONS,
+    VECTOR_BACKEND,
+    WARM_UP_QUERIES,
+    index_params,
+)
+from milvus_db_utils.collection_versions import (
+    drop_old_collection_versions,
+    new_collection_version,
+    publish_collection_version,
+)
+from milvus_db_utils.embedding_pipeline import embed_texts
+from milvus_db_utils.embedding_providers import get_embedding_provider
+from milvus_db_utils.filters import SCALAR_FIELDS, get_movie_scalar_fields
+from milvus_db_utils.result_cache import mark_index_published
+from milvus_db_utils.sync import (
+    MOVIE_ID_COLUMNS,
+    diff_contents,
+    get_content_hashes,
+    get_movies,
+)
+from milvus_db_utils.vector_store import EmbeddedVectorStore, get_embedded_store_path
 from pymilvus import (
     Collection,
     CollectionSchema,
@@ -17,59 +43,163 @@ from pymilvus import (
     utility,
 )
 
+from data_gathering.catalogue import (
+    get_partition_path,
+    iter_catalogue_chunks,
+    load_catalogue,
+)
+
 # Load environment variables
 dotenv.load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-OPENAI_ENGINE = os.getenv("OPENAI_ENGINE")
 MILVUS_HOST = os.getenv("MILVUS_HOST")
 MILVUS_PORT = os.getenv("MILVUS_PORT")
-DIMENSION = int(os.getenv("DIMENSION"))
 
 # Logging config
 logging.basicConfig(level=logging.INFO)
 
 
-def main(filename: str, embedded_field: str) -> None:
-    data = get_data_from_csv(filename, embedded_field)
+def main(
+    filename: str,
+    embedded_field: str,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_workers: int = EMBEDDING_MAX_WORKERS,
+    chunk_size: int = INSERT_CHUNK_SIZE,
+    stream: bool = False,
+    incremental: bool = False,
+    backend: str = VECTOR_BACKEND,
+) -> None:
+    if stream and incremental:
+        raise ValueError("The stream and incremental modes cannot be combined")
+
+    if backend == "embedded":
+        # No server, the embeddings are cached so a full rebuild is cheap
+        data = get_data_from_csv(filename, embedded_field)
+        embedings = get_embeddings(data, embedded_field, batch_size, max_workers)
+        for index_param in index_params:
+            save_embedded_store(data, embedded_field, index_param, embedings)
+        mark_index_published(f"embedded {filename}")
+        return
 
     # Connect to Milvus
     connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
 
-    # Get embeddings
-    embedings = get_embeddings(data, embedded_field)
-
     # Create embedded index in Milvus
     index_names = [
         f'embedded_field_{index_param["index_type"]}_' f'{index_param["metric_type"]}'
         for index_param in index_params
     ]
 
-    for i, index_name in enumerate(index_names):
-        create_index(data, embedded_field, index_params[i], index_name, embedings)
+    if stream:
+        # Read, embed and insert chunk by chunk so that memory stays flat
+        collections = [
+            create_collection(
+                embedded_field,
+                index_params[i],
+                index_name,
+                new_collection_version(index_name),
+            )
+            for i, index_name in enumerate(index_names)
+        ]
+        stream_index(
+            filename, embedded_field, collections, chunk_size, batch_size, max_workers
+        )
+        for i, index_name in enumerate(index_names):
+            publish_collection(collections[i], index_params[i], index_name)
+    elif incremental:
+        # Only the rows that changed since the last run are embedded and sent
+        data = get_data_from_csv(filename, embedded_field)
+
+        for i, index_name in enumerate(index_names):
+            sync_index(
+                data,
+                embedded_field,
+                index_params[i],
+                index_name,
+                chunk_size,
+                batch_size,
+                max_workers,
+            )
+    else:
+        data = get_data_from_csv(filename, embedded_field)
+
+        # Get embeddings
+        embedings = get_embeddings(data, embedded_field, batch_size, max_workers)
 
+        for i, index_name in enumerate(index_names):
+            create_index(
+                data, embedded_field, index_params[i], index_name, embedings, chunk_size
+            )
+
+    # Cached search results of the running apps are now stale
+    mark_index_published(f"{backend} {filename}")
     connections.disconnect("default")
 
 
-def get_embeddings(data: pd.DataFrame, embedded_field: str) -> list:
-    embeddings = []
-    for i in data.index:
-        try:
-            embeddings.append(embed(data[embedded_field][i]))
-            logging.info(
-                f"Embedded {data[embedded_field][i]} : "
-                f"{embed(data[embedded_field][i])}"
-            )
-        except openai.error.APIConnectionError:
-            time.sleep(60)
-            embeddings.append(embed(data[embedded_field][i]))
-    return embeddings
+def get_embeddings(
+    data: pd.DataFrame,
+    embedded_field: str,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_workers: int = EMBEDDING_MAX_WORKERS,
+) -> list:
+    # Embeddings are returned in the order of the rows of data
+    return embed_texts(
+        data[embedded_field].tolist(), batch_size=batch_size, max_workers=max_workers
+    )
 
 
 def get_data_from_csv(filename: str, embedded_field: str) -> pd.DataFrame:
-    data = pd.read_csv(os.path.join(DATA_PATH, filename))
-    data.fillna("", inplace=True)
-
+    # Typed catalogue, memory-mapped when it is an .arrow file
+    data = load_catalogue(os.path.join(DATA_PATH, filename))
+    check_embedded_field(data, embedded_field)
+    return get_movies_to_index(data, embedded_field)
+
+
+def get_data_from_csv_in_chunks(
+    filename: str, embedded_field: str, chunk_size: int = INSERT_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    # The screenings of a movie may span several chunks, the scalar fields are
+    # computed on the whole catalogue first
+    fields = get_catalogue_scalar_fields(filename, chunk_size)
+    for data in iter_catalogue_chunks(os.path.join(DATA_PATH, filename), chunk_size):
+        check_embedded_field(data, embedded_field)
+        yield get_movies_to_index(data, embedded_field, fields)
+
+
+def get_catalogue_scalar_fields(
+    filename: str, chunk_size: int = INSERT_CHUNK_SIZE
+) -> pd.DataFrame:
+    # Only the few columns of the scalar fields are kept in memory, no text
+    columns = None
+    screenings = []
+    for data in iter_catalogue_chunks(os.path.join(DATA_PATH, filename), chunk_size):
+        if columns is None:
+            id_column = next(c for c in MOVIE_ID_COLUMNS if c in data.columns)
+            columns = [id_column, "Duration", "StartDatetime", "Location"]
+        screenings.append(data[columns])
+    if not screenings:
+        return pd.DataFrame(columns=SCALAR_FIELDS)
+    return get_movie_scalar_fields(pd.concat(screenings, ignore_index=True))
+
+
+def get_movies_to_index(
+    data: pd.DataFrame, embedded_field: str, fields: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    # A single vector per movie, whatever its number of screenings, with the
+    # scalar fields of all its screenings for the search filters, from fields
+    # when data is a part of the catalogue. Stable ids and content hashes, so
+    # that a new csv can be diffed with Milvus.
+    movies = get_movies(data)
+    if fields is None:
+        fields = get_movie_scalar_fields(data)
+    for field in SCALAR_FIELDS:
+        movies[field] = movies["id"].map(fields[field])
+    movies["content_hash"] = get_content_hashes(movies, embedded_field, SCALAR_FIELDS)
+    logging.info(f"{len(movies)} movies to index for {len(data)} screenings")
+    return movies
+
+
+def check_embedded_field(data: pd.DataFrame, embedded_field: str) -> None:
     try:
         assert embedded_field in data.columns
     except AssertionError:
@@ -78,8 +208,6 @@ def get_data_from_csv(filename: str, embedded_field: str) -> pd.DataFrame:
             f"{data.columns}"
         )
 
-    return data
-
 
 def get_args():
     parser = argparse.ArgumentParser(description="Create index on Milvus")
@@ -87,8 +215,8 @@ def get_args():
         "-f",
         "--filename",
         type=str,
-        default="etrange_festival_2023.csv",
-        help="Name of the csv file containing the data",
+        default=get_partition_path("etrange_festival", 2023),
+        help="Catalogue file (.arrow or .csv) containing the data, from the data folder",
     )
     parser.add_argument(
         "-e",
@@ -97,20 +225,118 @@ def get_args():
         default="etrange_festival_2023.csv",
         help="Name of the csv file containing the data",
     )
+    parser.add_argument(
+        "-b",
+        "--batch_size",
+        type=int,
+        default=EMBEDDING_BATCH_SIZE,
+        help="Number of texts sent in a single embedding request",
+    )
+    parser.add_argument(
+        "-w",
+        "--max_workers",
+        type=int,
+        default=EMBEDDING_MAX_WORKERS,
+        help="Number of embedding requests running concurrently",
+    )
+    parser.add_argument(
+        "-c",
+        "--chunk_size",
+        type=int,
+        default=INSERT_CHUNK_SIZE,
+        help="Number of rows sent to Milvus in a single insert",
+    )
+    parser.add_argument(
+        "-s",
+        "--stream",
+        action="store_true",
+        help="Read, embed and insert the catalogue chunk by chunk",
+    )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="Only insert, update and delete the rows that changed",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=["milvus", "embedded"],
+        default=VECTOR_BACKEND,
+        help="Index in Milvus or in NumPy files searched in process",
+    )
     return parser.parse_args()
 
 
+def save_embedded_store(
+    data: pd.DataFrame, embedded_field: str, index_param: dict, embedings: list
+) -> None:
+    path = get_embedded_store_path(index_param)
+    EmbeddedVectorStore(
+        ids=data["id"].to_numpy(),
+        vectors=embedings,
+        texts=data[embedded_field].str.slice(0, 50).tolist(),
+        metric_type=index_param["metric_type"],
+        fields={field: data[field].tolist() for field in SCALAR_FIELDS},
+        provider=get_embedding_provider().name,
+    ).save(path)
+    logging.info(f"Saved {len(data)} vectors in {path}")
+
+
 def create_index(
     data: pd.DataFrame,
     embedded_field: str,
     index_param: dict,
     index_name: str,
     embedings: list,
+    chunk_size: int = INSERT_CHUNK_SIZE,
 ) -> None:
     data[index_name] = data[embedded_field]
 
-    if utility.has_collection(index_name):
-        utility.drop_collection(index_name)
+    # The new version is built aside, the alias index_name still serves searches
+    collection = create_collection(
+        embedded_field, index_param, index_name, new_collection_version(index_name)
+    )
+
+    t = time.time()
+    insert_in_chunks(
+        data=data,
+        embedded_field=embedded_field,
+        collection=collection,
+        embedings=embedings,
+        chunk_size=chunk_size,
+    )
+    collection.flush()
+    log_insert_rate(collection.name, len(data), time.time() - t)
+
+    publish_collection(collection, index_param, index_name)
+
+
+def publish_collection(
+    collection: Collection, index_param: dict, index_name: str
+) -> None:
+    # Load and warm the new version up before the alias is switched to it
+    collection.load()
+    dimension = get_embedding_provider().dimension
+    queries = np.random.default_rng().standard_normal((WARM_UP_QUERIES, dimension))
+    t = time.time()
+    collection.search(
+        data=queries.tolist(),
+        anns_field=index_name,
+        param={"metric_type": index_param["metric_type"]},
+        limit=5,
+    )
+    logging.info(f"Warmed {collection.name} up in {time.time() - t:.2f}s")
+
+    publish_collection_version(collection.name, index_name)
+    drop_old_collection_versions(index_name)
+
+
+def create_collection(
+    embedded_field: str, index_param: dict, index_name: str, collection_name: str
+) -> Collection:
+    if utility.has_collection(collection_name):
+        utility.drop_collection(collection_name)
 
     fields = [
         FieldSchema(
@@ -126,55 +352,241 @@ def create_index(
             description=embedded_field,
             max_length=200,
         ),
+        FieldSchema(
+            name="content_hash",
+            dtype=DataType.VARCHAR,
+            description="Hash of the embedded text",
+            max_length=64,
+        ),
+        FieldSchema(
+            name="Duration",
+            dtype=DataType.INT64,
+            description="Duration of the movie in minutes",
+        ),
+        FieldSchema(
+            name="FirstStart",
+            dtype=DataType.INT64,
+            description="Start of the first screening, in seconds since 1970",
+        ),
+        FieldSchema(
+            name="LastStart",
+            dtype=DataType.INT64,
+            description="Start of the last screening, in seconds since 1970",
+        ),
+        FieldSchema(
+            name="Locations",
+            dtype=DataType.ARRAY,
+            element_type=DataType.VARCHAR,
+            max_capacity=MAX_MOVIE_LOCATIONS,
+            max_length=100,
+            description="Salles of the screenings",
+        ),
         FieldSchema(
             name=index_name,
             dtype=DataType.FLOAT_VECTOR,
             description="Embedding vectors",
-            dim=DIMENSION,
+            dim=get_embedding_provider().dimension,
         ),
     ]
 
-    collection = create_an_empty_collection(
-        fields=fields, index_name=index_name, index_param=index_param
+    return create_an_empty_collection(
+        fields=fields,
+        index_name=index_name,
+        index_param=index_param,
+        collection_name=collection_name,
+        description=get_vectors_description(),
     )
 
-    insert_each_title_and_its_embedding(
-        data=data,
-        embedded_field=embedded_field,
-        collection=collection,
-        embedings=embedings,
-    )
+
+def get_vectors_description() -> str:
+    # Provider and dimension of the vectors, kept as the collection description
+    provider = get_embedding_provider()
+    return json.dumps({"provider": provider.name, "dimension": provider.dimension})
 
 
 def create_an_empty_collection(
-    fields: list, index_name: str, index_param: dict
+    fields: list,
+    index_name: str,
+    index_param: dict,
+    collection_name: str,
+    description: str = "",
 ) -> Collection:
-    schema = CollectionSchema(fields=fields)
-    collection = Collection(name=index_name, schema=schema)
-    collection.create_index(field_name=index_name, index_params=index_param)
+    schema = CollectionSchema(fields=fields, description=description)
+    collection = Collection(name=collection_name, schema=schema)
+    # search_params are only used at query time
+    collection.create_index(
+        field_name=index_name,
+        index_params={
+            key: value for key, value in index_param.items() if key != "search_params"
+        },
+    )
     return collection
 
 
-def insert_each_title_and_its_embedding(
-    data: pd.DataFrame, embedded_field: str, collection: Collection, embedings: list
+def insert_in_chunks(
+    data: pd.DataFrame,
+    embedded_field: str,
+    collection: Collection,
+    embedings: list,
+    chunk_size: int = INSERT_CHUNK_SIZE,
 ) -> None:
-    for i in data.index:
-        ins = [
-            [i],
-            [
-                data[embedded_field][i][:50]
-                if len(data[embedded_field][i]) > 50
-                else data[embedded_field][i]
-            ],
-            [embedings[i]],
+    # Column-oriented inserts, embedings are aligned with the rows of data
+    for columns, start, end in iter_column_chunks(
+        data, embedded_field, embedings, chunk_size
+    ):
+        collection.insert(columns)
+        logging.info(f"Inserted rows {start} to {end} of {len(data)}")
+
+
+def iter_column_chunks(
+    data: pd.DataFrame, embedded_field: str, embedings: list, chunk_size: int
+) -> Iterator[tuple]:
+    ids = data["id"].tolist()
+    # Without .str, which fails on the object column of an empty chunk
+    texts = [text[:50] for text in data[embedded_field].tolist()]
+    content_hashes = data["content_hash"].tolist()
+    # In the order of the fields of create_collection
+    scalar_fields = [data[field].tolist() for field in SCALAR_FIELDS]
+    for start in range(0, len(data), chunk_size):
+        end = start + chunk_size
+        columns = [
+            ids[start:end],
+            texts[start:end],
+            content_hashes[start:end],
+            *[values[start:end] for values in scalar_fields],
+            embedings[start:end],
         ]
-        collection.insert(ins)
+        yield columns, start, min(end, len(data))
+
 
+def sync_index(
+    data: pd.DataFrame,
+    embedded_field: str,
+    index_param: dict,
+    index_name: str,
+    chunk_size: int = INSERT_CHUNK_SIZE,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_workers: int = EMBEDDING_MAX_WORKERS,
+) -> dict:
+    if not has_sync_fields(index_name):
+        # Nothing to diff with, the collection is built from scratch
         logging.info(
-            f"Inserted {data[embedded_field][i]} : " f"{embed(data[embedded_field][i])}"
+            f"No content hashes, scalar fields or vectors of "
+            f"{get_vectors_description()} in {index_name}, rebuilding"
         )
+        embedings = get_embeddings(data, embedded_field, batch_size, max_workers)
+        create_index(
+            data, embedded_field, index_param, index_name, embedings, chunk_size
+        )
+        report = {"inserted": len(data), "updated": 0, "deleted": 0, "unchanged": 0}
+        logging.info(f"Synced {index_name}: {report}")
+        return report
+
+    collection = Collection(index_name)
+    collection.load()
+    inserted, updated, deleted = diff_contents(
+        dict(zip(data["id"], data["content_hash"])), get_stored_hashes(collection)
+    )
+
+    t = time.time()
+    changed = data[data["id"].isin(set(inserted) | set(updated))]
+    embedings = get_embeddings(changed, embedded_field, batch_size, max_workers)
+    for columns, start, end in iter_column_chunks(
+        changed, embedded_field, embedings, chunk_size
+    ):
+        collection.upsert(columns)
+        logging.info(f"Upserted rows {start} to {end} of {len(changed)}")
+    for start in range(0, len(deleted), chunk_size):
+        collection.delete(expr=f"id in {deleted[start : start + chunk_size]}")
+    collection.flush()
+
+    report = {
+        "inserted": len(inserted),
+        "updated": len(updated),
+        "deleted": len(deleted),
+        "unchanged": len(data) - len(inserted) - len(updated),
+    }
+    logging.info(
+        f"Synced {index_name} in {time.time() - t:.2f}s: {report}, "
+        f"{len(changed) + len(deleted)} rows touched"
+    )
+    return report
+
+
+def has_sync_fields(index_name: str) -> bool:
+    # Collections built before the content hashes or the scalar fields are
+    # rebuilt, as are those of another embedding provider or dimension, whose
+    # vectors cannot be mixed with the new ones
+    if not utility.has_collection(index_name):
+        return False
+    collection = Collection(index_name)
+    try:
+        built_with = json.loads(collection.description)
+    except ValueError:
+        return False
+    if built_with != json.loads(get_vectors_description()):
+        return False
+    fields = {field.name for field in collection.schema.fields}
+    return {"content_hash", *SCALAR_FIELDS} <= fields
+
+
+def get_stored_hashes(collection: Collection) -> dict:
+    stored_hashes = {}
+    iterator = collection.query_iterator(
+        batch_size=INSERT_CHUNK_SIZE, expr="id >= 0", output_fields=["content_hash"]
+    )
+    while True:
+        rows = iterator.next()
+        if not rows:
+            break
+        for row in rows:
+            stored_hashes[row["id"]] = row["content_hash"]
+    iterator.close()
+    return stored_hashes
+
+
+def stream_index(
+    filename: str,
+    embedded_field: str,
+    collections: list,
+    chunk_size: int = INSERT_CHUNK_SIZE,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_workers: int = EMBEDDING_MAX_WORKERS,
+) -> None:
+    t = time.time()
+    n_rows = 0
+    indexed_ids = set()
+    for data in get_data_from_csv_in_chunks(filename, embedded_field, chunk_size):
+        # Movies whose screenings span several chunks are only inserted once,
+        # with the scalar fields of all their screenings
+        data = data[~data["id"].isin(indexed_ids)]
+        indexed_ids.update(data["id"])
+        embedings = get_embeddings(data, embedded_field, batch_size, max_workers)
+        for collection in collections:
+            insert_in_chunks(data, embedded_field, collection, embedings, chunk_size)
+        n_rows += len(data)
+
+    for collection in collections:
+        collection.flush()
+    log_insert_rate(", ".join(c.name for c in collections), n_rows, time.time() - t)
+
+
+def log_insert_rate(index_name: str, n_rows: int, duration: float) -> None:
+    logging.info(
+        f"Inserted {n_rows} rows in {index_name} in {duration:.2f}s "
+        f"({n_rows / max(duration, 1e-9):.1f} rows/s)"
+    )
 
 
 if __name__ == "__main__":
     args = get_args()
-    main(args.filename, args.embeded_field)
+    main(
+        args.filename,
+        args.embeded_field,
+        args.batch_size,
+        args.max_workers,
+        args.chunk_size,
+        args.stream,
+        args.incremental,
+        args.backend,
+    )
@@ -0,0 +1,207 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+from config import (
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_MEMORY_ENTRIES,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_TOUCH_BATCH,
+)
+
+
+class EmbeddingCache:
+    # Disk-backed cache of embeddings keyed by a hash of (engine, text). The
+    # most recently used vectors are also kept in memory to answer repeated
+    # queries without reading SQLite. Their access times are written back by
+    # batches of touch_batch, so that the most queried texts are not the first
+    # evicted from disk.
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES,
+        touch_batch: int = EMBEDDING_CACHE_TOUCH_BATCH,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_hits = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access INTEGER NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access "
+            "ON embeddings (last_access)"
+        )
+        self._connection.commit()
+        # Logical clock giving the order of the accesses, for the LRU eviction
+        self._clock = self._connection.execute(
+            "SELECT COALESCE(MAX(last_access), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(engine: str, text: str) -> str:
+        return hashlib.sha256(f"{engine}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, engine: str, text: str) -> Optional[list]:
+        return self.get_many(engine, [text])[0]
+
+    def get_many(self, engine: str, texts: List[str]) -> List[Optional[list]]:
+        keys = [self.make_key(engine, text) for text in texts]
+        embeddings = [None] * len(keys)
+        with self._lock:
+            on_disk = {}
+            for i, key in enumerate(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    embeddings[i] = self._memory[key]
+                    self._memory_hits[key] = None
+                else:
+                    on_disk.setdefault(key, []).append(i)
+
+            found = self._select(list(on_disk)) if on_disk else {}
+            for key, embedding in found.items():
+                for i in on_disk[key]:
+                    embeddings[i] = embedding
+                self._remember(key, embedding)
+            if found or len(self._memory_hits) >= self.touch_batch:
+                self._touch(list(found))
+
+            n_hits = sum(embedding is not None for embedding in embeddings)
+            self.hits += n_hits
+            self.misses += len(keys) - n_hits
+        return embeddings
+
+    def get_or_embed(
+        self,
+        engine: str,
+        texts: List[str],
+        embed_function: Callable[[List[str]], list],
+        store: bool = True,
+    ) -> list:
+        # Only the texts missing from the cache are given to embed_function,
+        # each of them once, and stored unless embed_function stores them
+        # itself. Embeddings in the order of texts.
+        embeddings = self.get_many(engine, texts)
+        missing = list(
+            dict.fromkeys(
+                text for text, embedding in zip(texts, embeddings) if embedding is None
+            )
+        )
+        if not missing:
+            return embeddings
+        computed = embed_function(missing)
+        if store:
+            self.put_many(engine, missing, computed)
+        computed = dict(zip(missing, computed))
+        return [
+            computed[text] if embedding is None else embedding
+            for text, embedding in zip(texts, embeddings)
+        ]
+
+    def put(self, engine: str, text: str, embedding: list) -> None:
+        self.put_many(engine, [text], [embedding])
+
+    def put_many(self, engine: str, texts: List[str], embeddings: List[list]) -> None:
+        rows = []
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.make_key(engine, text)
+                self._remember(key, list(embedding))
+                vector = np.asarray(embedding, dtype=np.float32).tobytes()
+                self._clock += 1
+                rows.append((key, vector, self._clock))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            # The recent memory hits are kept by the eviction
+            self._touch([])
+            self._evict()
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._connection.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._touch([])
+            self._connection.close()
+
+    def _select(self, keys: List[str]) -> dict:
+        found = {}
+        # SQLite limits the number of variables of a single statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            rows = self._connection.execute(
+                "SELECT key, vector FROM embeddings "
+                f"WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+
+    def _touch(self, keys: List[str]) -> None:
+        # Read from disk now, with the memory hits not written back yet
+        keys = list(dict.fromkeys([*self._memory_hits, *keys]))
+        self._memory_hits.clear()
+        if keys:
+            self._clock += 1
+            self._connection.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(self._clock, key) for key in keys],
+            )
+            self._connection.commit()
+
+    def _remember(self, key: str, embedding: list) -> None:
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        # Drop the least recently used rows once the cache is over its size
+        self._connection.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY last_access DESC "
+            "LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+# Cache shared by the indexing pipeline and the search
+def get_embedding_cache() -> EmbeddingCache:
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+    return _embedding_cache
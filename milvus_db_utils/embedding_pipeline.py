@@ -0,0 +1,93 @@
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from config import EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_RETRIES, EMBEDDING_MAX_WORKERS
+from milvus_db_utils.embedding_cache import EmbeddingCache, get_embedding_cache
+from milvus_db_utils.embedding_providers import OpenAIProvider, get_embedding_provider
+
+# Errors worth retrying, anything else (bad request, auth...) is raised at once
+RETRYABLE_ERRORS = OpenAIProvider.retryable_errors
+
+
+# Embed texts by batches sent concurrently, keeping the input order
+def embed_texts(
+    texts: List[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_workers: int = EMBEDDING_MAX_WORKERS,
+    max_retries: int = EMBEDDING_MAX_RETRIES,
+    base_delay: float = 1.0,
+    embed_function: Optional[Callable[[List[str]], list]] = None,
+    cache: Optional[EmbeddingCache] = None,
+) -> list:
+    provider = get_embedding_provider()
+    if embed_function is None:
+        embed_function = provider.embed
+    if cache is None:
+        cache = get_embedding_cache()
+
+    def embed_missing(missing: List[str]) -> list:
+        # Texts that were never embedded, each of them once
+        batches = [
+            missing[start : start + batch_size]
+            for start in range(0, len(missing), batch_size)
+        ]
+
+        def embed_and_store(batch: List[str]) -> list:
+            # Stored as soon as embedded, kept when another batch fails for good
+            embeddings = embed_batch_with_backoff(
+                batch,
+                embed_function,
+                max_retries,
+                base_delay,
+                retryable_errors=provider.retryable_errors,
+            )
+            cache.put_many(provider.name, batch, embeddings)
+            return embeddings
+
+        t = time.time()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # executor.map yields the results in the order of the batches
+            results = executor.map(embed_and_store, batches)
+            computed = [embedding for batch in results for embedding in batch]
+        t = time.time() - t
+        logging.info(
+            f"Embedded {len(missing)} texts ({len(texts) - len(missing)} cached) "
+            f"in {len(batches)} batches in {t:.2f}s "
+            f"({len(missing) / max(t, 1e-9):.1f} texts/s)"
+        )
+        return computed
+
+    return cache.get_or_embed(provider.name, texts, embed_missing, store=False)
+
+
+def embed_batch_with_backoff(
+    batch: List[str],
+    embed_function: Callable[[List[str]], list],
+    max_retries: int = EMBEDDING_MAX_RETRIES,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    retryable_errors: tuple = RETRYABLE_ERRORS,
+) -> list:
+    for attempt in range(max_retries + 1):
+        try:
+            embeddings = embed_function(batch)
+            break
+        except retryable_errors as error:
+            if attempt == max_retries:
+                raise
+            # Exponential backoff with jitter so that workers do not retry together
+            delay = min(max_delay, base_delay * 2**attempt) * random.uniform(0.5, 1)
+            logging.warning(
+                f"Embedding batch of {len(batch)} failed ({error}), "
+                f"retry {attempt + 1}/{max_retries} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+    if len(embeddings) != len(batch):
+        raise ValueError(
+            f"Got {len(embeddings)} embeddings for a batch of {len(batch)} texts"
+        )
+    return embeddings
@@ -0,0 +1,153 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import dotenv
+import openai
+from config import (
+    EMBEDDING_PROVIDER,
+    LOCAL_EMBEDDING_BATCH_SIZE,
+    LOCAL_EMBEDDING_MAX_WORKERS,
+    LOCAL_EMBEDDING_MODEL,
+)
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # The local embedding model is optional
+    SentenceTransformer = None
+
+dotenv.load_dotenv()
+
+
+class EmbeddingProvider(ABC):
+    # Interface of the models embedding the texts. name keys their embeddings
+    # in the cache so that the vectors of two models are never mixed, dimension
+    # is the size of their vectors in the collections. embed returns a vector
+    # for each text, in order, retryable_errors are its errors worth retrying.
+    name: str
+    dimension: int
+    retryable_errors: tuple = ()
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> list:
+        pass
+
+
+class OpenAIProvider(EmbeddingProvider):
+    # One API call for each batch of texts. The embeddings cached before the
+    # providers were keyed by the engine alone, it is kept as the name.
+    retryable_errors = (
+        openai.error.APIConnectionError,
+        openai.error.RateLimitError,
+        openai.error.ServiceUnavailableError,
+        openai.error.Timeout,
+        openai.error.APIError,
+    )
+
+    def __init__(
+        self,
+        engine: Optional[str] = None,
+        dimension: Optional[int] = None,
+        api_key: Optional[str] = None,
+    ) -> None:
+        self.engine = engine or os.getenv("OPENAI_ENGINE")
+        self.name = self.engine
+        self.dimension = int(dimension or os.getenv("DIMENSION", 1536))
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+
+    def embed(self, texts: List[str]) -> list:
+        # The answer is re-ordered on its "index"
+        response = openai.Embedding.create(
+            input=texts, engine=self.engine, api_key=self.api_key
+        )
+        return [
+            item["embedding"]
+            for item in sorted(response["data"], key=lambda item: item["index"])
+        ]
+
+
+class LocalProvider(EmbeddingProvider):
+    # sentence-transformers model run on the CPU, without any network call. It
+    # is loaded once, on the first embedding. Texts are encoded by batches of
+    # batch_size, max_workers batches at a time since the model releases the
+    # GIL, a single query skips the pool. Vectors are normalized so that the
+    # L2 and IP metrics rank them alike.
+    def __init__(
+        self,
+        model_name: str = LOCAL_EMBEDDING_MODEL,
+        batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+        max_workers: int = LOCAL_EMBEDDING_MAX_WORKERS,
+        model=None,
+    ) -> None:
+        self.model_name = model_name
+        self.name = f"local/{model_name}"
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self._model = model
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                if SentenceTransformer is None:
+                    raise ImportError(
+                        "Install sentence-transformers to embed with a local model"
+                    )
+                self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> list:
+        batches = [
+            texts[start : start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        if len(batches) > 1:
+            results = self._executor.map(self.encode, batches)
+        else:
+            results = map(self.encode, batches)
+        return [vector for batch in results for vector in batch]
+
+    def encode(self, batch: List[str]) -> list:
+        return self.model.encode(
+            batch,
+            batch_size=len(batch),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        ).tolist()
+
+
+PROVIDERS = {"openai": OpenAIProvider, "local": LocalProvider}
+
+_embedding_provider = None
+_embedding_provider_lock = threading.Lock()
+
+
+def make_embedding_provider(name: str) -> EmbeddingProvider:
+    if name not in PROVIDERS:
+        raise ValueError(
+            f"Unknown embedding provider {name}, choose among {sorted(PROVIDERS)}"
+        )
+    return PROVIDERS[name]()
+
+
+# Provider of EMBEDDING_PROVIDER shared by the indexing pipeline and the search
+def get_embedding_provider() -> EmbeddingProvider:
+    global _embedding_provider
+    with _embedding_provider_lock:
+        if _embedding_provider is None:
+            _embedding_provider = make_embedding_provider(EMBEDDING_PROVIDER)
+    return _embedding_provider
+
+
+def set_embedding_provider(provider: EmbeddingProvider) -> None:
+    global _embedding_provider
+    with _embedding_provider_lock:
+        _embedding_provider = provider
@@ -0,0 +1,156 @@
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from config import MAX_MOVIE_LOCATIONS
+from milvus_db_utils.sync import get_movie_ids
+
+# Scalar fields stored with each movie vector, so that searches are filtered by
+# Milvus instead of in pandas. A movie has several screenings: its first and
+# last start and all its salles are kept.
+SCALAR_FIELDS = ["Duration", "FirstStart", "LastStart", "Locations"]
+
+
+def to_epoch_seconds(timestamps) -> np.ndarray:
+    # Catalogue timestamps are naive, they are read as UTC on both sides
+    return np.asarray(timestamps, dtype="datetime64[s]").astype("int64")
+
+
+def get_movie_scalar_fields(data: pd.DataFrame) -> pd.DataFrame:
+    # One row per movie id, from all its screenings. Movies without a known
+    # start get 0 as first and last start, date filters leave them out.
+    screenings = pd.DataFrame(
+        {
+            "id": get_movie_ids(data).to_numpy(),
+            "Duration": data["Duration"].fillna(0).astype("int64").to_numpy(),
+            "Start": data["StartDatetime"].to_numpy(),
+            "Location": data["Location"].astype(str).to_numpy(),
+        }
+    )
+    movies = screenings.groupby("id", sort=False)
+    fields = pd.DataFrame(
+        {
+            "Duration": movies["Duration"].first(),
+            "FirstStart": movies["Start"].min(),
+            "LastStart": movies["Start"].max(),
+            "Locations": movies["Location"].agg(
+                lambda locations: list(dict.fromkeys(locations))[:MAX_MOVIE_LOCATIONS]
+            ),
+        }
+    )
+    for column in ["FirstStart", "LastStart"]:
+        known = fields[column].notna().to_numpy()
+        epoch = np.zeros(len(fields), dtype="int64")
+        epoch[known] = to_epoch_seconds(fields[column].to_numpy()[known])
+        fields[column] = epoch
+    return fields
+
+
+class SearchFilters:
+    # Screenings starting in [start, end), in one of locations, lasting from
+    # min_duration to max_duration minutes. None leaves a criterion out.
+    # The vector index holds movies: expression and movie_mask keep the movies
+    # with at least a screening in the date range, mask then keeps the matching
+    # screenings of the catalogue.
+    def __init__(
+        self,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+        locations: Optional[List[str]] = None,
+        min_duration: Optional[int] = None,
+        max_duration: Optional[int] = None,
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.locations = list(locations) if locations else None
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+
+    def is_empty(self) -> bool:
+        return all(
+            value is None
+            for value in [
+                self.start,
+                self.end,
+                self.locations,
+                self.min_duration,
+                self.max_duration,
+            ]
+        )
+
+    def to_dict(self) -> dict:
+        # JSON compatible, for the search service
+        return {
+            "start": self.start.isoformat() if self.start is not None else None,
+            "end": self.end.isoformat() if self.end is not None else None,
+            "locations": self.locations,
+            "min_duration": self.min_duration,
+            "max_duration": self.max_duration,
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "SearchFilters":
+        start, end = values.get("start"), values.get("end")
+        return cls(
+            pd.Timestamp(start) if start is not None else None,
+            pd.Timestamp(end) if end is not None else None,
+            values.get("locations"),
+            values.get("min_duration"),
+            values.get("max_duration"),
+        )
+
+    def expression(self) -> str:
+        # Boolean expression over the scalar fields of the Milvus collection
+        conditions = []
+        if self.start is not None:
+            conditions.append(f"LastStart >= {int(to_epoch_seconds(self.start))}")
+        if self.end is not None:
+            conditions.append(f"FirstStart < {int(to_epoch_seconds(self.end))}")
+        if self.locations is not None:
+            conditions.append(
+                f"array_contains_any(Locations, {json.dumps(self.locations)})"
+            )
+        if self.min_duration is not None:
+            conditions.append(f"Duration >= {int(self.min_duration)}")
+        if self.max_duration is not None:
+            conditions.append(f"Duration <= {int(self.max_duration)}")
+        return " and ".join(conditions)
+
+    def movie_mask(self, fields: Dict[str, np.ndarray]) -> np.ndarray:
+        # Same as expression, on the scalar fields of an embedded store
+        mask = np.ones(len(fields["Duration"]), dtype=bool)
+        if self.start is not None:
+            mask &= fields["LastStart"] >= to_epoch_seconds(self.start)
+        if self.end is not None:
+            mask &= fields["FirstStart"] < to_epoch_seconds(self.end)
+        if self.locations is not None:
+            locations = set(self.locations)
+            mask &= np.array(
+                [not locations.isdisjoint(movie) for movie in fields["Locations"]],
+                dtype=bool,
+            )
+        if self.min_duration is not None:
+            mask &= fields["Duration"] >= self.min_duration
+        if self.max_duration is not None:
+            mask &= fields["Duration"] <= self.max_duration
+        return mask
+
+    def mask(self, data: pd.DataFrame) -> np.ndarray:
+        # Screenings of the catalogue matching the filters
+        mask = np.ones(len(data), dtype=bool)
+        if self.start is not None or self.end is not None:
+            starts = data["StartDatetime"].to_numpy()
+            known = ~pd.isna(starts)
+            if self.start is not None:
+                known &= starts >= np.datetime64(self.start)
+            if self.end is not None:
+                known &= starts < np.datetime64(self.end)
+            mask &= known
+        if self.locations is not None:
+            mask &= data["Location"].astype(str).isin(self.locations).to_numpy()
+        if self.min_duration is not None:
+            mask &= (data["Duration"] >= self.min_duration).to_numpy()
+        if self.max_duration is not None:
+            mask &= (data["Duration"] <= self.max_duration).to_numpy()
+        return mask
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from config import INDEX_MARKER_PATH, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL
+
+from file_utils import write_atomically
+
+
+def mark_index_published(description: str, path: str = INDEX_MARKER_PATH) -> None:
+    # Written by create_index once the new vectors are searchable, the caches
+    # of the running apps are emptied when they see it changed
+    line = f"{time.strftime('%Y-%m-%d %H:%M:%S')} {description}\n"
+    write_atomically(path, line.encode("utf-8"))
+
+
+def read_index_marker(path: str = INDEX_MARKER_PATH) -> Optional[tuple]:
+    # Changes with every publication, None before the first one
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+class ResultCache:
+    # Search results kept in memory, least recently used first out, for ttl
+    # seconds at most. Keys are (normalized query, index, filters, limit,
+    # offset). Every entry is dropped when the publication marker changes.
+    # The time the results took is kept with them, a hit adds it to the time
+    # saved.
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        ttl: float = RESULT_CACHE_TTL,
+        marker_path: str = INDEX_MARKER_PATH,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.marker_path = marker_path
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.seconds_saved = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._marker = self._read_marker()
+
+    @staticmethod
+    def make_key(
+        query: str, index_name: str, filters=None, limit: int = 5, offset: int = 0
+    ) -> tuple:
+        expression = filters.expression() if filters is not None else ""
+        return (normalize_query(query), index_name, expression, limit, offset)
+
+    def get(self, key: tuple) -> Optional[object]:
+        with self._lock:
+            self._check_marker()
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += entry[1]
+            return entry[2]
+
+    def put(self, key: tuple, value: object, seconds: float) -> None:
+        with self._lock:
+            self._check_marker()
+            self._entries[key] = (self.clock(), seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "seconds_saved": self.seconds_saved,
+            "invalidations": self.invalidations,
+        }
+
+    def _read_marker(self) -> Optional[tuple]:
+        return read_index_marker(self.marker_path)
+
+    def _check_marker(self) -> None:
+        marker = self._read_marker()
+        if marker != self._marker:
+            self._marker = marker
+            self._entries.clear()
+            self.invalidations += 1
@@ -3,9 +3,17 @@ import time
 
 import dotenv
 import pandas as pd
-from config import embedded_field, index_params
-from milvus_db_utils.utils import embed
-from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections
+from config import benchmark_queries, index_params
+from milvus_db_utils.sync import get_movies
+from milvus_db_utils.utils import embed_batch
+from milvus_db_utils.vector_store import (
+    MilvusVectorStore,
+    get_index_name,
+    get_vector_store,
+)
+from pymilvus import Collection
+
+from data_gathering.catalogue import get_partition_path, load_catalogue
 
 index_names = [
     f'embedded_field_{index_param["index_type"]}_{index_param["metric_type"]}'
@@ -21,86 +29,97 @@ MILVUS_PORT = os.getenv("MILVUS_PORT")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 DIMENSION = os.getenv("DIMENSION")
 
-connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
 
+# Search the database based on input text, store is a VectorStore or a Milvus
+# collection. Importing this module does not connect to Milvus, the stores of
+# get_vector_store connect on their first search. filters is a SearchFilters,
+# offset skips the best results for pagination. With a ResultCache, repeated
+# searches are neither embedded nor sent to the store. embed_function replaces
+# utils.embed_batch, e.g. to batch the queries of several users.
+def search(
+    text,
+    index_param,
+    store,
+    limit=5,
+    filters=None,
+    offset=0,
+    cache=None,
+    embed_function=None,
+):
+    if cache is not None:
+        key = cache.make_key(text, get_index_name(index_param), filters, limit, offset)
+        results = cache.get(key)
+        if results is not None:
+            return results
 
-# Search the database based on input text
-def search(text, index_param, collection):
-    # Search parameters for the index
-    index_name = (
-        f'embedded_field_{index_param["index_type"]}_{index_param["metric_type"]}'
-    )
-    search_params = {
-        "metric_type": index_param["metric_type"],
-    }
-
-    results = collection.search(
-        data=[embed(text)],  # Embeded search value
-        anns_field=index_name,  # Search across embeddings
-        param=search_params,
-        limit=5,  # Limit to five results per search
-        output_fields=[embedded_field, "id"],
+    t = time.perf_counter()
+    searches = search_many(
+        [text], index_param, store, limit, filters, offset, embed_function
     )
+    if cache is not None:
+        cache.put(key, searches[0]["results"], time.perf_counter() - t)
+    return searches[0]["results"]
+
+
+# Search several texts at once: a single embedding request and a single
+# multi-vector search. The timings of each query are its share of the batch.
+def search_many(
+    texts, index_param, store, limit=5, filters=None, offset=0, embed_function=None
+):
+    if isinstance(store, Collection):
+        store = MilvusVectorStore(store, index_param)
+    if not texts:
+        return []
 
-    ret = []
-    for hit in results[0]:
-        row = []
-        row.extend([hit.id, hit.score, hit.entity.get(embedded_field)])
-        ret.append(row)
-    return ret
+    t = time.perf_counter()
+    # Embeded search values
+    vectors = (embed_function or embed_batch)(list(texts))
+    embedding_seconds = time.perf_counter() - t
+
+    t = time.perf_counter()
+    results = store.search(vectors, limit=limit, filters=filters, offset=offset)
+    search_seconds = time.perf_counter() - t
+
+    return [
+        {
+            "query": text,
+            "results": [list(hit) for hit in hits],
+            "embedding_seconds": embedding_seconds / len(texts),
+            "search_seconds": search_seconds / len(texts),
+        }
+        for text, hits in zip(texts, results)
+    ]
 
 
 if __name__ == "__main__":
-    data = pd.read_csv("./data/etrange_festival_2023.csv")
-
-    results = pd.DataFrame(
-        columns=[
-            "id",
-            "score",
-            "embedded_field",
-            "URL",
-            "Title",
-            "Description",
-            "search_query",
-            "index_type",
-            "metric_type",
-        ]
-    )
-    search_queries = ["film d'horreur", "film érotique", "film de science-fiction"]
-    for search_query in search_queries:
-        for i, index_param in enumerate(index_params):
-            collection_name = f'embedded_field_{index_param["index_type"]}_{index_param["metric_type"]}'
-            collection = Collection(name=collection_name)
-            collection.load()
-            t = time.time()
-            searches = search(search_query, index_param, collection)
-            t = time.time() - t
-            for result in searches:
-                print(data.iloc[result[0], :])
+    # Qualitative check of the results, see milvus_db_utils.benchmark to compare
+    # index settings on recall and latency
+    data = load_catalogue(get_partition_path("etrange_festival", 2023))
+    data = get_movies(data).set_index("id")
+
+    rows = []
+    for i, index_param in enumerate(index_params):
+        store = get_vector_store(index_param)
+        for searches in search_many(benchmark_queries, index_param, store):
+            for result in searches["results"]:
+                print(data.loc[result[0], :])
                 print(data.loc[result[0], "URL"])
                 print("\n....\n")
 
-                results = pd.concat(
-                    [
-                        results,
-                        pd.DataFrame(
-                            [
-                                {
-                                    "id": result[0],
-                                    "score": result[1],
-                                    "embedded_field": result[2],
-                                    "URL": data.loc[result[0], "URL"],
-                                    "Title": data.loc[result[0], "Title"],
-                                    "Description": data.loc[result[0], "Description"],
-                                    "search_query": search_query,
-                                    "index_type": index_params[i]["index_type"],
-                                    "metric_type": index_params[i]["metric_type"],
-                                    "delta_time_query": t,
-                                }
-                            ]
-                        ),
-                    ],
-                    ignore_index=True,
+                rows.append(
+                    {
+                        "id": result[0],
+                        "score": result[1],
+                        "embedded_field": result[2],
+                        "URL": data.loc[result[0], "URL"],
+                        "Title": data.loc[result[0], "Title"],
+                        "Description": data.loc[result[0], "Description"],
+                        "search_query": searches["query"],
+                        "index_type": index_params[i]["index_type"],
+                        "metric_type": index_params[i]["metric_type"],
+                        "delta_time_query": searches["embedding_seconds"]
+                        + searches["search_seconds"],
+                    }
                 )
 
-    results.to_csv("./data/search_results.csv", index=False)
+    pd.DataFrame(rows).to_csv("./data/search_results.csv", index=False)
@@ -0,0 +1,68 @@
+import hashlib
+from typing import Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+# The scraper emits one row per screening, a movie is identified by its page.
+# Older csv files have no URL, their movies are identified by their title.
+MOVIE_ID_COLUMNS = ["URL", "Title"]
+
+
+def stable_hash(value: str) -> int:
+    # 63 bits so that the id fits in a positive Milvus INT64
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
+
+
+def get_movie_ids(data: pd.DataFrame) -> pd.Series:
+    column = next(column for column in MOVIE_ID_COLUMNS if column in data.columns)
+    return data[column].astype(str).map(stable_hash).astype("int64")
+
+
+def get_movies(data: pd.DataFrame) -> pd.DataFrame:
+    # One row per movie, the first of its screenings
+    movie_ids = get_movie_ids(data)
+    return data[~movie_ids.duplicated()].assign(id=movie_ids)
+
+
+def get_movie_screenings(data: pd.DataFrame) -> Dict[int, List[int]]:
+    # Positions of the screenings of each movie in data
+    movie_ids = get_movie_ids(data).to_numpy()
+    screenings = {}
+    for position, movie_id in enumerate(movie_ids):
+        screenings.setdefault(int(movie_id), []).append(position)
+    return screenings
+
+
+def expand_to_screenings(
+    movie_ids: List[int], screenings: Dict[int, List[int]]
+) -> List[int]:
+    # Positions of all the screenings of the movies, in the order of movie_ids
+    return [
+        position for movie_id in movie_ids for position in screenings.get(movie_id, [])
+    ]
+
+
+def get_content_hashes(
+    data: pd.DataFrame, embedded_field: str, extra_fields: Sequence[str] = ()
+) -> pd.Series:
+    # Hash of the embedded text, and of the extra fields stored with it so that
+    # a change of one of them is synced too
+    contents = data[embedded_field].astype(str)
+    for field in extra_fields:
+        contents = contents + "\x1f" + data[field].astype(str)
+    return contents.map(lambda text: hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+
+def diff_contents(
+    new_hashes: Dict[int, str], stored_hashes: Dict[int, str]
+) -> Tuple[List[int], List[int], List[int]]:
+    # Returns the ids to insert, to update and to delete
+    inserted = [i for i in new_hashes if i not in stored_hashes]
+    updated = [
+        i
+        for i, content_hash in new_hashes.items()
+        if i in stored_hashes and stored_hashes[i] != content_hash
+    ]
+    deleted = [i for i in stored_hashes if i not in new_hashes]
+    return inserted, updated, deleted
@@ -1,13 +1,17 @@
-import os
+from milvus_db_utils.embedding_cache import get_embedding_cache
+from milvus_db_utils.embedding_providers import get_embedding_provider
 
-import dotenv
-import openai
 
-dotenv.load_dotenv()
-OPENAI_ENGINE = os.getenv("OPENAI_ENGINE")
+def embed(text: str) -> list:
+    return embed_batch([text])[0]
 
 
-def embed(text: str) -> list:
-    return openai.Embedding.create(input=text, engine=OPENAI_ENGINE)["data"][0][
-        "embedding"
-    ]
+def embed_batch(texts: list) -> list:
+    # Only the texts missing from the cache are sent to the provider
+    provider = get_embedding_provider()
+    return get_embedding_cache().get_or_embed(provider.name, texts, provider.embed)
+
+
+def request_embeddings(texts: list) -> list:
+    # One call of the provider for the whole batch, without the cache
+    return get_embedding_provider().embed(texts)
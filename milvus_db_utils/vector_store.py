@@ -0,0 +1,322 @@
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from config import (
+    EMBEDDED_ANN,
+    INDEX_MARKER_PATH,
+    VECTOR_BACKEND,
+    VECTOR_STORE_PATH,
+    embedded_field,
+)
+from milvus_db_utils.connection import MilvusConnectionManager, get_connection_manager
+from milvus_db_utils.embedding_providers import (
+    EmbeddingProvider,
+    get_embedding_provider,
+)
+from milvus_db_utils.filters import SearchFilters
+from milvus_db_utils.result_cache import read_index_marker
+from pymilvus import Collection
+
+from file_utils import atomic_path
+
+try:
+    import hnswlib
+except ImportError:  # The approximate search of the embedded store is optional
+    hnswlib = None
+
+
+def get_index_name(index_param: dict) -> str:
+    return f'embedded_field_{index_param["index_type"]}_{index_param["metric_type"]}'
+
+
+class VectorStore(ABC):
+    # Interface of the stores searched by milvus_db_utils.search. search returns,
+    # for each query vector, a list of (id, score, text) from best to worst,
+    # skipping the offset best ones, among the movies matching filters.
+    @abstractmethod
+    def search(
+        self,
+        vectors: List[list],
+        limit: int = 5,
+        filters: Optional[SearchFilters] = None,
+        offset: int = 0,
+    ) -> List[List[tuple]]:
+        pass
+
+
+class MilvusVectorStore(VectorStore):
+    # Searches the given collection, or the one named after index_param through
+    # a connection manager that keeps it loaded and reconnects when needed
+    def __init__(
+        self,
+        collection: Optional[Collection],
+        index_param: dict,
+        connection_manager: Optional[MilvusConnectionManager] = None,
+    ) -> None:
+        self.collection = collection
+        self.index_param = index_param
+        self.connection_manager = connection_manager
+
+    def search(
+        self,
+        vectors: List[list],
+        limit: int = 5,
+        filters: Optional[SearchFilters] = None,
+        offset: int = 0,
+    ) -> List[List[tuple]]:
+        # Filters are evaluated by Milvus on the scalar fields of the collection
+        expression = filters.expression() if filters is not None else ""
+
+        def search_collection(collection: Collection):
+            return collection.search(
+                data=vectors,  # Embeded search values
+                anns_field=get_index_name(self.index_param),  # Search across embeddings
+                param={
+                    "metric_type": self.index_param["metric_type"],
+                    "params": self.index_param.get("search_params", {}),
+                },
+                limit=limit,
+                expr=expression or None,
+                output_fields=[embedded_field, "id"],
+                offset=offset,
+            )
+
+        if self.collection is not None:
+            results = search_collection(self.collection)
+        else:
+            results = self.connection_manager.run(
+                get_index_name(self.index_param), search_collection
+            )
+        return [
+            [(hit.id, hit.score, hit.entity.get(embedded_field)) for hit in hits]
+            for hits in results
+        ]
+
+
+class EmbeddedVectorStore(VectorStore):
+    # In-process store: the vectors are a float32 matrix, optionally memory-mapped
+    # from disk, searched exhaustively or with hnswlib when ann is set. Scores
+    # follow Milvus: squared distance for L2, similarity for IP and COSINE.
+    # fields holds the scalar fields of the movies, searched with filters
+    # exhaustively among the matching movies. provider is the name of the
+    # embedding provider of the vectors, saved with them.
+    def __init__(
+        self,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        texts: List[str],
+        metric_type: str = "L2",
+        ann: bool = False,
+        fields: Optional[Dict[str, list]] = None,
+        provider: Optional[str] = None,
+    ) -> None:
+        if metric_type not in ("L2", "IP", "COSINE"):
+            raise ValueError(f"Unknown metric_type {metric_type}")
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.vectors = np.asanyarray(vectors, dtype=np.float32)
+        self.texts = list(texts)
+        self.metric_type = metric_type
+        self.provider = provider
+        self.fields = None
+        if fields is not None:
+            # Locations are lists of salles, the other fields integers
+            self.fields = {
+                name: list(values)
+                if name == "Locations"
+                else np.asarray(values, dtype=np.int64)
+                for name, values in fields.items()
+            }
+        if metric_type == "COSINE":
+            self.vectors = self.vectors / np.linalg.norm(self.vectors, axis=1)[:, None]
+        # Squared norms are computed once, only the dot products depend on queries
+        self.squared_norms = (self.vectors**2).sum(axis=1)
+        self.ann_index = self._build_ann_index() if ann else None
+
+    def search(
+        self,
+        vectors: List[list],
+        limit: int = 5,
+        filters: Optional[SearchFilters] = None,
+        offset: int = 0,
+    ) -> List[List[tuple]]:
+        queries = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        mask = None
+        if filters is not None and not filters.is_empty():
+            if self.fields is None:
+                raise ValueError("The store has no scalar fields, rebuild it")
+            mask = filters.movie_mask(self.fields)
+        n_candidates = len(self.ids) if mask is None else int(mask.sum())
+        limit = min(limit + offset, n_candidates)
+        if limit <= offset:
+            return [[] for _ in range(len(queries))]
+        if self.metric_type == "COSINE":
+            queries = queries / np.linalg.norm(queries, axis=1)[:, None]
+        if self.ann_index is not None and mask is None:
+            positions, scores = self._ann_search(queries, limit)
+        else:
+            positions, scores = self._exact_search(queries, limit, mask)
+        return [
+            [
+                (int(self.ids[position]), float(score), self.texts[position])
+                for position, score in zip(query_positions, query_scores)
+            ][offset:]
+            for query_positions, query_scores in zip(positions, scores)
+        ]
+
+    def save(self, path: str) -> None:
+        # Written aside then moved, a reader never sees half written files
+        with atomic_path(path) as tmp_path:
+            os.makedirs(tmp_path)
+            np.save(os.path.join(tmp_path, "ids.npy"), self.ids)
+            np.save(os.path.join(tmp_path, "vectors.npy"), self.vectors)
+            with open(os.path.join(tmp_path, "texts.json"), "w") as f:
+                json.dump(
+                    {
+                        "metric_type": self.metric_type,
+                        "provider": self.provider,
+                        "dimension": self.vectors.shape[1],
+                        "texts": self.texts,
+                        "fields": self._fields_to_json(),
+                    },
+                    f,
+                )
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        mmap: bool = True,
+        ann: bool = False,
+        provider: Optional[EmbeddingProvider] = None,
+    ) -> "EmbeddedVectorStore":
+        # With a provider, the vectors must be its own, queries embedded by
+        # another model cannot be compared with them
+        with open(os.path.join(path, "texts.json")) as f:
+            metadata = json.load(f)
+        if provider is not None and (
+            metadata.get("provider"),
+            metadata.get("dimension"),
+        ) != (provider.name, provider.dimension):
+            raise ValueError(
+                f"{path} holds vectors of {metadata.get('provider')} of dimension "
+                f"{metadata.get('dimension')}, not of {provider.name} of dimension "
+                f"{provider.dimension}, run create_index again"
+            )
+        return cls(
+            ids=np.load(os.path.join(path, "ids.npy")),
+            vectors=np.load(
+                os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None
+            ),
+            texts=metadata["texts"],
+            metric_type=metadata["metric_type"],
+            ann=ann,
+            fields=metadata.get("fields"),
+            provider=metadata.get("provider"),
+        )
+
+    def _fields_to_json(self) -> Optional[Dict[str, list]]:
+        if self.fields is None:
+            return None
+        return {
+            name: values if name == "Locations" else values.tolist()
+            for name, values in self.fields.items()
+        }
+
+    def _exact_search(
+        self, queries: np.ndarray, limit: int, mask: Optional[np.ndarray] = None
+    ) -> tuple:
+        products = queries @ self.vectors.T
+        if self.metric_type == "L2":
+            scores = (
+                (queries**2).sum(axis=1)[:, None]
+                - 2 * products
+                + self.squared_norms[None, :]
+            )
+            order_scores = -scores
+        else:
+            scores = order_scores = products
+        if mask is not None:
+            # Movies out of the filters are ranked last, limit keeps them out
+            order_scores = np.where(mask[None, :], order_scores, -np.inf)
+        top = np.argpartition(-order_scores, limit - 1, axis=1)[:, :limit]
+        order = np.argsort(-np.take_along_axis(order_scores, top, axis=1), axis=1)
+        positions = np.take_along_axis(top, order, axis=1)
+        return positions, np.take_along_axis(scores, positions, axis=1)
+
+    def _build_ann_index(self):
+        if hnswlib is None:
+            raise ImportError("hnswlib is needed for the approximate search")
+        space = "l2" if self.metric_type == "L2" else "ip"
+        index = hnswlib.Index(space=space, dim=self.vectors.shape[1])
+        index.init_index(max_elements=max(len(self.ids), 1), M=16, ef_construction=200)
+        index.add_items(self.vectors, np.arange(len(self.ids)))
+        index.set_ef(64)
+        return index
+
+    def _ann_search(self, queries: np.ndarray, limit: int) -> tuple:
+        positions, distances = self.ann_index.knn_query(queries, k=limit)
+        # hnswlib returns 1 - similarity for the inner product
+        scores = distances if self.metric_type == "L2" else 1 - distances
+        return positions, scores
+
+
+class ReloadingVectorStore(VectorStore):
+    # Store loaded again by load when create_index publishes new vectors, so
+    # that a long running app does not keep searching the old files
+    def __init__(
+        self,
+        load: Callable[[], VectorStore],
+        marker_path: str = INDEX_MARKER_PATH,
+    ) -> None:
+        self.load = load
+        self.marker_path = marker_path
+        self._lock = threading.Lock()
+        self._marker = read_index_marker(marker_path)
+        self.store = load()
+
+    def search(
+        self,
+        vectors: List[list],
+        limit: int = 5,
+        filters: Optional[SearchFilters] = None,
+        offset: int = 0,
+    ) -> List[List[tuple]]:
+        return self.get_store().search(vectors, limit, filters, offset)
+
+    def get_store(self) -> VectorStore:
+        marker = read_index_marker(self.marker_path)
+        with self._lock:
+            if marker != self._marker:
+                # The previous store keeps serving the searches already running
+                self.store = self.load()
+                self._marker = marker
+            return self.store
+
+
+def get_embedded_store_path(index_param: dict) -> str:
+    return os.path.join(VECTOR_STORE_PATH, get_index_name(index_param))
+
+
+def get_vector_store(
+    index_param: dict,
+    backend: str = VECTOR_BACKEND,
+    collection: Optional[Collection] = None,
+    connection_manager: Optional[MilvusConnectionManager] = None,
+) -> VectorStore:
+    if backend == "embedded":
+        return ReloadingVectorStore(
+            lambda: EmbeddedVectorStore.load(
+                get_embedded_store_path(index_param),
+                ann=EMBEDDED_ANN,
+                provider=get_embedding_provider(),
+            )
+        )
+    if backend == "milvus":
+        if collection is None and connection_manager is None:
+            connection_manager = get_connection_manager()
+        return MilvusVectorStore(collection, index_param, connection_manager)
+    raise ValueError(f"Unknown vector backend {backend}")
@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+import pandas as pd
+from icalendar import Calendar, Event
+
+
+def make_calendar(selected_data: pd.DataFrame) -> bytes:
+    # iCalendar file with an event per screening
+    cal = Calendar()
+    for _, row in selected_data.iterrows():
+        ev = Event()
+        ev.add("summary", row["Title"])
+        ev.add("dtstart", row["StartDatetime"])
+        ev.add("dtend", row["StartDatetime"] + timedelta(minutes=int(row["Duration"])))
+        ev.add("location", row["Location"])
+        cal.add_component(ev)
+    return cal.to_ical()
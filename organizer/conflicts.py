@@ -0,0 +1,82 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+class ConflictIndex:
+    # Screenings sorted by start, built once per dataset. Two screenings conflict
+    # when they overlap in time. Screenings without a start or an end never
+    # conflict.
+    # The screenings overlapping an interval start before its end and less than
+    # max_duration before its start, so they are found by binary search in a
+    # window of the sorted starts. A selection is checked against all the
+    # screenings with the prefix maxima of its ends, in O(log k) per screening
+    # for k selected screenings.
+    def __init__(self, starts: np.ndarray, ends: np.ndarray) -> None:
+        starts = np.asarray(starts, dtype="datetime64[ns]").astype("int64")
+        ends = np.asarray(ends, dtype="datetime64[ns]").astype("int64")
+        self.known = (starts != np.iinfo("int64").min) & (ends != np.iinfo("int64").min)
+        self.starts = starts
+        self.ends = ends
+        known_positions = np.flatnonzero(self.known)
+        self.order = known_positions[np.argsort(starts[known_positions], kind="stable")]
+        self.sorted_starts = starts[self.order]
+        self.sorted_ends = ends[self.order]
+        durations = self.sorted_ends - self.sorted_starts
+        self.max_duration = int(durations.max()) if len(durations) else 0
+
+    @classmethod
+    def from_data(cls, data: pd.DataFrame) -> "ConflictIndex":
+        return cls(data["StartDatetime"].to_numpy(), data["EndDatetime"].to_numpy())
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlapping(self, position: int) -> np.ndarray:
+        # Positions of the other screenings overlapping the screening at position
+        if not self.known[position]:
+            return np.array([], dtype="int64")
+        start, end = self.starts[position], self.ends[position]
+        first = np.searchsorted(self.sorted_starts, start - self.max_duration, "right")
+        last = np.searchsorted(self.sorted_starts, end, "left")
+        window = slice(first, last)
+        positions = self.order[window][self.sorted_ends[window] > start]
+        return positions[positions != position]
+
+    def conflicts(self, selected: List[int]) -> np.ndarray:
+        # Selected positions overlapping another selected screening
+        selected = self._known_selection(selected)
+        starts = self.starts[selected]
+        ends = self.ends[selected]
+        order = np.argsort(starts, kind="stable")
+        starts, ends = starts[order], ends[order]
+        # An earlier screening still running, or the next one already started
+        max_previous_ends = np.maximum.accumulate(np.r_[np.iinfo("int64").min, ends])
+        overlaps_previous = max_previous_ends[:-1] > starts
+        overlaps_next = np.r_[starts[1:] < ends[:-1], False]
+        return np.sort(selected[order][overlaps_previous | overlaps_next])
+
+    def fits(self, selected: List[int]) -> np.ndarray:
+        # Mask of the screenings that overlap no selected screening but themselves
+        selected = self._known_selection(selected)
+        order = np.argsort(self.starts[selected], kind="stable")
+        starts = self.starts[selected][order]
+        max_ends = np.maximum.accumulate(self.ends[selected][order])
+        # Selected screenings starting before the end of each screening, the
+        # latest end among them tells whether one is still running at its start
+        n_before = np.searchsorted(starts, self.ends, "left")
+        latest_end = np.where(
+            n_before > 0,
+            max_ends[np.maximum(n_before - 1, 0)] if len(max_ends) else 0,
+            np.iinfo("int64").min,
+        )
+        mask = ~self.known | (latest_end <= self.starts)
+        # A selected screening always overlaps itself
+        mask[selected] = True
+        mask[self.conflicts(selected)] = False
+        return mask
+
+    def _known_selection(self, selected: List[int]) -> np.ndarray:
+        selected = np.unique(np.asarray(selected, dtype="int64"))
+        return selected[self.known[selected]]
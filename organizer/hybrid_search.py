@@ -0,0 +1,138 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from config import RRF_K, SEARCH_CANDIDATES, SEARCH_LIMIT, SEARCH_MAX_WORKERS
+from milvus_db_utils.filters import SearchFilters
+from milvus_db_utils.result_cache import ResultCache
+from milvus_db_utils.search import search
+from milvus_db_utils.sync import (
+    expand_to_screenings,
+    get_movie_ids,
+    get_movie_screenings,
+)
+from milvus_db_utils.vector_store import VectorStore
+
+from organizer.text_index import TextIndex
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]], k: float = RRF_K
+) -> List[Tuple[int, float]]:
+    # Each id gets 1 / (k + rank) from every ranking it is in, ranks from 1.
+    # Returns (id, score) from best to worst, ties in order of appearance.
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class HybridSearch:
+    # Keyword and semantic search of a catalogue, fused by reciprocal rank. The
+    # vector search, mostly waiting for the embedding and Milvus, runs in a
+    # thread while the keyword index is searched.
+    # Both rankings are made of movies, a movie takes the keyword rank of its
+    # best screening. Filters are pushed to the vector store as a scalar
+    # expression over movies, then the screenings are filtered with a mask.
+    # Without a store, or when it fails, results are the keyword ones. With a
+    # cache, the vector results of repeated queries are reused. max_workers
+    # vector searches run at once, for the sessions sharing the instance.
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        text_index: TextIndex,
+        store: Optional[VectorStore] = None,
+        index_param: Optional[dict] = None,
+        rrf_k: float = RRF_K,
+        candidates: int = SEARCH_CANDIDATES,
+        cache: Optional[ResultCache] = None,
+        embed_function: Optional[Callable[[List[str]], list]] = None,
+        max_workers: int = SEARCH_MAX_WORKERS,
+    ) -> None:
+        self.data = data
+        self.text_index = text_index
+        self.store = store
+        self.index_param = index_param
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+        self.cache = cache
+        self.embed_function = embed_function
+        self.movie_ids = get_movie_ids(data).to_numpy()
+        self.screenings = get_movie_screenings(data)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def search(
+        self,
+        query: str,
+        filters: Optional[SearchFilters] = None,
+        limit: int = SEARCH_LIMIT,
+        offset: int = 0,
+    ) -> dict:
+        # The movies ranked offset to offset + limit, their scores, and the
+        # positions of their screenings matching the filters
+        t = time.perf_counter()
+        # Fused scores depend on the depth of the rankings, it does not change
+        # from a page to the next
+        depth = max(offset + limit, self.candidates)
+        filters = filters if filters is not None and not filters.is_empty() else None
+        mask = filters.mask(self.data) if filters is not None else None
+
+        semantic = None
+        if self.store is not None and query.strip():
+            semantic = self._executor.submit(
+                self.semantic_ranking, query, filters, mask, depth
+            )
+        rankings = [self.keyword_ranking(query, mask, depth)]
+        if semantic is not None:
+            try:
+                rankings.append(semantic.result())
+            except Exception as e:
+                logging.warning(f"Semantic search failed, keywords only: {e}")
+
+        movies = reciprocal_rank_fusion(rankings, self.rrf_k)[offset : offset + limit]
+        positions = expand_to_screenings(
+            [movie for movie, _ in movies], self.screenings
+        )
+        if mask is not None:
+            positions = [position for position in positions if mask[position]]
+        return {
+            "movies": movies,
+            "positions": positions,
+            "seconds": time.perf_counter() - t,
+        }
+
+    def keyword_ranking(
+        self, query: str, mask: Optional[np.ndarray], depth: int
+    ) -> List[int]:
+        positions = self.text_index.search(query)
+        if mask is not None:
+            positions = positions[mask[positions]]
+        return pd.unique(self.movie_ids[positions])[:depth].tolist()
+
+    def semantic_ranking(
+        self,
+        query: str,
+        filters: Optional[SearchFilters],
+        mask: Optional[np.ndarray],
+        depth: int,
+    ) -> List[int]:
+        results = search(
+            query,
+            self.index_param,
+            self.store,
+            depth,
+            filters,
+            cache=self.cache,
+            embed_function=self.embed_function,
+        )
+        movies = [result[0] for result in results]
+        if mask is None:
+            return movies
+        # The store filters movies, some have no screening matching all the
+        # filters at once
+        matching = set(self.movie_ids[mask].tolist())
+        return [movie for movie in movies if movie in matching]
@@ -0,0 +1,323 @@
+import bisect
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from config import DAILY_WINDOW, SCHEDULE_TIME_LIMIT, TRAVEL_BUFFER
+from milvus_db_utils.sync import get_movie_ids
+
+MINUTES_PER_DAY = 24 * 60
+EPSILON = 1e-9
+
+
+def optimise_schedule(
+    data: pd.DataFrame,
+    wishlist: Dict[int, float],
+    travel_buffer: float = TRAVEL_BUFFER,
+    travel_buffers: Optional[Dict[Tuple[str, str], float]] = None,
+    daily_window: Optional[Tuple[str, str]] = DAILY_WINDOW,
+    time_limit: float = SCHEDULE_TIME_LIMIT,
+) -> dict:
+    # Picks at most one screening of each film of the wishlist (movie id ->
+    # weight) to maximise the weight of the films seen. Two films need
+    # travel_buffer minutes in between when they are in different salles, or the
+    # minutes of travel_buffers[(from, to)]. Screenings starting or ending out of
+    # the daily window, if any, are left out.
+    # Returns the positions of the screenings in data, ready for
+    # app.create_ics_file, their weight, an upper bound of the best weight, and
+    # whether the programme is proven optimal within time_limit.
+    t = time.perf_counter()
+    candidates = get_candidates(data, wishlist, daily_window)
+    locations, names = pd.factorize(candidates["Location"])
+    problem = ScheduleProblem(
+        candidates["start"].tolist(),
+        candidates["end"].tolist(),
+        locations.tolist(),
+        candidates["movie"].tolist(),
+        candidates["weight"].tolist(),
+        get_buffers(list(names), travel_buffer, travel_buffers or {}),
+    )
+    value, chosen, upper_bound = problem.solve(t + time_limit)
+    return {
+        "positions": candidates["position"].to_numpy()[chosen].tolist(),
+        "weight": value,
+        "optimal": value >= upper_bound - EPSILON,
+        "upper_bound": upper_bound,
+        "seconds": time.perf_counter() - t,
+    }
+
+
+def get_candidates(
+    data: pd.DataFrame,
+    wishlist: Dict[int, float],
+    daily_window: Optional[Tuple[str, str]],
+) -> pd.DataFrame:
+    # Screenings of the wishlist within the daily window, times in minutes
+    movie_ids = get_movie_ids(data).to_numpy()
+    wanted = np.isin(movie_ids, list(wishlist))
+    wanted &= data["StartDatetime"].notna().to_numpy()
+    wanted &= data["EndDatetime"].notna().to_numpy()
+    candidates = pd.DataFrame(
+        {
+            "position": np.flatnonzero(wanted),
+            "movie": movie_ids[wanted],
+            "start": to_epoch_minutes(data["StartDatetime"].to_numpy()[wanted]),
+            "end": to_epoch_minutes(data["EndDatetime"].to_numpy()[wanted]),
+            "Location": data["Location"].astype(str).to_numpy()[wanted],
+        }
+    )
+    candidates["weight"] = candidates["movie"].map(wishlist).astype(float)
+    if daily_window is None:
+        return candidates
+
+    window_start, window_end = [to_minutes(hour) for hour in daily_window]
+    if window_end <= window_start:
+        # The window ends after midnight
+        window_end += MINUTES_PER_DAY
+    # Opening of the last window started before each screening, a screening
+    # after midnight belongs to the window of the day before
+    opening = (
+        candidates["start"] - window_start
+    ) // MINUTES_PER_DAY * MINUTES_PER_DAY + window_start
+    in_window = candidates["end"] <= opening + window_end - window_start
+    return candidates[in_window].reset_index(drop=True)
+
+
+def to_epoch_minutes(timestamps: np.ndarray) -> np.ndarray:
+    return timestamps.astype("datetime64[m]").astype("int64")
+
+
+def to_minutes(hour: str) -> int:
+    hours, minutes = hour.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def get_buffers(
+    locations: List[str],
+    travel_buffer: float,
+    travel_buffers: Dict[Tuple[str, str], float],
+) -> List[List[float]]:
+    # Minutes between the end of a film in a salle and the start of the next one
+    # in another salle, none in the same salle
+    buffers = []
+    for origin in locations:
+        row = []
+        for destination in locations:
+            if origin == destination:
+                row.append(0)
+            else:
+                row.append(
+                    travel_buffers.get(
+                        (origin, destination),
+                        travel_buffers.get((destination, origin), travel_buffer),
+                    )
+                )
+        buffers.append(row)
+    return buffers
+
+
+class ScheduleProblem:
+    # Screenings of the wishlist as lists, indexed by candidate, with the travel
+    # buffers between salles as a matrix of location codes. Buffers are assumed
+    # shorter than a film, so that a programme is feasible when each screening
+    # is compatible with the one before it.
+    # Without the one screening per film rule, the best programme is a weighted
+    # interval scheduling solved by dynamic programming (best_chain). The rule is
+    # relaxed with a Lagrange multiplier per film, updated by subgradient steps:
+    # each step gives an upper bound, and a programme once the films seen twice
+    # are removed and free films added back. A branch and bound then uses the
+    # time left to close the gap on small wishlists.
+    def __init__(
+        self,
+        starts: List[int],
+        ends: List[int],
+        locations: List[int],
+        movies: List[int],
+        weights: List[float],
+        buffers: List[List[float]],
+    ) -> None:
+        self.starts = starts
+        self.ends = ends
+        self.locations = locations
+        self.movies = movies
+        self.weights = weights
+        self.buffers = buffers
+        self.by_end = sorted(range(len(starts)), key=lambda i: ends[i])
+        self.screenings: Dict[int, List[int]] = {}
+        for i, movie in enumerate(movies):
+            self.screenings.setdefault(movie, []).append(i)
+        self.film_weights = {m: weights[s[0]] for m, s in self.screenings.items()}
+
+    def solve(self, deadline: float) -> Tuple[float, List[int], float]:
+        # Returns the weight and the screenings of the best programme found, by
+        # start, and the best upper bound
+        upper_bound, chain = self.best_chain(self.weights)
+        best_value, best = self.repair(chain)
+        if best_value < upper_bound - EPSILON:
+            # Half of the time for the relaxation, the rest for the exact search
+            middle = time.perf_counter() + (deadline - time.perf_counter()) / 2
+            value, chosen, upper_bound = self.relax(
+                (best_value, best), upper_bound, middle
+            )
+            best_value, best = max((best_value, best), (value, chosen))
+        if best_value < upper_bound - EPSILON:
+            if self.branch_and_bound((best_value, best), upper_bound, deadline):
+                best_value, best = self.best
+                upper_bound = best_value
+            else:
+                best_value, best = self.best
+        return best_value, sorted(best, key=lambda i: self.starts[i]), upper_bound
+
+    def best_chain(self, weights: List[float]) -> Tuple[float, List[int]]:
+        # Weighted interval scheduling with travel buffers. Screenings are taken
+        # by end, the best chain ending with a screening extends the best chain
+        # among the screenings of each salle ending early enough to walk to it,
+        # found by binary search in the prefix maxima of the salle.
+        n_locations = len(self.buffers)
+        location_ends = [[] for _ in range(n_locations)]
+        location_best = [[] for _ in range(n_locations)]
+        previous = [-1] * len(self.starts)
+        best_value, best_last = 0.0, -1
+        for j in self.by_end:
+            if weights[j] <= 0:
+                continue
+            value, last = 0.0, -1
+            location_j = self.locations[j]
+            for location in range(n_locations):
+                latest_end = self.starts[j] - self.buffers[location][location_j]
+                k = bisect.bisect_right(location_ends[location], latest_end)
+                if k and location_best[location][k - 1][0] > value:
+                    value, last = location_best[location][k - 1]
+            value += weights[j]
+            previous[j] = last
+            prefix = location_best[location_j]
+            location_ends[location_j].append(self.ends[j])
+            prefix.append(max(prefix[-1], (value, j)) if prefix else (value, j))
+            if value > best_value:
+                best_value, best_last = value, j
+
+        chain = []
+        while best_last != -1:
+            chain.append(best_last)
+            best_last = previous[best_last]
+        return best_value, chain[::-1]
+
+    def repair(self, chain: List[int]) -> Tuple[float, List[int]]:
+        # A programme from a chain: the first screening of each film is kept,
+        # then the films left out are added, heaviest first, where they fit
+        chosen = []
+        seen = set()
+        for i in chain:
+            if self.movies[i] not in seen:
+                seen.add(self.movies[i])
+                chosen.append(i)
+        chosen_starts = [self.starts[i] for i in chosen]
+        films = sorted(
+            (m for m in self.screenings if m not in seen),
+            key=lambda m: -self.film_weights[m],
+        )
+        for movie in films:
+            for i in self.screenings[movie]:
+                k = bisect.bisect_left(chosen_starts, self.starts[i])
+                if (k == 0 or self.follows(chosen[k - 1], i)) and (
+                    k == len(chosen) or self.follows(i, chosen[k])
+                ):
+                    chosen.insert(k, i)
+                    chosen_starts.insert(k, self.starts[i])
+                    break
+        return sum(self.weights[i] for i in chosen), chosen
+
+    def follows(self, i: int, j: int) -> bool:
+        # Whether j can be seen after i
+        buffer = self.buffers[self.locations[i]][self.locations[j]]
+        return self.ends[i] + buffer <= self.starts[j]
+
+    def relax(
+        self, incumbent: Tuple[float, List[int]], upper_bound: float, deadline: float
+    ) -> Tuple[float, List[int], float]:
+        # Subgradient steps on the multipliers of the films. A film seen k times
+        # by the chain gets its multiplier raised by k - 1 steps, a film not seen
+        # lowered, down to 0.
+        best_value, best = incumbent
+        multipliers = {movie: 0.0 for movie in self.screenings}
+        scale = 2.0
+        stalled = 0
+        while time.perf_counter() < deadline and scale > 1e-3:
+            weights = [
+                weight - multipliers[movie]
+                for weight, movie in zip(self.weights, self.movies)
+            ]
+            value, chain = self.best_chain(weights)
+            bound = value + sum(multipliers.values())
+            if bound < upper_bound - EPSILON:
+                upper_bound, stalled = bound, 0
+            else:
+                stalled += 1
+                if stalled >= 3:
+                    scale, stalled = scale / 2, 0
+            candidate = self.repair(chain)
+            if candidate[0] > best_value:
+                best_value, best = candidate
+            if best_value >= upper_bound - EPSILON:
+                break
+
+            counts = {movie: 0 for movie in self.screenings}
+            for i in chain:
+                counts[self.movies[i]] += 1
+            gradient = {movie: count - 1 for movie, count in counts.items()}
+            norm = sum(g * g for g in gradient.values())
+            if norm == 0:
+                break
+            step = scale * (bound - best_value) / norm
+            for movie, g in gradient.items():
+                multipliers[movie] = max(0.0, multipliers[movie] + step * g)
+        return best_value, best, upper_bound
+
+    def branch_and_bound(
+        self, incumbent: Tuple[float, List[int]], upper_bound: float, deadline: float
+    ) -> bool:
+        # Depth first search over the films, heaviest and least screened first,
+        # each one seen at one of its screenings or skipped. Branches that cannot
+        # beat the best programme found are cut. The best programme is left in
+        # self.best, returns whether the search was completed.
+        films = sorted(
+            self.screenings,
+            key=lambda m: (-self.film_weights[m], len(self.screenings[m])),
+        )
+        film_weights = [self.film_weights[m] for m in films]
+        remaining = np.cumsum(film_weights[::-1])[::-1].tolist() + [0.0]
+        self.best = incumbent
+        completed = True
+
+        def compatible(i: int, chosen: List[int]) -> bool:
+            for c in chosen:
+                if self.starts[c] <= self.starts[i]:
+                    if not self.follows(c, i):
+                        return False
+                elif not self.follows(i, c):
+                    return False
+            return True
+
+        def search(f: int, chosen: List[int], value: float) -> bool:
+            # Returns True to stop the whole search
+            nonlocal completed
+            if value + remaining[f] <= self.best[0] + EPSILON:
+                return False
+            if time.perf_counter() > deadline:
+                completed = False
+                return True
+            if f == len(films):
+                self.best = (value, list(chosen))
+                return value >= upper_bound - EPSILON
+            for i in self.screenings[films[f]]:
+                if compatible(i, chosen):
+                    chosen.append(i)
+                    stop = search(f + 1, chosen, value + film_weights[f])
+                    chosen.pop()
+                    if stop:
+                        return True
+            return search(f + 1, chosen, value)
+
+        search(0, [], 0.0)
+        return completed
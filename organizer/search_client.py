@@ -0,0 +1,50 @@
+from typing import Optional
+
+import requests
+from config import SEARCH_LIMIT, SEARCH_SERVICE_URL, SERVICE_TIMEOUT
+from milvus_db_utils.filters import SearchFilters
+
+
+class SearchClient:
+    # Client of organizer.search_service, catalogues are named by their path
+    def __init__(
+        self, url: str = SEARCH_SERVICE_URL, timeout: float = SERVICE_TIMEOUT
+    ) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def search(
+        self,
+        catalogue: str,
+        query: str,
+        filters: Optional[SearchFilters] = None,
+        limit: int = SEARCH_LIMIT,
+        offset: int = 0,
+    ) -> dict:
+        return self._post(
+            "/search",
+            {
+                "catalogue": catalogue,
+                "query": query,
+                "filters": filters.to_dict() if filters is not None else None,
+                "limit": limit,
+                "offset": offset,
+            },
+        ).json()
+
+    def health(self) -> dict:
+        return self._get("/health").json()
+
+    def metrics(self) -> dict:
+        return self._get("/metrics").json()
+
+    def _post(self, path: str, body: dict) -> requests.Response:
+        response = self.session.post(self.url + path, json=body, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def _get(self, path: str) -> requests.Response:
+        response = self.session.get(self.url + path, timeout=self.timeout)
+        response.raise_for_status()
+        return response
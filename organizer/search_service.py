@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from aiohttp import web
+from config import (
+    SEARCH_LIMIT,
+    SERVICE_BATCH_SIZE,
+    SERVICE_BATCH_WAIT,
+    SERVICE_HOST,
+    SERVICE_MAX_DEPTH,
+    SERVICE_MAX_LIMIT,
+    SERVICE_MAX_WORKERS,
+    SERVICE_PORT,
+    index_params,
+)
+from milvus_db_utils.filters import SearchFilters
+from milvus_db_utils.result_cache import ResultCache
+from milvus_db_utils.utils import embed_batch
+from milvus_db_utils.vector_store import get_vector_store
+
+from data_gathering.catalogue import list_catalogue, load_catalogue
+from organizer.hybrid_search import HybridSearch
+from organizer.text_index import TextIndex
+
+LATENCY_WINDOW = 10_000  # Searches kept for the latency percentiles
+
+
+class EmbeddingBatcher:
+    # Query embeddings of concurrent requests sent in the same call. A text
+    # waits at most batch_wait seconds for others, batches hold batch_size texts
+    # at most and several batches are embedded at once by the executor.
+    # embed is called from the search threads and blocks until its batch is
+    # embedded, the batches are formed on the event loop.
+    def __init__(
+        self,
+        embed_function: Callable[[List[str]], list] = embed_batch,
+        batch_size: int = SERVICE_BATCH_SIZE,
+        batch_wait: float = SERVICE_BATCH_WAIT,
+        max_workers: int = SERVICE_MAX_WORKERS,
+    ) -> None:
+        self.embed_function = embed_function
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_workers = max_workers
+        self.batches = 0
+        self.texts = 0
+        self.loop = None
+        self._tasks = set()
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self.task.cancel()
+        self.executor.shutdown(wait=False)
+
+    def embed(self, texts: List[str]) -> list:
+        if self.loop is None:
+            raise RuntimeError("The batcher is not started")
+        return asyncio.run_coroutine_threadsafe(self.submit(texts), self.loop).result()
+
+    async def submit(self, texts: List[str]) -> list:
+        futures = []
+        for text in texts:
+            future = self.loop.create_future()
+            self.queue.put_nowait((text, future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def run(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            deadline = self.loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - self.loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Embedded while the next batch is formed
+            task = asyncio.create_task(self.embed_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def embed_batch(self, batch: list) -> None:
+        # Texts asked several times in the batch are embedded once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.texts += len(texts)
+        try:
+            vectors = await self.loop.run_in_executor(
+                self.executor, self.embed_function, texts
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        vectors = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+
+
+class SearchService:
+    # HTTP API of the hybrid search, for the app and any other client.
+    # Searches run in a pool of max_workers threads, their query embeddings
+    # are batched across requests. Programmes and calendars are built by the
+    # app itself.
+    # Catalogues of data_gathering.catalogue are loaded on their first request,
+    # searches holds the ones given at start, by name.
+    def __init__(
+        self,
+        searches: Optional[Dict[str, HybridSearch]] = None,
+        batcher: Optional[EmbeddingBatcher] = None,
+        cache: Optional[ResultCache] = None,
+        max_workers: int = SERVICE_MAX_WORKERS,
+    ) -> None:
+        self.searches = dict(searches or {})
+        self.batcher = batcher if batcher is not None else EmbeddingBatcher()
+        self.cache = cache if cache is not None else ResultCache()
+        self.max_workers = max_workers
+        self.requests = Counter()
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.started_at = time.time()
+        self._loading: Dict[str, asyncio.Lock] = {}
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.count_requests])
+        app.add_routes(
+            [
+                web.post("/search", self.handle_search),
+                web.get("/health", self.handle_health),
+                web.get("/metrics", self.handle_metrics),
+            ]
+        )
+        app.on_startup.append(self.start)
+        app.on_cleanup.append(self.stop)
+        return app
+
+    async def start(self, app: web.Application) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        await self.batcher.start()
+
+    async def stop(self, app: web.Application) -> None:
+        await self.batcher.stop()
+        self.executor.shutdown(wait=False)
+
+    @web.middleware
+    async def count_requests(self, request: web.Request, handler) -> web.Response:
+        self.requests[request.path] += 1
+        try:
+            return await handler(request)
+        except web.HTTPException as e:
+            if e.status >= 500:
+                self.errors += 1
+            raise
+        except Exception:
+            self.errors += 1
+            logging.exception(f"Failed to answer {request.path}")
+            raise web.HTTPInternalServerError()
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        body = await read_json(request)
+        search = await self.get_search(body)
+        filters = SearchFilters.from_dict(body.get("filters") or {})
+        limit = get_int(body, "limit", SEARCH_LIMIT, SERVICE_MAX_LIMIT)
+        offset = get_int(body, "offset", 0, SERVICE_MAX_DEPTH - limit)
+        t = time.perf_counter()
+        results = await self.run(
+            search.search, str(body.get("query", "")), filters, limit, offset
+        )
+        self.latencies.append(time.perf_counter() - t)
+        return web.json_response(
+            {
+                "movies": [[int(movie), score] for movie, score in results["movies"]],
+                "positions": [int(position) for position in results["positions"]],
+                "seconds": results["seconds"],
+            }
+        )
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "status": "ok",
+                "catalogues": sorted(self.searches),
+                "uptime": time.time() - self.started_at,
+            }
+        )
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        latencies = np.array(self.latencies) * 1000
+        return web.json_response(
+            {
+                "requests": dict(self.requests),
+                "errors": self.errors,
+                "search_ms": {
+                    "count": len(latencies),
+                    "mean": float(latencies.mean()) if len(latencies) else 0.0,
+                    "p50": float(np.percentile(latencies, 50))
+                    if len(latencies)
+                    else 0.0,
+                    "p95": float(np.percentile(latencies, 95))
+                    if len(latencies)
+                    else 0.0,
+                },
+                "embedding_batches": {
+                    "batches": self.batcher.batches,
+                    "texts": self.batcher.texts,
+                    "mean_size": self.batcher.texts / max(self.batcher.batches, 1),
+                },
+                "result_cache": self.cache.stats(),
+            }
+        )
+
+    async def get_search(self, body: dict) -> HybridSearch:
+        name = body.get("catalogue")
+        if name in self.searches:
+            return self.searches[name]
+        # Only the catalogue files can be read, loaded once when asked together
+        if name not in [partition["path"] for partition in list_catalogue()]:
+            raise web.HTTPNotFound(text=f"Unknown catalogue {name}")
+        lock = self._loading.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name not in self.searches:
+                self.searches[name] = await self.run(self.load_search, name)
+        return self.searches[name]
+
+    def load_search(self, path: str) -> HybridSearch:
+        data = load_catalogue(path)
+        index_param = index_params[0]
+        try:
+            store = get_vector_store(index_param)
+        except Exception as e:
+            logging.warning(f"No vector store, {path} is searched by keywords: {e}")
+            store = None
+        logging.info(f"Loaded {len(data)} screenings of {path}")
+        return HybridSearch(
+            data,
+            TextIndex(data),
+            store,
+            index_param,
+            cache=self.cache,
+            embed_function=self.batcher.embed,
+            max_workers=self.max_workers,
+        )
+
+    async def run(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, function, *args
+        )
+
+
+async def read_json(request: web.Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="The body is not JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="The body is not a JSON object")
+    return body
+
+
+def get_int(body: dict, name: str, default: int, maximum: int) -> int:
+    # JSON booleans are ints for Python, they are refused too
+    value = body.get(name, default)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise web.HTTPBadRequest(text=f"{name} is not an integer")
+    if not 0 <= value <= maximum:
+        raise web.HTTPBadRequest(text=f"{name} is not between 0 and {maximum}")
+    return value
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HTTP search service")
+    parser.add_argument("--host", type=str, default=SERVICE_HOST, help="Address")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="Port")
+    parser.add_argument(
+        "-w",
+        "--max_workers",
+        type=int,
+        default=SERVICE_MAX_WORKERS,
+        help="Searches running at the same time",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = get_args()
+    batcher = EmbeddingBatcher(max_workers=args.max_workers)
+    service = SearchService(batcher=batcher, max_workers=args.max_workers)
+    web.run_app(service.make_app(), host=args.host, port=args.port)
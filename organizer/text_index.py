@@ -0,0 +1,123 @@
+import bisect
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from config import TEXT_INDEX_B, TEXT_INDEX_FIELDS, TEXT_INDEX_K1
+
+TOKEN_REGEX = re.compile(r"\w+")
+# Accents and other marks left apart by the NFKD decomposition
+COMBINING_REGEX = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff]")
+
+
+def fold(text: str) -> str:
+    # "Soirée d'Ouverture" -> "soiree d'ouverture"
+    if text.isascii():
+        return text.lower()
+    return COMBINING_REGEX.sub("", unicodedata.normalize("NFKD", text)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_REGEX.findall(fold(text))
+
+
+class TextIndex:
+    # Inverted index over the text columns of a catalogue, built once per
+    # dataset. Screenings of the same film share their text, so documents are
+    # the distinct texts and each screening points to its document.
+    # Postings are stored by term, terms sorted, so that the terms starting with
+    # a prefix are one contiguous slice of the postings. The BM25 score of each
+    # posting does not depend on the query and is computed at build time, a
+    # query only sums slices of it. Fields count with their weight in the term
+    # frequencies and document lengths (BM25F).
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        fields: Optional[Dict[str, float]] = None,
+        k1: float = TEXT_INDEX_K1,
+        b: float = TEXT_INDEX_B,
+    ) -> None:
+        fields = TEXT_INDEX_FIELDS if fields is None else fields
+        fields = {field: w for field, w in fields.items() if field in data.columns}
+        if not fields:
+            raise ValueError("None of the text fields is in the catalogue")
+        texts = pd.DataFrame(
+            {
+                field: data[field].astype(object).fillna("").astype(str)
+                for field in fields
+            }
+        )
+        self.doc_of_row, documents = pd.factorize(pd.MultiIndex.from_frame(texts))
+        self.n_docs = len(documents)
+
+        # Weighted term frequencies of each document
+        term_ids: Dict[str, int] = {}
+        posting_terms, posting_docs, posting_tfs = [], [], []
+        lengths = np.zeros(self.n_docs)
+        for doc, values in enumerate(documents):
+            frequencies: Dict[int, float] = {}
+            for value, weight in zip(values, fields.values()):
+                tokens = tokenize(value)
+                lengths[doc] += weight * len(tokens)
+                for token in tokens:
+                    term = term_ids.setdefault(token, len(term_ids))
+                    frequencies[term] = frequencies.get(term, 0.0) + weight
+            posting_terms.extend(frequencies)
+            posting_docs.extend([doc] * len(frequencies))
+            posting_tfs.extend(frequencies.values())
+
+        # Term ids renumbered in alphabetical order, postings sorted by term
+        self.terms = sorted(term_ids)
+        rank = np.empty(len(term_ids), dtype="int64")
+        rank[[term_ids[term] for term in self.terms]] = np.arange(len(self.terms))
+        posting_terms = rank[np.asarray(posting_terms, dtype="int64")]
+        order = np.argsort(posting_terms, kind="stable")
+        posting_terms = posting_terms[order]
+        self.docs = np.asarray(posting_docs, dtype="int64")[order]
+        tfs = np.asarray(posting_tfs, dtype="float64")[order]
+        self.indptr = np.searchsorted(posting_terms, np.arange(len(self.terms) + 1))
+
+        df = np.diff(self.indptr)
+        idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+        mean_length = lengths.mean() if self.n_docs and lengths.mean() > 0 else 1.0
+        norm = k1 * (1 - b + b * lengths[self.docs] / mean_length)
+        self.scores = np.repeat(idf, df) * tfs * (k1 + 1) / (tfs + norm)
+
+    def __len__(self) -> int:
+        return len(self.doc_of_row)
+
+    def search(self, query: str, prefix: bool = True) -> np.ndarray:
+        # Positions of the screenings matching every term of the query, best
+        # score first, ties in catalogue order. With prefix, the last term also
+        # matches the longer words it starts, for search as you type.
+        tokens = tokenize(query)
+        if not tokens:
+            return np.arange(len(self))
+        doc_scores = np.zeros(self.n_docs)
+        matched = np.ones(self.n_docs, dtype=bool)
+        for i, token in enumerate(tokens):
+            first, last = self._term_range(token, prefix and i == len(tokens) - 1)
+            postings = slice(self.indptr[first], self.indptr[last])
+            docs = self.docs[postings]
+            doc_scores += np.bincount(
+                docs, self.scores[postings], minlength=self.n_docs
+            )
+            term_matched = np.zeros(self.n_docs, dtype=bool)
+            term_matched[docs] = True
+            matched &= term_matched
+        positions = np.flatnonzero(matched[self.doc_of_row])
+        row_scores = doc_scores[self.doc_of_row[positions]]
+        return positions[np.argsort(-row_scores, kind="stable")]
+
+    def _term_range(self, token: str, prefix: bool) -> Tuple[int, int]:
+        # Ids of the terms equal to token, or starting with it
+        first = bisect.bisect_left(self.terms, token)
+        if prefix:
+            last = bisect.bisect_left(self.terms, token + "\U0010ffff", first)
+        elif first < len(self.terms) and self.terms[first] == token:
+            last = first + 1
+        else:
+            last = first
+        return first, last
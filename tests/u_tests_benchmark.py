@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from milvus_db_utils.benchmark import (
+    brute_force_top_k,
+    iter_sweep,
+    latency_summary,
+    recall_at_k,
+)
+
+VECTORS = np.array([[0.0, 0.0], [1.0, 0.0], [0.0, 2.0], [3.0, 3.0]], np.float32)
+
+
+@pytest.mark.parametrize(
+    "metric_type, query, expected",
+    [
+        ("L2", [0.9, 0.1], [1, 0]),
+        ("L2", [0.0, 1.8], [2, 0]),
+        ("IP", [1.0, 0.0], [3, 1]),
+        ("COSINE", [0.0, 1.0], [2, 3]),
+    ],
+)
+def test_brute_force_top_k(metric_type, query, expected):
+    queries = np.array([query], np.float32)
+    assert brute_force_top_k(VECTORS, queries, 2, metric_type)[0].tolist() == expected
+
+
+def test_brute_force_top_k_with_k_larger_than_the_vectors():
+    queries = np.array([[0.0, 0.0]], np.float32)
+    assert brute_force_top_k(VECTORS, queries, 10, "L2")[0].tolist() == [0, 1, 2, 3]
+
+
+def test_recall_at_k():
+    ground_truth = np.array([[1, 2], [3, 4]])
+    assert recall_at_k([[2, 1], [3, 5]], ground_truth) == 0.75
+
+
+def test_latency_summary():
+    summary = latency_summary([0.001] * 99 + [0.101])
+    assert summary["latency_p50_ms"] == pytest.approx(1)
+    assert summary["latency_p99_ms"] > summary["latency_p95_ms"]
+
+
+def test_iter_sweep():
+    sweep = [
+        {
+            "index_type": "IVF_FLAT",
+            "build_params": [{"nlist": 16}, {"nlist": 64}],
+            "search_params": [{"nprobe": 1}],
+        }
+    ]
+    assert list(iter_sweep(sweep)) == [
+        ("IVF_FLAT", {"nlist": 16}, [{"nprobe": 1}]),
+        ("IVF_FLAT", {"nlist": 64}, [{"nprobe": 1}]),
+    ]
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_gathering import catalogue
+from data_gathering.catalogue import (
+    get_catalogue_filename,
+    iter_catalogue_chunks,
+    list_catalogue,
+    load_catalogue,
+    resolve_catalogue_path,
+    write_catalogue,
+)
+
+
+@pytest.fixture
+def screenings():
+    return pd.DataFrame(
+        {
+            "Title": ["The Roundup", "Batch '81", "The Roundup"],
+            "Duration": [105, 90, 105],
+            "Location": ["Salle 500", "Salle 300", "Salle 300"],
+            "Director": ["Lee Sang-yong", np.nan, "Lee Sang-yong"],
+            "Description_movie": ["Un flic brutal.", np.nan, "Un flic brutal."],
+            "StartDatetime": [
+                "2023-09-06T19:00:00",
+                "2023-09-07T14:00:00",
+                "2023-09-07T21:30:00",
+            ],
+        }
+    ).assign(
+        EndDatetime=lambda data: pd.to_datetime(data["StartDatetime"])
+        + pd.to_timedelta(data["Duration"], unit="m")
+    )
+
+
+def check_types(data):
+    assert data["Duration"].dtype == "int64"
+    assert isinstance(data["Location"].dtype, pd.CategoricalDtype)
+    assert isinstance(data["Director"].dtype, pd.CategoricalDtype)
+    assert data["StartDatetime"].dtype == "datetime64[ns]"
+    assert data["EndDatetime"].dtype == "datetime64[ns]"
+    assert data["Description_movie"].tolist() == [
+        "Un flic brutal.",
+        "",
+        "Un flic brutal.",
+    ]
+    assert data["Director"].tolist() == ["Lee Sang-yong", "", "Lee Sang-yong"]
+
+
+@pytest.mark.parametrize("memory_map", [True, False])
+def test_arrow_catalogue_is_read_back_typed(screenings, tmp_path, memory_map):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "festival.arrow")
+    write_catalogue(screenings, path)
+    data = load_catalogue(path, memory_map=memory_map)
+    check_types(data)
+    assert data["EndDatetime"].iloc[1] == pd.Timestamp("2023-09-07T15:30:00")
+
+
+def test_csv_catalogue_gets_the_same_schema(screenings, tmp_path):
+    path = str(tmp_path / "festival.csv")
+    write_catalogue(screenings, path)
+    check_types(load_catalogue(path))
+
+
+def test_missing_extension_falls_back_to_the_other_format(screenings, tmp_path):
+    write_catalogue(screenings, str(tmp_path / "festival.csv"))
+    path = resolve_catalogue_path(str(tmp_path / "festival.arrow"))
+    assert path == str(tmp_path / "festival.csv")
+    assert len(load_catalogue(str(tmp_path / "festival.arrow"))) == 3
+
+
+def test_csv_is_written_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(catalogue, "pa", None)
+    assert get_catalogue_filename("festival") == "festival.csv"
+
+
+@pytest.mark.parametrize("extension", [".arrow", ".csv"])
+def test_chunks_cover_the_catalogue(screenings, tmp_path, extension):
+    if extension == ".arrow":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"festival{extension}")
+    write_catalogue(screenings, path)
+    chunks = list(iter_catalogue_chunks(path, chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert pd.concat(chunks)["Title"].tolist() == screenings["Title"].tolist()
+    assert chunks[1]["Duration"].dtype == "int64"
+
+
+def test_loaded_catalogue_can_be_written_again(screenings, tmp_path):
+    path = str(tmp_path / "festival.csv")
+    write_catalogue(screenings, path)
+    write_catalogue(load_catalogue(path), path)
+    check_types(load_catalogue(path))
+
+
+def test_legacy_csv_files_are_listed_after_the_partitions(screenings, tmp_path):
+    catalogue_path = tmp_path / "catalogue"
+    partition = catalogue_path / "festival=etrange_festival" / "year=2023"
+    partition.mkdir(parents=True)
+    write_catalogue(screenings, str(partition / "screenings.csv"))
+    write_catalogue(screenings, str(tmp_path / "etrange_festival_2022.csv"))
+    (tmp_path / "notes.txt").write_text("not a catalogue")
+    # Other csv files of data/, without the columns of the catalogue
+    pd.DataFrame({"index_type": ["FLAT"], "recall": [1.0]}).to_csv(
+        tmp_path / "index_benchmark.csv", index=False
+    )
+    screenings.drop(columns=["StartDatetime", "EndDatetime"]).to_csv(
+        tmp_path / "data.csv", index=False
+    )
+    (tmp_path / "empty.csv").write_text("")
+
+    partitions = list_catalogue(str(catalogue_path), legacy_path=str(tmp_path))
+    assert [p["name"] for p in partitions] == [
+        "etrange_festival 2023",
+        "etrange_festival_2022.csv",
+    ]
+    assert partitions[1]["year"] is None
+    assert len(load_catalogue(partitions[1]["path"])) == 3
@@ -0,0 +1,85 @@
+import pytest
+from milvus_db_utils import collection_versions
+
+
+class FakeUtility:
+    def __init__(self, collections, aliases):
+        self.collections = list(collections)
+        self.aliases = dict(aliases)
+
+    def list_collections(self):
+        return list(self.collections)
+
+    def list_aliases(self, collection_name):
+        return [a for a, c in self.aliases.items() if c == collection_name]
+
+    def create_alias(self, collection_name, alias):
+        assert alias not in self.collections and alias not in self.aliases
+        self.aliases[alias] = collection_name
+
+    def alter_alias(self, collection_name, alias):
+        assert alias in self.aliases
+        self.aliases[alias] = collection_name
+
+    def drop_collection(self, collection_name):
+        self.collections.remove(collection_name)
+
+
+class FakeCollections:
+    # Collection(name) of pymilvus, recording the collections released
+    def __init__(self):
+        self.released = []
+
+    def __call__(self, name):
+        collection = type("Collection", (), {})()
+        collection.release = lambda: self.released.append(name)
+        return collection
+
+
+ALIAS = "embedded_field_HNSW_L2"
+V1 = f"{ALIAS}_v20230901120000"
+V2 = f"{ALIAS}_v20230902120000"
+V3 = f"{ALIAS}_v20230903120000"
+
+
+@pytest.fixture
+def fake_utility(monkeypatch):
+    def install(collections, aliases):
+        utility = FakeUtility(collections, aliases)
+        monkeypatch.setattr(collection_versions, "utility", utility)
+        utility.collection = FakeCollections()
+        monkeypatch.setattr(collection_versions, "Collection", utility.collection)
+        return utility
+
+    return install
+
+
+def test_versions_are_listed_in_chronological_order(fake_utility):
+    fake_utility([V2, "other", V1, f"{ALIAS}_backup"], {})
+    assert collection_versions.list_collection_versions(ALIAS) == [V1, V2]
+
+
+def test_publish_moves_the_alias(fake_utility):
+    utility = fake_utility([V1, V2], {ALIAS: V1})
+    collection_versions.publish_collection_version(V2, ALIAS)
+    assert utility.aliases == {ALIAS: V2}
+
+
+def test_publish_replaces_a_former_collection(fake_utility):
+    utility = fake_utility([ALIAS, V1], {})
+    collection_versions.publish_collection_version(V1, ALIAS)
+    assert utility.collections == [V1]
+    assert utility.aliases == {ALIAS: V1}
+
+
+def test_old_versions_are_dropped_but_the_published_one(fake_utility):
+    utility = fake_utility([V1, V2, V3], {ALIAS: V1})
+    assert collection_versions.drop_old_collection_versions(ALIAS, keep=1) == [V2]
+    assert utility.collections == [V1, V3]
+    assert utility.collection.released == [V3]
+
+
+def test_versions_kept_are_released(fake_utility):
+    utility = fake_utility([V1, V2, V3], {ALIAS: V3})
+    assert collection_versions.drop_old_collection_versions(ALIAS, keep=2) == [V1]
+    assert utility.collection.released == [V2]
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from organizer.conflicts import ConflictIndex
+
+
+def overlap(start_a, end_a, start_b, end_b):
+    return start_a < end_b and start_b < end_a
+
+
+@pytest.fixture
+def screenings():
+    # 200 screenings of 1h to 3h over 3 days, a few without a time
+    rng = np.random.default_rng(0)
+    starts = pd.Timestamp("2023-09-06 10:00") + pd.to_timedelta(
+        rng.integers(0, 3 * 24 * 4, 200) * 15, unit="m"
+    )
+    ends = starts + pd.to_timedelta(rng.integers(60, 180, 200), unit="m")
+    starts = starts.to_numpy().copy()
+    starts[[3, 50]] = np.datetime64("NaT")
+    return pd.DataFrame({"StartDatetime": starts, "EndDatetime": ends})
+
+
+def brute_force_overlapping(data, position):
+    starts = data["StartDatetime"].tolist()
+    ends = data["EndDatetime"].tolist()
+    if pd.isna(starts[position]):
+        return []
+    return [
+        other
+        for other in range(len(data))
+        if other != position
+        and not pd.isna(starts[other])
+        and overlap(starts[position], ends[position], starts[other], ends[other])
+    ]
+
+
+def test_overlapping_matches_brute_force(screenings):
+    index = ConflictIndex.from_data(screenings)
+    for position in range(len(screenings)):
+        found = sorted(index.overlapping(position).tolist())
+        assert found == brute_force_overlapping(screenings, position)
+
+
+@pytest.mark.parametrize("n_selected", [0, 1, 5, 20])
+def test_conflicts_and_fits_match_brute_force(screenings, n_selected):
+    index = ConflictIndex.from_data(screenings)
+    rng = np.random.default_rng(n_selected)
+    selected = sorted(rng.choice(len(screenings), n_selected, replace=False).tolist())
+    overlaps = {p: set(brute_force_overlapping(screenings, p)) for p in range(200)}
+
+    expected_conflicts = [p for p in selected if overlaps[p] & set(selected)]
+    assert index.conflicts(selected).tolist() == expected_conflicts
+
+    expected_fits = [not (overlaps[p] & set(selected)) for p in range(200)]
+    assert index.fits(selected).tolist() == expected_fits
+
+
+def test_an_earlier_longer_screening_is_a_conflict():
+    # The second screening ends before the third starts, the first one does not
+    data = pd.DataFrame(
+        {
+            "StartDatetime": pd.to_datetime(
+                ["2023-09-06 10:00", "2023-09-06 10:30", "2023-09-06 12:00"]
+            ),
+            "EndDatetime": pd.to_datetime(
+                ["2023-09-06 14:00", "2023-09-06 11:30", "2023-09-06 13:00"]
+            ),
+        }
+    )
+    index = ConflictIndex.from_data(data)
+    assert index.conflicts([1, 2]).tolist() == []
+    assert index.conflicts([0, 1, 2]).tolist() == [0, 1, 2]
+    assert index.fits([1, 2]).tolist() == [False, True, True]
+
+
+def test_back_to_back_screenings_fit():
+    data = pd.DataFrame(
+        {
+            "StartDatetime": pd.to_datetime(["2023-09-06 10:00", "2023-09-06 12:00"]),
+            "EndDatetime": pd.to_datetime(["2023-09-06 12:00", "2023-09-06 14:00"]),
+        }
+    )
+    index = ConflictIndex.from_data(data)
+    assert index.conflicts([0, 1]).tolist() == []
+    assert index.fits([0]).tolist() == [True, True]
@@ -0,0 +1,83 @@
+import pytest
+from milvus_db_utils import connection
+from pymilvus import MilvusException
+
+
+class FakeCollection:
+    loads = 0
+
+    def __init__(self, name, using):
+        self.name = name
+
+    def load(self):
+        FakeCollection.loads += 1
+
+
+class FakeConnections:
+    def __init__(self):
+        self.opened = set()
+        self.connects = 0
+
+    def has_connection(self, alias):
+        return alias in self.opened
+
+    def connect(self, alias, host, port):
+        self.connects += 1
+        self.opened.add(alias)
+
+    def disconnect(self, alias):
+        self.opened.discard(alias)
+
+
+class FakeUtility:
+    healthy = True
+
+    def get_server_version(self, using, timeout):
+        if not self.healthy:
+            raise MilvusException(message="server unavailable")
+        return "v2.3.4"
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    FakeCollection.loads = 0
+    fake_connections = FakeConnections()
+    fake_utility = FakeUtility()
+    monkeypatch.setattr(connection, "Collection", FakeCollection)
+    monkeypatch.setattr(connection, "connections", fake_connections)
+    monkeypatch.setattr(connection, "utility", fake_utility)
+    return fake_connections, fake_utility
+
+
+def test_collections_are_loaded_once(fakes):
+    fake_connections, _ = fakes
+    manager = connection.MilvusConnectionManager(health_check_interval=60)
+    first = manager.get_collection("embedded_field_HNSW_L2")
+    assert manager.get_collection("embedded_field_HNSW_L2") is first
+    assert FakeCollection.loads == 1
+    assert fake_connections.connects == 1
+
+
+def test_unhealthy_connection_is_reopened(fakes):
+    fake_connections, fake_utility = fakes
+    manager = connection.MilvusConnectionManager(health_check_interval=0)
+    manager.get_collection("embedded_field_HNSW_L2")
+    fake_utility.healthy = False
+    manager.get_collection("embedded_field_HNSW_L2")
+    assert fake_connections.connects == 2
+    assert FakeCollection.loads == 2
+
+
+def test_run_retries_after_reconnecting(fakes):
+    fake_connections, _ = fakes
+    manager = connection.MilvusConnectionManager(health_check_interval=60)
+    calls = []
+
+    def flaky_search(collection):
+        calls.append(collection)
+        if len(calls) == 1:
+            raise MilvusException(message="connection reset")
+        return "results"
+
+    assert manager.run("embedded_field_HNSW_L2", flaky_search) == "results"
+    assert fake_connections.connects == 2
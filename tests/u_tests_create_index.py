@@ -0,0 +1,186 @@
+import json
+
+import pandas as pd
+import pytest
+from milvus_db_utils import create_index
+from milvus_db_utils.embedding_providers import OpenAIProvider
+from milvus_db_utils.filters import SCALAR_FIELDS
+
+from data_gathering.catalogue import write_catalogue
+
+
+class FakeCollection:
+    # Records the inserted columns and the flushes
+    def __init__(self, name="fake"):
+        self.name = name
+        self.inserts = []
+        self.flushes = 0
+
+    def insert(self, columns):
+        self.inserts.append(columns)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def make_movies(n_movies):
+    # Movies with the columns of get_movies_to_index
+    return pd.DataFrame(
+        {
+            "id": [f"id{i}" for i in range(n_movies)],
+            "Description_movie": [f"Film {i} " + "x" * 60 for i in range(n_movies)],
+            "content_hash": [f"hash{i}" for i in range(n_movies)],
+            "Duration": [90 + i for i in range(n_movies)],
+            "FirstStart": [1000 * i for i in range(n_movies)],
+            "LastStart": [1000 * i + 500 for i in range(n_movies)],
+            "Locations": [[f"Salle {i}"] for i in range(n_movies)],
+        }
+    )
+
+
+def fake_embeddings(data, embedded_field, batch_size, max_workers):
+    return [[float(len(text))] for text in data[embedded_field]]
+
+
+@pytest.fixture
+def catalogue_file(tmp_path):
+    # The Roundup is screened in the first chunk of 2 rows and in the last one
+    path = str(tmp_path / "festival.csv")
+    write_catalogue(
+        pd.DataFrame(
+            {
+                "Title": ["The Roundup", "Batch '81", "Nosferatu", "The Roundup"],
+                "URL": ["a", "b", "c", "a"],
+                "Duration": [105, 90, 94, 105],
+                "Location": ["Salle 500", "Salle 300", "Salle 100", "Salle 300"],
+                "Description_movie": ["Un flic", "Des punks", "Un vampire", "Un flic"],
+                "StartDatetime": [
+                    "2023-09-06T19:00:00",
+                    "2023-09-07T14:00:00",
+                    "2023-09-08T16:00:00",
+                    "2023-09-09T21:30:00",
+                ],
+            }
+        ),
+        path,
+    )
+    return path
+
+
+def test_stream_mode_inserts_the_movies_of_the_full_build(catalogue_file, monkeypatch):
+    monkeypatch.setattr(create_index, "get_embeddings", fake_embeddings)
+    collection = FakeCollection()
+    create_index.stream_index(
+        catalogue_file, "Description_movie", [collection], chunk_size=2
+    )
+    rows = [
+        row
+        for columns in collection.inserts
+        for row in zip(*columns[:3], *columns[3 : 3 + len(SCALAR_FIELDS)])
+    ]
+
+    movies = create_index.get_data_from_csv(catalogue_file, "Description_movie")
+    expected = list(
+        zip(
+            movies["id"],
+            movies["Description_movie"],
+            movies["content_hash"],
+            *[movies[field] for field in SCALAR_FIELDS],
+        )
+    )
+    assert rows == expected
+    # The last screening of The Roundup is in the second chunk
+    roundup = movies.set_index("URL").loc["a"]
+    assert roundup["Locations"] == ["Salle 500", "Salle 300"]
+    assert roundup["LastStart"] > roundup["FirstStart"]
+
+
+@pytest.mark.parametrize(
+    "n_movies, chunk_size, sizes",
+    [(6, 3, [3, 3]), (7, 3, [3, 3, 1]), (2, 5, [2]), (0, 3, [])],
+)
+def test_insert_in_chunks_boundaries(n_movies, chunk_size, sizes):
+    movies = make_movies(n_movies)
+    embedings = [[float(i)] for i in range(n_movies)]
+    collection = FakeCollection()
+    create_index.insert_in_chunks(
+        movies, "Description_movie", collection, embedings, chunk_size
+    )
+
+    assert [len(columns[0]) for columns in collection.inserts] == sizes
+    assert all(
+        len(column) == len(columns[0])
+        for columns in collection.inserts
+        for column in columns
+    )
+    # Every row is inserted once, in order, aligned with its vector
+    ids = [id_ for columns in collection.inserts for id_ in columns[0]]
+    vectors = [vector for columns in collection.inserts for vector in columns[-1]]
+    assert ids == movies["id"].tolist()
+    assert vectors == embedings
+    assert collection.flushes == 0
+
+
+def test_column_chunks_follow_the_fields_of_the_collection():
+    movies = make_movies(4)
+    embedings = [[float(i)] for i in range(4)]
+    chunks = list(
+        create_index.iter_column_chunks(movies, "Description_movie", embedings, 3)
+    )
+
+    assert [(start, end) for _, start, end in chunks] == [(0, 3), (3, 4)]
+    columns = chunks[1][0]
+    assert len(columns) == 4 + len(SCALAR_FIELDS)
+    assert columns[0] == ["id3"]
+    # Texts are truncated to the 50 characters of the text field
+    assert columns[1] == [movies["Description_movie"][3][:50]]
+    assert columns[2] == ["hash3"]
+    assert columns[3:-1] == [[movies[field][3]] for field in SCALAR_FIELDS]
+    assert columns[-1] == [[3.0]]
+
+
+def test_stream_mode_flushes_every_collection_once(catalogue_file, monkeypatch):
+    monkeypatch.setattr(create_index, "get_embeddings", fake_embeddings)
+    collections = [FakeCollection("first"), FakeCollection("second")]
+    create_index.stream_index(
+        catalogue_file, "Description_movie", collections, chunk_size=1
+    )
+
+    assert [collection.flushes for collection in collections] == [1, 1]
+    # One insert for each new movie of a chunk of 1 row
+    assert len(collections[0].inserts) == 3
+    assert collections[0].inserts == collections[1].inserts
+
+
+class FakeSchemaCollection:
+    # Collection of the alias, with the description and fields of its schema
+    def __init__(self, description, fields):
+        self.description = description
+        self.schema = type("Schema", (), {"fields": fields})()
+
+
+@pytest.mark.parametrize(
+    "built_with, expected",
+    [
+        ({"provider": "engine", "dimension": 8}, True),
+        ({"provider": "other-engine", "dimension": 8}, False),
+        ({"provider": "engine", "dimension": 16}, False),
+        (None, False),
+    ],
+)
+def test_collections_of_another_provider_are_rebuilt(monkeypatch, built_with, expected):
+    monkeypatch.setattr(
+        create_index, "get_embedding_provider", lambda: OpenAIProvider("engine", 8)
+    )
+    monkeypatch.setattr(create_index.utility, "has_collection", lambda name: True)
+    fields = [
+        type("Field", (), {"name": name})()
+        for name in ["id", "content_hash", *SCALAR_FIELDS]
+    ]
+    description = "" if built_with is None else json.dumps(built_with)
+    monkeypatch.setattr(
+        create_index,
+        "Collection",
+        lambda name: FakeSchemaCollection(description, fields),
+    )
+    assert create_index.has_sync_fields("embedded_field_FLAT_IP") == expected
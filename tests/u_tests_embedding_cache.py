@@ -0,0 +1,73 @@
+import pytest
+from milvus_db_utils.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "embedding_cache.sqlite")
+
+
+def test_get_and_put(cache_path):
+    cache = EmbeddingCache(cache_path)
+    assert cache.get("engine", "film d'horreur") is None
+    cache.put("engine", "film d'horreur", [0.5, 0.25])
+    assert cache.get("engine", "film d'horreur") == [0.5, 0.25]
+    assert cache.get("other-engine", "film d'horreur") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_persistence(cache_path):
+    cache = EmbeddingCache(cache_path)
+    cache.put_many("engine", ["a", "b"], [[1.0], [2.0]])
+    cache.close()
+
+    cache = EmbeddingCache(cache_path)
+    assert cache.get_many("engine", ["b", "c", "a"]) == [[2.0], None, [1.0]]
+    assert cache.stats()["entries"] == 2
+
+
+def test_least_recently_used_are_evicted(cache_path):
+    cache = EmbeddingCache(cache_path, max_entries=2, memory_entries=0)
+    cache.put("engine", "a", [1.0])
+    cache.put("engine", "b", [2.0])
+    cache.get("engine", "a")
+    cache.put("engine", "c", [3.0])
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get("engine", "b") is None
+    assert cache.get("engine", "a") == [1.0]
+    assert cache.get("engine", "c") == [3.0]
+
+
+def test_memory_hits_are_kept_by_the_eviction(cache_path):
+    cache = EmbeddingCache(cache_path, max_entries=2, touch_batch=10)
+    cache.put("engine", "a", [1.0])
+    cache.put("engine", "b", [2.0])
+    # Answered from memory, written back before the next eviction
+    assert cache.get("engine", "a") == [1.0]
+    cache.put("engine", "c", [3.0])
+    cache.close()
+
+    cache = EmbeddingCache(cache_path, max_entries=2)
+    assert cache.get_many("engine", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+def test_get_or_embed_only_embeds_the_missing_texts_once(cache_path):
+    cache = EmbeddingCache(cache_path)
+    cache.put("engine", "a", [1.0])
+    calls = []
+
+    def embed_function(texts):
+        calls.append(texts)
+        return [[float(len(text))] for text in texts]
+
+    texts = ["bb", "a", "bb", "ccc"]
+    assert cache.get_or_embed("engine", texts, embed_function) == [
+        [2.0],
+        [1.0],
+        [2.0],
+        [3.0],
+    ]
+    assert cache.get_or_embed("engine", texts, embed_function)[3] == [3.0]
+    assert calls == [["bb", "ccc"]]
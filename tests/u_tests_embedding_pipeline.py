@@ -0,0 +1,106 @@
+import time
+
+import openai
+import pytest
+from milvus_db_utils.embedding_cache import EmbeddingCache
+from milvus_db_utils.embedding_pipeline import embed_batch_with_backoff, embed_texts
+from milvus_db_utils.embedding_providers import get_embedding_provider
+
+
+def slow_first_batches(batch):
+    # The first batches answer last, the order must be kept anyway
+    time.sleep(0.01 / (1 + int(batch[0])))
+    return [[float(text)] for text in batch]
+
+
+@pytest.mark.parametrize(
+    "n_texts, batch_size, max_workers",
+    [(0, 10, 2), (1, 10, 2), (25, 10, 3), (25, 1, 8), (30, 30, 1)],
+)
+def test_embed_texts_keeps_order(n_texts, batch_size, max_workers):
+    texts = [str(i) for i in range(n_texts)]
+    embeddings = embed_texts(
+        texts,
+        batch_size=batch_size,
+        max_workers=max_workers,
+        embed_function=slow_first_batches,
+        cache=EmbeddingCache(":memory:"),
+    )
+    assert embeddings == [[float(i)] for i in range(n_texts)]
+
+
+def test_embed_texts_only_sends_uncached_texts():
+    cache = EmbeddingCache(":memory:")
+    sent = []
+
+    def record(batch):
+        sent.extend(batch)
+        return [[float(text)] for text in batch]
+
+    embed_texts(["1", "2", "1"], embed_function=record, cache=cache)
+    assert sent == ["1", "2"]
+
+    sent.clear()
+    embeddings = embed_texts(["2", "1", "3"], embed_function=record, cache=cache)
+    assert sent == ["3"]
+    assert embeddings == [[2.0], [1.0], [3.0]]
+
+
+def test_batches_embedded_before_a_failure_are_cached():
+    cache = EmbeddingCache(":memory:")
+
+    def fail_on_3(batch):
+        if "3" in batch:
+            raise ValueError("Bad request")
+        return [[float(text)] for text in batch]
+
+    with pytest.raises(ValueError):
+        embed_texts(
+            [str(i) for i in range(6)],
+            batch_size=2,
+            max_workers=1,
+            embed_function=fail_on_3,
+            cache=cache,
+        )
+    engine = get_embedding_provider().name
+    assert cache.get_many(engine, ["0", "1", "2", "3", "4", "5"]) == [
+        [0.0],
+        [1.0],
+        None,
+        None,
+        [4.0],
+        [5.0],
+    ]
+
+
+def test_embed_batch_with_backoff_retries():
+    calls = []
+
+    def flaky(batch):
+        calls.append(batch)
+        if len(calls) < 3:
+            raise openai.error.APIConnectionError("connection reset")
+        return [[0.0] for _ in batch]
+
+    assert embed_batch_with_backoff(["a", "b"], flaky, base_delay=0) == [[0.0], [0.0]]
+    assert len(calls) == 3
+
+
+def test_embed_batch_with_backoff_gives_up():
+    def always_failing(batch):
+        raise openai.error.RateLimitError("too many requests")
+
+    with pytest.raises(openai.error.RateLimitError):
+        embed_batch_with_backoff(["a"], always_failing, max_retries=2, base_delay=0)
+
+
+def test_embed_batch_with_backoff_does_not_retry_bad_requests():
+    calls = []
+
+    def invalid(batch):
+        calls.append(batch)
+        raise openai.error.InvalidRequestError("bad input", param="input")
+
+    with pytest.raises(openai.error.InvalidRequestError):
+        embed_batch_with_backoff(["a"], invalid, base_delay=0)
+    assert len(calls) == 1
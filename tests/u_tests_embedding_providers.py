@@ -0,0 +1,99 @@
+import threading
+
+import numpy as np
+import openai
+import pytest
+from milvus_db_utils import embedding_providers, utils
+from milvus_db_utils.embedding_cache import EmbeddingCache
+from milvus_db_utils.embedding_pipeline import embed_texts
+from milvus_db_utils.embedding_providers import (
+    LocalProvider,
+    OpenAIProvider,
+    get_embedding_provider,
+    make_embedding_provider,
+)
+
+
+class FakeModel:
+    # Same interface as a SentenceTransformer, the vector of "3" is [3, 0, 0]
+    def __init__(self):
+        self.batches = []
+        self.threads = set()
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy):
+        self.batches.append(list(texts))
+        self.threads.add(threading.get_ident())
+        return np.array([[float(text), 0.0, 0.0] for text in texts])
+
+
+class FakeProvider(embedding_providers.EmbeddingProvider):
+    def __init__(self, name, value):
+        self.name = name
+        self.dimension = 1
+        self.value = value
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        return [[self.value] for _ in texts]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = EmbeddingCache(":memory:")
+    monkeypatch.setattr(utils, "get_embedding_cache", lambda: cache)
+    return cache
+
+
+def test_local_provider_batches_and_keeps_order():
+    model = FakeModel()
+    provider = LocalProvider("model", batch_size=4, max_workers=3, model=model)
+    texts = [str(i) for i in range(10)]
+    assert provider.embed(texts) == [[float(i), 0.0, 0.0] for i in range(10)]
+    assert sorted(len(batch) for batch in model.batches) == [2, 4, 4]
+    assert provider.dimension == 3 and provider.name == "local/model"
+
+    # A single query is encoded by the calling thread
+    model.threads.clear()
+    provider.embed(["1"])
+    assert model.threads == {threading.get_ident()}
+
+
+def test_local_provider_needs_sentence_transformers(monkeypatch):
+    monkeypatch.setattr(embedding_providers, "SentenceTransformer", None)
+    with pytest.raises(ImportError):
+        LocalProvider("model").embed(["a"])
+
+
+def test_providers_implement_embed():
+    class IncompleteProvider(embedding_providers.EmbeddingProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        IncompleteProvider()
+
+
+def test_make_embedding_provider():
+    provider = make_embedding_provider("openai")
+    assert isinstance(provider, OpenAIProvider)
+    assert OpenAIProvider("engine", 8).dimension == 8
+    assert openai.error.RateLimitError in provider.retryable_errors
+    with pytest.raises(ValueError):
+        make_embedding_provider("word2vec")
+
+
+def test_embeddings_are_cached_by_provider(monkeypatch, cache):
+    first = FakeProvider("first", 1.0)
+    monkeypatch.setattr(embedding_providers, "_embedding_provider", first)
+    assert get_embedding_provider() is first
+    assert utils.embed("film") == [1.0]
+    assert utils.embed("film") == [1.0] and first.calls == 1
+
+    second = FakeProvider("second", 2.0)
+    monkeypatch.setattr(embedding_providers, "_embedding_provider", second)
+    assert utils.embed("film") == [2.0]
+    assert embed_texts(["film", "nuit"], cache=cache) == [[2.0], [2.0]]
+    assert second.calls == 2
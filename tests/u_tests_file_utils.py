@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from file_utils import atomic_path, write_atomically
+
+
+def test_failed_writes_leave_the_previous_file(tmp_path):
+    path = str(tmp_path / "marker")
+    write_atomically(path, b"old")
+    with pytest.raises(ValueError):
+        with atomic_path(path) as tmp:
+            with open(tmp, "wb") as f:
+                f.write(b"half")
+            raise ValueError
+    with open(path, "rb") as f:
+        assert f.read() == b"old"
+    assert os.listdir(tmp_path) == ["marker"]
+
+
+def test_directories_are_replaced(tmp_path):
+    path = str(tmp_path / "store")
+    for version in ["old", "new"]:
+        with atomic_path(path) as tmp:
+            os.makedirs(tmp)
+            write_atomically(os.path.join(tmp, "version"), version.encode("utf-8"))
+    assert os.listdir(path) == ["version"]
+    with open(os.path.join(path, "version"), "rb") as f:
+        assert f.read() == b"new"
+    assert os.listdir(tmp_path) == ["store"]
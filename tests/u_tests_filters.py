@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from milvus_db_utils.filters import (
+    SCALAR_FIELDS,
+    SearchFilters,
+    get_movie_scalar_fields,
+)
+from milvus_db_utils.sync import get_movie_ids
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame(
+        {
+            "URL": ["a", "a", "b", "c", "d"],
+            "Duration": [100, 100, 90, 130, 80],
+            "Location": [
+                "Salle 100",
+                "Salle 300",
+                "Salle 300",
+                "Salle 500",
+                "Salle 100",
+            ],
+            "StartDatetime": pd.to_datetime(
+                [
+                    "2023-09-06 19:00",
+                    "2023-09-09 14:00",
+                    "2023-09-07 21:00",
+                    "2023-09-08 16:00",
+                    None,
+                ]
+            ),
+        }
+    )
+
+
+def test_movie_fields_span_all_screenings(data):
+    fields = get_movie_scalar_fields(data)
+    movie_a = fields.loc[get_movie_ids(data)[0]]
+    assert movie_a["Locations"] == ["Salle 100", "Salle 300"]
+    assert movie_a["FirstStart"] == pd.Timestamp("2023-09-06 19:00").timestamp()
+    assert movie_a["LastStart"] == pd.Timestamp("2023-09-09 14:00").timestamp()
+    assert fields.loc[get_movie_ids(data)[4], "FirstStart"] == 0
+    assert len(fields) == 4
+
+
+def test_expression():
+    filters = SearchFilters(
+        pd.Timestamp("2023-09-07"),
+        pd.Timestamp("2023-09-08"),
+        ["Salle 300", 'Salle "VIP"'],
+        90,
+        120,
+    )
+    assert filters.expression() == (
+        f"LastStart >= {int(pd.Timestamp('2023-09-07').timestamp())} and "
+        f"FirstStart < {int(pd.Timestamp('2023-09-08').timestamp())} and "
+        'array_contains_any(Locations, ["Salle 300", "Salle \\"VIP\\""]) and '
+        "Duration >= 90 and Duration <= 120"
+    )
+    assert SearchFilters().expression() == ""
+    assert SearchFilters(locations=[]).is_empty()
+
+
+@pytest.mark.parametrize(
+    "filters, screenings",
+    [
+        (SearchFilters(), [0, 1, 2, 3, 4]),
+        (SearchFilters(start=pd.Timestamp("2023-09-08")), [1, 3]),
+        (
+            SearchFilters(pd.Timestamp("2023-09-07"), pd.Timestamp("2023-09-08")),
+            [2],
+        ),
+        (SearchFilters(locations=["Salle 100"]), [0, 4]),
+        (SearchFilters(min_duration=95, max_duration=130), [0, 1, 3]),
+        (
+            SearchFilters(pd.Timestamp("2023-09-09"), locations=["Salle 100"]),
+            [],
+        ),
+    ],
+)
+def test_masks(data, filters, screenings):
+    assert np.flatnonzero(filters.mask(data)).tolist() == screenings
+
+    # A movie is kept when one of its screenings is, or more with several
+    # criteria, never less
+    fields = get_movie_scalar_fields(data)
+    kept = fields.index[
+        filters.movie_mask({field: fields[field].to_numpy() for field in SCALAR_FIELDS})
+    ]
+    assert set(get_movie_ids(data)[screenings]) <= set(kept)
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+from milvus_db_utils import embedding_cache
+from milvus_db_utils import search as search_module
+from milvus_db_utils.embedding_cache import EmbeddingCache
+from milvus_db_utils.filters import (
+    SCALAR_FIELDS,
+    SearchFilters,
+    get_movie_scalar_fields,
+)
+from milvus_db_utils.sync import get_movie_ids
+from milvus_db_utils.vector_store import EmbeddedVectorStore, VectorStore
+
+from organizer.hybrid_search import HybridSearch, reciprocal_rank_fusion
+from organizer.text_index import TextIndex
+
+INDEX_PARAM = {"index_type": "FLAT", "metric_type": "L2", "params": {}}
+
+
+@pytest.fixture
+def data():
+    # Movie b is about vampires without the word, movie c names it
+    return pd.DataFrame(
+        {
+            "Title": ["Nosferatu", "Nosferatu", "Dracula", "Vampires", "Zombies"],
+            "URL": ["a", "a", "b", "c", "d"],
+            "Description_movie": [
+                "Un classique muet",
+                "Un classique muet",
+                "Le comte de Transylvanie",
+                "Une nuit de vampires",
+                "Des morts vivants",
+            ],
+            "Duration": [94, 94, 120, 90, 100],
+            "Location": [
+                "Salle 100",
+                "Salle 300",
+                "Salle 300",
+                "Salle 100",
+                "Salle 500",
+            ],
+            "StartDatetime": pd.to_datetime(
+                [
+                    "2023-09-06 19:00",
+                    "2023-09-09 14:00",
+                    "2023-09-07 21:00",
+                    "2023-09-08 16:00",
+                    "2023-09-08 18:00",
+                ]
+            ),
+        }
+    )
+
+
+@pytest.fixture
+def store(data, monkeypatch):
+    # "vampire" is nearest to b, then a, then c
+    vectors = {"a": [1.0, 0.2], "b": [1.0, 0.0], "c": [0.0, 1.0], "d": [-1.0, 0.0]}
+    monkeypatch.setattr(
+        search_module, "embed_batch", lambda texts: [[1.0, 0.0] for _ in texts]
+    )
+    movies = data.drop_duplicates("URL")
+    fields = get_movie_scalar_fields(data).loc[get_movie_ids(movies)]
+    return EmbeddedVectorStore(
+        ids=get_movie_ids(movies).to_numpy(),
+        vectors=np.array([vectors[url] for url in movies["URL"]]),
+        texts=movies["Title"].tolist(),
+        fields={field: fields[field].tolist() for field in SCALAR_FIELDS},
+    )
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=1)
+    assert [item for item, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == pytest.approx(1 / 2 + 1 / 3)
+    # Ties keep the order in which ids were first ranked
+    assert [item for item, _ in reciprocal_rank_fusion([[5], [6]])] == [5, 6]
+
+
+def test_results_found_by_both_searches_come_first(data, store):
+    hybrid = HybridSearch(data, TextIndex(data), store, INDEX_PARAM, rrf_k=1)
+    results = hybrid.search("vampire")
+    ids = get_movie_ids(data).tolist()
+    # c is found by both, b and a by the vector search only
+    assert [movie for movie, _ in results["movies"]] == [ids[3], ids[2], ids[0], ids[4]]
+    assert results["positions"] == [3, 2, 0, 1, 4]
+
+
+def test_pagination(data, store):
+    hybrid = HybridSearch(data, TextIndex(data), store, INDEX_PARAM, rrf_k=1)
+    everything = hybrid.search("vampire", limit=4)["movies"]
+    pages = [hybrid.search("vampire", limit=2, offset=offset) for offset in [0, 2]]
+    assert pages[0]["movies"] + pages[1]["movies"] == everything
+
+
+def test_filters_apply_to_both_searches(data, store):
+    hybrid = HybridSearch(data, TextIndex(data), store, INDEX_PARAM)
+    filters = SearchFilters(start=pd.Timestamp("2023-09-08"), max_duration=100)
+    results = hybrid.search("vampire", filters)
+    assert results["positions"] == [3, 1, 4]
+    # Without a query, the filtered catalogue is ranked in order
+    assert hybrid.search("", filters)["positions"] == [1, 3, 4]
+
+
+def test_keywords_only_when_the_vector_search_fails(data, monkeypatch, tmp_path):
+    # Neither the embedding provider nor the cache of DATA_PATH is touched
+    monkeypatch.setattr(
+        search_module, "embed_batch", lambda texts: [[1.0, 0.0] for _ in texts]
+    )
+    monkeypatch.setattr(
+        embedding_cache,
+        "_embedding_cache",
+        EmbeddingCache(str(tmp_path / "embedding_cache.sqlite")),
+    )
+
+    class BrokenStore(VectorStore):
+        def search(self, vectors, limit=5, filters=None, offset=0):
+            raise ConnectionError("Milvus is down")
+
+    hybrid = HybridSearch(data, TextIndex(data), BrokenStore(), INDEX_PARAM)
+    assert hybrid.search("vampire")["positions"] == [3]
+    assert HybridSearch(data, TextIndex(data)).search("muet")["positions"] == [0, 1]
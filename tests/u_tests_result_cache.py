@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+from milvus_db_utils import search as search_module
+from milvus_db_utils.filters import SearchFilters
+from milvus_db_utils.result_cache import ResultCache, mark_index_published
+from milvus_db_utils.vector_store import EmbeddedVectorStore
+
+INDEX_PARAM = {"index_type": "FLAT", "metric_type": "L2", "params": {}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def marker(tmp_path):
+    return str(tmp_path / "index_published")
+
+
+def test_entries_expire_after_the_ttl(marker):
+    clock = Clock()
+    cache = ResultCache(ttl=10, marker_path=marker, clock=clock)
+    cache.put(("a",), [1], seconds=0.5)
+    clock.now = 10
+    assert cache.get(("a",)) == [1]
+    clock.now = 10.1
+    assert cache.get(("a",)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(marker):
+    cache = ResultCache(max_entries=2, marker_path=marker)
+    cache.put(("a",), 1, 0)
+    cache.put(("b",), 2, 0)
+    cache.get(("a",))
+    cache.put(("c",), 3, 0)
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == 1 and cache.get(("c",)) == 3
+
+
+def test_publication_empties_the_cache(marker):
+    mark_index_published("first", marker)
+    cache = ResultCache(marker_path=marker)
+    cache.put(("a",), 1, 0)
+    assert cache.get(("a",)) == 1
+    mark_index_published("second", marker)
+    assert cache.get(("a",)) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_stats(marker):
+    cache = ResultCache(marker_path=marker)
+    assert cache.stats()["hit_ratio"] == 0
+    cache.get(("a",))
+    cache.put(("a",), 1, seconds=0.25)
+    cache.get(("a",))
+    cache.get(("a",))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_ratio"] == pytest.approx(2 / 3)
+    assert stats["seconds_saved"] == pytest.approx(0.5)
+
+
+def test_keys():
+    filters = SearchFilters(pd.Timestamp("2023-09-07"), locations=["Salle 300"])
+    key = ResultCache.make_key("Film  d'Horreur ", "index", filters, 20)
+    assert key == ResultCache.make_key("film d'horreur", "index", filters, 20)
+    assert key != ResultCache.make_key("film d'horreur", "index", None, 20)
+    assert key != ResultCache.make_key("film d'horreur", "other", filters, 20)
+    assert key != ResultCache.make_key("film d'horreur", "index", filters, 20, 20)
+
+
+def test_repeated_searches_skip_the_embedding_and_the_store(monkeypatch, marker):
+    calls = []
+
+    def fake_embed_batch(texts):
+        calls.append(texts)
+        return [[1.0, 0.0] for _ in texts]
+
+    monkeypatch.setattr(search_module, "embed_batch", fake_embed_batch)
+    store = EmbeddedVectorStore(
+        ids=np.array([10, 20]),
+        vectors=np.array([[1.0, 0.0], [0.0, 1.0]]),
+        texts=["a", "b"],
+    )
+    cache = ResultCache(marker_path=marker)
+    first = search_module.search("Horreur", INDEX_PARAM, store, cache=cache)
+    again = search_module.search("horreur ", INDEX_PARAM, store, cache=cache)
+    assert again == first and len(calls) == 1
+    search_module.search("horreur", INDEX_PARAM, store, limit=1, cache=cache)
+    assert len(calls) == 2
@@ -0,0 +1,150 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+from milvus_db_utils.sync import get_movie_ids
+
+from organizer.schedule import optimise_schedule
+
+
+def make_screenings(n_films, n_screenings, n_days, seed):
+    rng = np.random.default_rng(seed)
+    films = np.repeat(np.arange(n_films), n_screenings)
+    starts = pd.Timestamp("2023-09-06 10:00") + pd.to_timedelta(
+        rng.integers(0, n_days * 14 * 4, len(films)) * 15, unit="m"
+    )
+    durations = np.repeat(rng.integers(70, 150, n_films), n_screenings)
+    return pd.DataFrame(
+        {
+            "Title": [f"Film {film}" for film in films],
+            "URL": [f"https://festival/session/{film}" for film in films],
+            "StartDatetime": starts,
+            "EndDatetime": starts + pd.to_timedelta(durations, unit="m"),
+            "Location": rng.choice(["Salle 100", "Salle 300", "Salle 500"], len(films)),
+        }
+    )
+
+
+def get_wishlist(data, weights):
+    ids = pd.unique(get_movie_ids(data))
+    return dict(zip(ids.tolist(), weights))
+
+
+def is_feasible(data, positions, buffer):
+    rows = data.iloc[positions].sort_values("StartDatetime")
+    assert rows["URL"].is_unique
+    starts = rows["StartDatetime"].tolist()
+    ends = rows["EndDatetime"].tolist()
+    locations = rows["Location"].tolist()
+    for i in range(1, len(rows)):
+        gap = 0 if locations[i - 1] == locations[i] else buffer
+        if ends[i - 1] + pd.Timedelta(minutes=gap) > starts[i]:
+            return False
+    return True
+
+
+def brute_force(data, wishlist, buffer):
+    movie = get_movie_ids(data).tolist()
+    starts = data["StartDatetime"].tolist()
+    ends = data["EndDatetime"].tolist()
+    locations = data["Location"].tolist()
+    gap = pd.Timedelta(minutes=buffer)
+
+    def fits(a, b):
+        if starts[a] > starts[b]:
+            a, b = b, a
+        return ends[a] + (gap if locations[a] != locations[b] else 0 * gap) <= starts[b]
+
+    options = [
+        [None] + [p for p in range(len(data)) if movie[p] == m] for m in wishlist
+    ]
+    best = 0.0
+    for choice in itertools.product(*options):
+        positions = [p for p in choice if p is not None]
+        if all(fits(a, b) for a, b in itertools.combinations(positions, 2)):
+            best = max(best, sum(wishlist[movie[p]] for p in positions))
+    return best
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_optimal_programme_matches_brute_force(seed):
+    data = make_screenings(n_films=6, n_screenings=3, n_days=1, seed=seed)
+    weights = np.random.default_rng(seed).integers(1, 4, 6).tolist()
+    wishlist = get_wishlist(data, weights)
+    # A window up to 6:00 the next day keeps all the screenings
+    result = optimise_schedule(
+        data, wishlist, 20, daily_window=("06:00", "06:00"), time_limit=5
+    )
+    assert result["optimal"]
+    assert is_feasible(data, result["positions"], 20)
+    assert result["weight"] == brute_force(data, wishlist, 20)
+
+
+def test_travel_buffer_between_salles():
+    data = pd.DataFrame(
+        {
+            "URL": ["a", "b", "c"],
+            "StartDatetime": pd.to_datetime(
+                ["2023-09-06 10:00", "2023-09-06 12:10", "2023-09-06 12:30"]
+            ),
+            "EndDatetime": pd.to_datetime(
+                ["2023-09-06 12:00", "2023-09-06 14:00", "2023-09-06 14:00"]
+            ),
+            "Location": ["Salle 100", "Salle 300", "Salle 100"],
+        }
+    )
+    wishlist = get_wishlist(data, [1, 1, 1])
+    # 10 minutes are enough to change salles, not 15
+    assert optimise_schedule(data, wishlist, travel_buffer=10)["positions"] == [0, 1]
+    assert optimise_schedule(data, wishlist, travel_buffer=15)["positions"] == [0, 2]
+    buffers = {("Salle 300", "Salle 100"): 5}
+    result = optimise_schedule(data, wishlist, travel_buffer=15, travel_buffers=buffers)
+    assert result["positions"] == [0, 1]
+
+
+def test_daily_window_leaves_late_screenings_out():
+    data = pd.DataFrame(
+        {
+            "URL": ["a", "a", "b"],
+            "StartDatetime": pd.to_datetime(
+                ["2023-09-06 22:30", "2023-09-07 14:00", "2023-09-07 14:30"]
+            ),
+            "EndDatetime": pd.to_datetime(
+                ["2023-09-07 00:30", "2023-09-07 16:00", "2023-09-07 16:30"]
+            ),
+            "Location": ["Salle 100", "Salle 100", "Salle 300"],
+        }
+    )
+    wishlist = get_wishlist(data, [1, 2])
+    late = optimise_schedule(data, wishlist, daily_window=("10:00", "01:00"))
+    assert late["positions"] == [0, 2] and late["weight"] == 3
+    early = optimise_schedule(data, wishlist, daily_window=("10:00", "23:00"))
+    assert early["positions"] == [2] and early["weight"] == 2
+
+
+def test_screenings_after_midnight():
+    data = pd.DataFrame(
+        {
+            "URL": ["a", "b"],
+            "StartDatetime": pd.to_datetime(["2023-09-06 22:30", "2023-09-07 00:45"]),
+            "EndDatetime": pd.to_datetime(["2023-09-07 00:30", "2023-09-07 02:15"]),
+            "Location": ["Salle 100", "Salle 100"],
+        }
+    )
+    wishlist = get_wishlist(data, [1, 1])
+    # Without a window nothing is left out
+    assert optimise_schedule(data, wishlist)["positions"] == [0, 1]
+    # The night screening starts in the window of the 6th, it ends too late
+    late = optimise_schedule(data, wishlist, daily_window=("10:00", "02:00"))
+    assert late["positions"] == [0]
+    late = optimise_schedule(data, wishlist, daily_window=("10:00", "02:30"))
+    assert late["positions"] == [0, 1]
+
+
+def test_hundreds_of_films_are_planned_within_the_time_limit():
+    data = make_screenings(n_films=300, n_screenings=3, n_days=10, seed=0)
+    wishlist = get_wishlist(data, [1] * 300)
+    result = optimise_schedule(data, wishlist, time_limit=0.08)
+    assert is_feasible(data, result["positions"], 15)
+    assert result["seconds"] < 0.5
@@ -1,8 +1,11 @@
+import numpy as np
+import pandas as pd
 import pytest
 
 from data_gathering.scrap_etrange_festival import (
     convert_duration_to_minutes,
     extract_date_time_location,
+    preprocess_data,
 )
 
 
@@ -15,6 +18,7 @@ from data_gathering.scrap_etrange_festival import (
         ("3h15m", 195),
         ("1H30MIN", 90),
         ("0h", 0),
+        ("30m 2h", 150),
         ("", 0),  # Edge case: empty duration text
     ],
 )
@@ -29,6 +33,8 @@ def test_convert_duration_to_minutes(duration_text, expected_minutes):
         ("Date: 01/15 Time: 14h45 Location: Salle 202", "01/15", "14h45", "Salle 202"),
         ("Date: 07/20 Time: 10h00 Location: Salle 303", "07/20", "10h00", "Salle 303"),
         ("No date, time, or location information", None, None, None),
+        # In any order, the first occurrence of each part is kept
+        ("Salle 500 - 14h45 - 06/09 - Salle 300", "06/09", "14h45", "Salle 500"),
     ],
 )
 def test_extract_date_time_location(
@@ -38,3 +44,37 @@ def test_extract_date_time_location(
     assert result_date == expected_date
     assert result_time == expected_time
     assert result_location == expected_location
+
+
+@pytest.fixture
+def screenings():
+    return pd.DataFrame(
+        {
+            "Date": ["06/09", "17/09", "06/09", "07/09"],
+            "Time": ["19h00", "23h45", "09h30", np.nan],
+            "Location": ["Salle 500", "Salle 300", "Salle 100", "Salle 500"],
+            "Duration": [105, 90, 0, 60],
+            "Description_movie": ["a", "b", "c", "d"],
+            "Description_extra": ["e", "f", "g", "h"],
+        }
+    )
+
+
+@pytest.mark.parametrize("year", [2022, 2023, 2024])
+def test_preprocess_data_uses_the_festival_year(screenings, year):
+    data = preprocess_data(screenings, year)
+    assert data["StartDatetime"].tolist()[:3] == [
+        pd.Timestamp(f"{year}-09-06 19:00"),
+        pd.Timestamp(f"{year}-09-17 23:45"),
+        pd.Timestamp(f"{year}-09-06 09:30"),
+    ]
+    assert data["EndDatetime"].iloc[1] == pd.Timestamp(f"{year}-09-18 01:15")
+    assert data["StartDatetime"].dtype == "datetime64[ns]"
+
+
+def test_preprocess_data_keeps_missing_times(screenings):
+    data = preprocess_data(screenings, 2023)
+    assert pd.isna(data["StartDatetime"].iloc[3])
+    assert pd.isna(data["EndDatetime"].iloc[3])
+    assert data["Description"].iloc[0] == "06/09 - 19h00 - Salle 500 - 105 min"
+    assert data["Description_movie_full"].iloc[0] == "a - e"
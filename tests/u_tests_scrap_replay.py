@@ -0,0 +1,213 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from data_gathering import scrap_etrange_festival
+from data_gathering.adapters import FestivalAdapter
+from data_gathering.catalogue import list_catalogue, load_partitions
+from data_gathering.fetch import Fetcher
+from data_gathering.http_cache import HttpCache
+from data_gathering.scrap_etrange_festival import (
+    SCHEDULE_DIV_CLASS,
+    EtrangeFestivalAdapter,
+    parse_session_page,
+    parse_urls_from_div,
+    scrape,
+)
+from data_gathering.scrape_festivals import run
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "etrange_festival")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # Stand-in for the festival website, serving the saved pages
+    def do_GET(self) -> None:
+        self.server.requested.append(self.path)
+        kind, page = self.path.split("/")[-2:]
+        if kind == "schedule":
+            filename = f"schedule_{page}.html"
+            if not os.path.exists(os.path.join(FIXTURES_PATH, filename)):
+                filename = "schedule_empty.html"
+        elif kind == "session":
+            filename = f"session_{page}.html"
+        else:
+            filename = ""
+        path = os.path.join(FIXTURES_PATH, filename)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            content = f.read()
+        etag = f'"{hashlib.sha1(content).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def festival_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.requested = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def read_expected(base_url):
+    # Rows produced by the former serial scraper on the same pages
+    expected = pd.read_csv(
+        os.path.join(FIXTURES_PATH, "expected_2023.csv"), keep_default_na=False
+    )
+    for column in ["ImageURL", "URL"]:
+        expected[column] = expected[column].str.replace("{base_url}", base_url)
+    return expected
+
+
+@pytest.mark.parametrize("max_workers", [1, 8])
+def test_scrape_replays_the_fixtures(festival_server, max_workers):
+    server, base_url = festival_server
+    with Fetcher(max_workers=max_workers) as fetcher:
+        data = scrape(2023, fetcher, base_url=base_url)
+    pd.testing.assert_frame_equal(data, read_expected(base_url), check_dtype=False)
+
+
+@pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+@pytest.mark.parametrize("n", [101, 102, 103])
+def test_selective_parsing_matches_the_full_parse(parser, n):
+    pytest.importorskip(parser.split(".")[0])
+    url = f"https://www.etrangefestival.com/2023/fr/session/{n}"
+    with open(os.path.join(FIXTURES_PATH, f"session_{n}.html"), "rb") as f:
+        content = f.read()
+    expected = parse_session_page(content, url, "html.parser", selective=False)
+    assert parse_session_page(content, url, parser) == expected
+
+
+@pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+def test_schedule_parsing_matches_the_full_parse(parser):
+    pytest.importorskip(parser.split(".")[0])
+    url = "https://www.etrangefestival.com/2023/fr/schedule/09-06"
+    with open(os.path.join(FIXTURES_PATH, "schedule_09-06.html"), "rb") as f:
+        content = f.read()
+    expected = parse_urls_from_div(
+        content, url, SCHEDULE_DIV_CLASS, "html.parser", selective=False
+    )
+    assert parse_urls_from_div(content, url, SCHEDULE_DIV_CLASS, parser) == expected
+
+
+def test_session_pages_are_fetched_once(festival_server):
+    server, base_url = festival_server
+    with Fetcher() as fetcher:
+        scrape(2023, fetcher, base_url=base_url)
+    sessions = [path for path in server.requested if "/session/" in path]
+    # Session 101 is linked from both the 06/09 and the 07/09 schedules
+    assert sorted(sessions) == [f"/2023/fr/session/{n}" for n in [101, 102, 103]]
+
+
+def test_fetcher_keeps_the_order_of_the_urls(festival_server):
+    server, base_url = festival_server
+    urls = [f"{base_url}/2023/fr/session/{n}" for n in [103, 101, 102, 101]]
+    with Fetcher(max_workers=4, per_host_limit=2) as fetcher:
+        contents = fetcher.get_many(urls)
+    assert [b"Batch '81" in c for c in contents] == [True, False, False, False]
+    assert contents[1] == contents[3]
+
+
+def test_unchanged_pages_are_revalidated_and_not_parsed_again(
+    festival_server, tmp_path, monkeypatch
+):
+    server, base_url = festival_server
+    cache = HttpCache(str(tmp_path))
+    with Fetcher(cache=cache) as fetcher:
+        first = scrape(2023, fetcher, base_url=base_url)
+    assert fetcher.stats == {"downloaded": 15}
+
+    parsed = []
+    parse_session_page = scrap_etrange_festival.parse_session_page
+    monkeypatch.setattr(
+        scrap_etrange_festival,
+        "parse_session_page",
+        lambda content, url: parsed.append(url) or parse_session_page(content, url),
+    )
+    with Fetcher(cache=cache) as fetcher:
+        second = scrape(2023, fetcher, base_url=base_url)
+    assert fetcher.stats == {"not_modified": 15}
+    assert parsed == []
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_offline_replay_needs_no_server(festival_server, tmp_path):
+    server, base_url = festival_server
+    cache = HttpCache(str(tmp_path))
+    with Fetcher(cache=cache) as fetcher:
+        online = scrape(2023, fetcher, base_url=base_url)
+    server.shutdown()
+    n_requests = len(server.requested)
+
+    with Fetcher(cache=cache, offline=True) as fetcher:
+        offline = scrape(2023, fetcher, base_url=base_url)
+    assert fetcher.stats == {"cached": 15}
+    assert len(server.requested) == n_requests
+    pd.testing.assert_frame_equal(online, offline)
+
+    with Fetcher(cache=cache, offline=True) as fetcher:
+        with pytest.raises(FileNotFoundError):
+            fetcher.get(f"{base_url}/2023/fr/session/999")
+
+
+class BrokenAdapter(EtrangeFestivalAdapter):
+    name = "broken_festival"
+
+    def get_schedule_urls(self, year):
+        raise ValueError("No schedule")
+
+
+def test_adapters_implement_the_site_parsing():
+    class IncompleteAdapter(FestivalAdapter):
+        name = "incomplete_festival"
+
+        def get_schedule_urls(self, year):
+            return []
+
+    with pytest.raises(TypeError):
+        IncompleteAdapter()
+
+
+class MirrorAdapter(EtrangeFestivalAdapter):
+    # The saved pages link to 2023, a second festival stands for another partition
+    name = "mirror_festival"
+
+
+def test_runner_writes_one_partition_per_festival_and_year(festival_server, tmp_path):
+    server, base_url = festival_server
+    jobs = [
+        (EtrangeFestivalAdapter(base_url), 2023),
+        (MirrorAdapter(base_url), 2023),
+        (BrokenAdapter(), 2023),
+    ]
+    with Fetcher() as fetcher:
+        paths = run(jobs, fetcher, path=str(tmp_path), max_jobs=3)
+    assert [bool(path) for path in paths] == [True, True, False]
+
+    partitions = list_catalogue(str(tmp_path), legacy_path=None)
+    assert [(p["festival"], p["year"]) for p in partitions] == [
+        ("etrange_festival", 2023),
+        ("mirror_festival", 2023),
+    ]
+    data = load_partitions(partitions)
+    assert len(data) == 2 * len(read_expected(base_url))
+    assert data["Festival"].value_counts().tolist() == [len(data) // 2] * 2
+    assert (data["StartDatetime"].dt.year == data["Year"]).all()
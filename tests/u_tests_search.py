@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from milvus_db_utils import search as search_module
+from milvus_db_utils.vector_store import EmbeddedVectorStore
+
+INDEX_PARAM = {"index_type": "FLAT", "metric_type": "L2", "params": {}}
+VECTORS = {"horreur": [1.0, 0.0], "érotique": [0.0, 1.0], "science-fiction": [1.0, 1.0]}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    calls = []
+
+    def fake_embed_batch(texts):
+        calls.append(texts)
+        return [VECTORS[text] for text in texts]
+
+    monkeypatch.setattr(search_module, "embed_batch", fake_embed_batch)
+    store = EmbeddedVectorStore(
+        ids=np.array([10, 20, 30]),
+        vectors=np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]]),
+        texts=["horror movie", "erotic movie", "sci-fi movie"],
+    )
+    store.calls = calls
+    return store
+
+
+def test_search_many_embeds_once_and_keeps_query_order(store):
+    queries = ["science-fiction", "horreur", "érotique"]
+    searches = search_module.search_many(queries, INDEX_PARAM, store, limit=1)
+
+    assert store.calls == [queries]
+    assert [s["query"] for s in searches] == queries
+    assert [s["results"][0][0] for s in searches] == [30, 10, 20]
+    assert all(s["embedding_seconds"] >= 0 for s in searches)
+    assert all(s["search_seconds"] >= 0 for s in searches)
+
+
+def test_search_returns_the_results_of_a_single_query(store):
+    results = search_module.search("horreur", INDEX_PARAM, store, limit=2)
+    assert results[0] == [10, 0.0, "horror movie"]
+    assert len(results) == 2
+
+
+def test_search_many_without_queries(store):
+    assert search_module.search_many([], INDEX_PARAM, store) == []
+    assert store.calls == []
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from aiohttp import web
+from milvus_db_utils.filters import (
+    SCALAR_FIELDS,
+    SearchFilters,
+    get_movie_scalar_fields,
+)
+from milvus_db_utils.result_cache import ResultCache
+from milvus_db_utils.sync import get_movie_ids
+from milvus_db_utils.vector_store import EmbeddedVectorStore
+
+from organizer.hybrid_search import HybridSearch
+from organizer.search_client import SearchClient
+from organizer.search_service import EmbeddingBatcher, SearchService
+from organizer.text_index import TextIndex
+
+INDEX_PARAM = {"index_type": "FLAT", "metric_type": "L2", "params": {}}
+
+
+def fake_vector(text):
+    rng = np.random.default_rng(sum(text.encode("utf-8")))
+    return rng.standard_normal(8).tolist()
+
+
+class FakeEmbedding:
+    # Counts the calls, each one taking 20 ms like a remote model
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(0.02)
+        return [fake_vector(text) for text in texts]
+
+
+@pytest.fixture
+def data():
+    titles = [f"Film {i} {word}" for i, word in enumerate(["nuit", "jour"] * 20)]
+    return pd.DataFrame(
+        {
+            "Title": titles,
+            "URL": [f"https://festival/session/{i}" for i in range(40)],
+            "Duration": np.arange(40) + 70,
+            "Location": ["Salle 100", "Salle 300"] * 20,
+            "StartDatetime": pd.Timestamp("2023-09-06 10:00")
+            + pd.to_timedelta(np.arange(40), unit="h"),
+        }
+    )
+
+
+@pytest.fixture
+def service(data, tmp_path):
+    embedding = FakeEmbedding()
+    batcher = EmbeddingBatcher(embedding, batch_size=32, batch_wait=0.01)
+    fields = get_movie_scalar_fields(data).loc[get_movie_ids(data)]
+    store = EmbeddedVectorStore(
+        ids=get_movie_ids(data).to_numpy(),
+        vectors=np.array([fake_vector(title) for title in data["Title"]]),
+        texts=data["Title"].tolist(),
+        fields={field: fields[field].tolist() for field in SCALAR_FIELDS},
+    )
+    cache = ResultCache(marker_path=str(tmp_path / "index_published"))
+    search = HybridSearch(
+        data,
+        TextIndex(data),
+        store,
+        INDEX_PARAM,
+        cache=cache,
+        embed_function=batcher.embed,
+        max_workers=16,
+    )
+    service = SearchService({"test": search}, batcher, cache, max_workers=16)
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(service.make_app())
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    service.embedding = embedding
+    yield service, SearchClient(f"http://127.0.0.1:{port}")
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+def test_search_matches_the_in_process_search(service, data):
+    service, client = service
+    filters = SearchFilters(locations=["Salle 100"], max_duration=90)
+    results = client.search("test", "film nuit", filters, limit=5)
+    expected = service.searches["test"].search("film nuit", filters, limit=5)
+    assert results["positions"] == expected["positions"]
+    assert [movie for movie, _ in results["movies"]] == [
+        movie for movie, _ in expected["movies"]
+    ]
+    assert len(service.embedding.calls) == 1  # The second one is cached
+
+
+def test_concurrent_queries_share_embedding_calls(service):
+    service, client = service
+    queries = [f"film {i}" for i in range(24)]
+    with ThreadPoolExecutor(max_workers=24) as executor:
+        list(executor.map(lambda query: client.search("test", query), queries))
+    assert sorted(text for call in service.embedding.calls for text in call) == sorted(
+        queries
+    )
+    assert len(service.embedding.calls) < len(queries)
+
+    metrics = client.metrics()
+    assert metrics["requests"]["/search"] == 24
+    assert metrics["search_ms"]["count"] == 24
+    assert metrics["embedding_batches"]["mean_size"] > 1
+
+
+def test_errors(service):
+    service, client = service
+    with pytest.raises(requests.HTTPError) as error:
+        client.search("data/../../etc/passwd", "film")
+    assert error.value.response.status_code == 404
+    for body in [
+        {"limit": "a"},
+        {"limit": True},
+        {"limit": -1},
+        {"limit": 501},
+        {"limit": 500, "offset": 16_000},
+    ]:
+        response = requests.post(
+            f"{client.url}/search", json={"catalogue": "test", **body}
+        )
+        assert response.status_code == 400
+
+    health = client.health()
+    assert health["status"] == "ok" and health["catalogues"] == ["test"]
+    assert client.metrics()["errors"] == 0
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+from milvus_db_utils.sync import (
+    diff_contents,
+    expand_to_screenings,
+    get_content_hashes,
+    get_movie_ids,
+    get_movie_screenings,
+    get_movies,
+)
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame(
+        {
+            "URL": ["https://a", "https://a", "https://b"],
+            "Date": ["06/09", "08/09", "06/09"],
+            "Time": ["19h00", "14h00", "19h00"],
+            "Location": ["Salle 500", "Salle 300", "Salle 500"],
+            "Description_movie_full": ["A film", "A film", "B film"],
+        }
+    )
+
+
+def test_movie_ids_do_not_depend_on_row_order(data):
+    ids = get_movie_ids(data)
+    shuffled_ids = get_movie_ids(data.iloc[::-1].reset_index(drop=True))
+    assert ids[0] == ids[1] != ids[2]
+    assert (ids >= 0).all()
+    assert ids.tolist() == shuffled_ids.tolist()[::-1]
+
+
+def test_movie_ids_fall_back_on_titles(data):
+    data = data.drop(columns="URL").assign(Title=["A", "A", "B"])
+    ids = get_movie_ids(data)
+    assert ids[0] == ids[1] != ids[2]
+
+
+def test_movies_are_deduplicated(data):
+    movies = get_movies(data)
+    assert movies["URL"].tolist() == ["https://a", "https://b"]
+    assert movies["id"].tolist() == get_movie_ids(data)[[0, 2]].tolist()
+
+
+def test_results_are_expanded_to_all_screenings(data):
+    screenings = get_movie_screenings(data)
+    ids = get_movie_ids(data)
+    assert expand_to_screenings([ids[2], ids[0]], screenings) == [2, 0, 1]
+    assert expand_to_screenings([12345], screenings) == []
+
+
+def test_content_hashes_follow_the_text(data):
+    hashes = get_content_hashes(data, "Description_movie_full")
+    assert hashes[0] == hashes[1]
+    assert hashes[0] != hashes[2]
+
+
+@pytest.mark.parametrize(
+    "new_hashes, stored_hashes, expected",
+    [
+        ({1: "a", 2: "b"}, {1: "a", 2: "b"}, ([], [], [])),
+        ({1: "a", 2: "c"}, {1: "a", 2: "b"}, ([], [2], [])),
+        ({1: "a", 3: "c"}, {1: "a", 2: "b"}, ([3], [], [2])),
+        ({1: "a"}, {}, ([1], [], [])),
+        ({}, {1: "a"}, ([], [], [1])),
+    ],
+)
+def test_diff_contents(new_hashes, stored_hashes, expected):
+    assert diff_contents(new_hashes, stored_hashes) == expected
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from organizer.text_index import TextIndex, fold, tokenize
+
+
+@pytest.fixture
+def catalogue():
+    return pd.DataFrame(
+        {
+            "Title": [
+                "Soirée d'ouverture: The roundup",
+                "Batch '81",
+                "Batch '81",
+                "Une soirée en enfer",
+                "Les Éléphants",
+            ],
+            "Director": ["Kim", "Mike Mendez", "Mike Mendez", None, "Soiree Dupont"],
+            "Description_movie": [
+                "Un polar coréen",
+                "Une expérience qui tourne mal",
+                "Une expérience qui tourne mal",
+                "Une nuit en enfer, une soirée, une soirée encore",
+                "Un documentaire animalier",
+            ],
+        }
+    )
+
+
+def brute_force(data, query, fields):
+    # Screenings with every term of the query, the last one as a prefix
+    terms = tokenize(query)
+    matches = []
+    for position, row in enumerate(data[fields].fillna("").itertuples(index=False)):
+        words = set(tokenize(" ".join(row)))
+        if all(t in words for t in terms[:-1]) and any(
+            word.startswith(terms[-1]) for word in words
+        ):
+            matches.append(position)
+    return matches
+
+
+def test_fold_removes_accents_and_case():
+    assert fold("Soirée d'Ouverture, ÇA") == "soiree d'ouverture, ca"
+    assert tokenize("L'Étrange Festival 2023") == ["l", "etrange", "festival", "2023"]
+
+
+def test_accented_and_plain_queries_match(catalogue):
+    index = TextIndex(catalogue)
+    assert sorted(index.search("soirée").tolist()) == [0, 3, 4]
+    assert sorted(index.search("SOIREE").tolist()) == [0, 3, 4]
+    assert index.search("elephants").tolist() == [4]
+
+
+def test_prefix_matching_of_the_last_term(catalogue):
+    index = TextIndex(catalogue)
+    assert index.search("soirée d'ouv").tolist() == [0]
+    assert index.search("bat").tolist() == [1, 2]
+    assert index.search("bat", prefix=False).tolist() == []
+    assert index.search("  ").tolist() == [0, 1, 2, 3, 4]
+
+
+def test_ranking_favours_titles_and_frequent_terms(catalogue):
+    index = TextIndex(catalogue)
+    # In the title and three times in the description, then in the title, then
+    # in the director only
+    assert index.search("soiree").tolist() == [3, 0, 4]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_agree_with_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    words = ["été", "ete", "étoile", "nuit", "nuits", "noir", "chat", "château", "a"]
+    data = pd.DataFrame(
+        {
+            "Title": [" ".join(rng.choice(words, 2)) for _ in range(60)],
+            "Description_movie": [" ".join(rng.choice(words, 6)) for _ in range(60)],
+        }
+    )
+    index = TextIndex(data)
+    for query in ["ete", "nuit", "cha", "noir ét", "a nuits", "x"]:
+        expected = brute_force(data, query, ["Title", "Description_movie"])
+        assert sorted(index.search(query).tolist()) == expected
+
+
+def test_missing_fields_are_skipped():
+    data = pd.DataFrame({"Title": ["Himiko"], "Location": ["Salle 300"]})
+    assert TextIndex(data).search("himiko").tolist() == [0]
+    with pytest.raises(ValueError):
+        TextIndex(data[["Location"]])
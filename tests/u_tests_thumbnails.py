@@ -0,0 +1,89 @@
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+from data_gathering.fetch import Fetcher
+from data_gathering.thumbnails import ThumbnailCache
+
+
+def make_image(width, height):
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(output, "PNG")
+    return output.getvalue()
+
+
+IMAGES = {"/poster.png": make_image(1200, 1800), "/text.png": b"not an image"}
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        self.server.requested.append(self.path)
+        if self.path not in IMAGES:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(IMAGES[self.path])))
+        self.end_headers()
+        self.wfile.write(IMAGES[self.path])
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def image_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+    server.requested = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_thumbnails_are_downscaled_once(image_server, tmp_path):
+    server, base_url = image_server
+    url = f"{base_url}/poster.png"
+    with Fetcher() as fetcher:
+        cache = ThumbnailCache(str(tmp_path), width=100, fetcher=fetcher)
+        paths = cache.get_many([url, url, ""])
+        assert paths[0] == paths[1] and paths[2] is None
+        with Image.open(paths[0]) as image:
+            assert image.size == (100, 150)
+        assert cache.get_many([url]) == paths[:1]
+    assert server.requested == ["/poster.png"]
+
+
+def test_failed_thumbnails_are_none(image_server, tmp_path):
+    server, base_url = image_server
+    urls = [f"{base_url}/missing.png", f"{base_url}/text.png", f"{base_url}/poster.png"]
+    with Fetcher() as fetcher:
+        paths = ThumbnailCache(str(tmp_path), fetcher=fetcher).get_many(urls)
+    assert paths[:2] == [None, None]
+    assert paths[2] is not None
+
+
+def test_failures_are_not_retried_before_their_ttl(image_server, tmp_path):
+    server, base_url = image_server
+    urls = [f"{base_url}/missing.png", f"{base_url}/text.png"]
+    with Fetcher() as fetcher:
+        cache = ThumbnailCache(str(tmp_path), fetcher=fetcher)
+        assert cache.get_many(urls) == [None, None]
+        assert cache.get_many(urls) == [None, None]
+        assert len(server.requested) == 2
+
+        cache.failure_ttl = 0
+        assert cache.get_many(urls) == [None, None]
+        assert len(server.requested) == 4
+
+
+def test_get_many_returns_exceptions(image_server):
+    server, base_url = image_server
+    with Fetcher() as fetcher:
+        contents = fetcher.get_many(
+            [f"{base_url}/missing.png", f"{base_url}/poster.png"],
+            return_exceptions=True,
+        )
+    assert isinstance(contents[0], Exception)
+    assert contents[1] == IMAGES["/poster.png"]
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pytest
+from milvus_db_utils.benchmark import brute_force_top_k
+from milvus_db_utils.embedding_providers import OpenAIProvider
+from milvus_db_utils.filters import SearchFilters, to_epoch_seconds
+from milvus_db_utils.result_cache import mark_index_published
+from milvus_db_utils.vector_store import (
+    EmbeddedVectorStore,
+    ReloadingVectorStore,
+    VectorStore,
+)
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((200, 16)).astype(np.float32)
+
+
+@pytest.mark.parametrize("metric_type", ["L2", "IP", "COSINE"])
+def test_embedded_search_is_exact(vectors, metric_type):
+    ids = np.arange(200) * 10
+    store = EmbeddedVectorStore(ids, vectors, [str(i) for i in ids], metric_type)
+    queries = np.random.default_rng(1).standard_normal((3, 16)).astype(np.float32)
+
+    results = store.search(queries.tolist(), limit=5)
+    expected = brute_force_top_k(vectors, queries, 5, metric_type)
+    for hits, positions in zip(results, expected):
+        assert [hit[0] for hit in hits] == (positions * 10).tolist()
+        assert [hit[2] for hit in hits] == [str(p * 10) for p in positions]
+
+
+def test_l2_scores_are_squared_distances(vectors):
+    store = EmbeddedVectorStore(np.arange(200), vectors, [""] * 200, "L2")
+    hits = store.search([vectors[3].tolist()], limit=2)[0]
+    assert hits[0][0] == 3
+    assert hits[0][1] == pytest.approx(0, abs=1e-4)
+    assert hits[1][1] == pytest.approx(
+        ((vectors[hits[1][0]] - vectors[3]) ** 2).sum(), rel=1e-4
+    )
+
+
+def test_limit_larger_than_the_store(vectors):
+    store = EmbeddedVectorStore(np.arange(3), vectors[:3], ["a", "b", "c"])
+    assert len(store.search([vectors[0].tolist()], limit=10)[0]) == 3
+
+
+def test_save_and_load_memory_mapped(tmp_path, vectors):
+    store = EmbeddedVectorStore(np.arange(200), vectors, ["t"] * 200, "IP")
+    path = str(tmp_path / "store")
+    store.save(path)
+    store.save(path)  # Overwrites the previous version
+
+    loaded = EmbeddedVectorStore.load(path, mmap=True)
+    assert loaded.metric_type == "IP"
+    assert isinstance(loaded.vectors, np.memmap)
+    query = [vectors[7].tolist()]
+    assert loaded.search(query) == store.search(query)
+
+
+def test_stores_of_another_provider_are_not_loaded(tmp_path, vectors):
+    path = str(tmp_path / "store")
+    EmbeddedVectorStore(np.arange(200), vectors, [""] * 200, provider="a").save(path)
+    assert (
+        EmbeddedVectorStore.load(path, provider=OpenAIProvider("a", 16)).provider == "a"
+    )
+    with pytest.raises(ValueError):
+        EmbeddedVectorStore.load(path, provider=OpenAIProvider("b", 16))
+    with pytest.raises(ValueError):
+        EmbeddedVectorStore.load(path, provider=OpenAIProvider("a", 8))
+
+
+def test_store_is_reloaded_when_new_vectors_are_published(tmp_path, vectors):
+    path, marker = str(tmp_path / "store"), str(tmp_path / "index_published")
+    EmbeddedVectorStore(np.arange(200), vectors, ["old"] * 200).save(path)
+    mark_index_published("first", marker)
+    store = ReloadingVectorStore(lambda: EmbeddedVectorStore.load(path), marker)
+    query = [vectors[7].tolist()]
+    assert store.search(query, limit=1)[0][0][2] == "old"
+
+    # Saved but not yet published, the loaded vectors are still searched
+    EmbeddedVectorStore(np.arange(200), vectors, ["new"] * 200).save(path)
+    assert store.search(query, limit=1)[0][0][2] == "old"
+    mark_index_published("second", marker)
+    assert store.search(query, limit=1)[0][0][2] == "new"
+
+
+def test_approximate_search_finds_the_nearest(vectors):
+    pytest.importorskip("hnswlib")
+    store = EmbeddedVectorStore(np.arange(200), vectors, [""] * 200, "L2", ann=True)
+    assert store.search([vectors[42].tolist()], limit=1)[0][0][0] == 42
+
+
+def make_fields(n):
+    # Movie i lasts 60 + i minutes, screened on day i % 10 in salle i % 3
+    starts = (
+        pd.Timestamp("2023-09-06") + pd.to_timedelta(np.arange(n) % 10, unit="D")
+    ).to_numpy()
+    return {
+        "Duration": (60 + np.arange(n)).tolist(),
+        "FirstStart": to_epoch_seconds(starts).tolist(),
+        "LastStart": to_epoch_seconds(starts).tolist(),
+        "Locations": [[f"Salle {i % 3}"] for i in range(n)],
+    }
+
+
+def test_filtered_search_is_exact_among_the_matching_movies(vectors):
+    store = EmbeddedVectorStore(
+        np.arange(200), vectors, [""] * 200, "L2", fields=make_fields(200)
+    )
+    filters = SearchFilters(
+        start=pd.Timestamp("2023-09-08"), locations=["Salle 1"], max_duration=200
+    )
+    matching = [i for i in range(141) if i % 10 >= 2 and i % 3 == 1]
+    hits = store.search([vectors[0].tolist()], limit=5, filters=filters)[0]
+    expected = brute_force_top_k(vectors[matching], vectors[:1], 5, "L2")[0]
+    assert [hit[0] for hit in hits] == [matching[p] for p in expected]
+
+    few = SearchFilters(max_duration=61)
+    assert len(store.search([vectors[0].tolist()], limit=5, filters=few)[0]) == 2
+
+
+def test_offset_pages_through_the_results(vectors):
+    store = EmbeddedVectorStore(np.arange(200), vectors, [""] * 200, "IP")
+    query = [vectors[5].tolist()]
+    everything = store.search(query, limit=9)[0]
+    pages = [store.search(query, limit=3, offset=offset)[0] for offset in [0, 3, 6]]
+    assert pages[0] + pages[1] + pages[2] == everything
+    assert store.search(query, limit=3, offset=199)[0] == (
+        store.search(query, limit=200)[0][-1:]
+    )
+
+
+def test_fields_are_saved(tmp_path, vectors):
+    store = EmbeddedVectorStore(
+        np.arange(200), vectors, [""] * 200, fields=make_fields(200)
+    )
+    store.save(str(tmp_path / "store"))
+    loaded = EmbeddedVectorStore.load(str(tmp_path / "store"))
+    filters = SearchFilters(locations=["Salle 2"])
+    query = [vectors[1].tolist()]
+    assert loaded.search(query, filters=filters) == store.search(query, filters=filters)
+
+
+def test_filters_need_fields(vectors):
+    store = EmbeddedVectorStore(np.arange(200), vectors, [""] * 200)
+    with pytest.raises(ValueError):
+        store.search([vectors[0].tolist()], filters=SearchFilters(min_duration=90))
+    assert len(store.search([vectors[0].tolist()], filters=SearchFilters())[0]) == 5
+
+
+def test_stores_implement_search():
+    class IncompleteStore(VectorStore):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteStore()